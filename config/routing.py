@@ -1,7 +1,9 @@
 from django.urls import re_path
 
+from src.apps.alerts.consumers import UserEventsConsumer
 from src.apps.support.consumers import ChatConsumer
 
 websocket_urlpatterns = [
     re_path(r"ws/chat/(?P<room_id>[\w\-]+)/$", ChatConsumer.as_asgi()),
+    re_path(r"ws/events/$", UserEventsConsumer.as_asgi()),
 ]
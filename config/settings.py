@@ -273,6 +273,11 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 initialize_app()
 
+FCM_DJANGO_SETTINGS = {
+    # Tokens FCM reports as unregistered are deleted, not just deactivated
+    "DELETE_INACTIVE_DEVICES": True,
+}
+
 # ==============================================================================
 #  GOOGLE SETTINGS
 # ==============================================================================
@@ -295,5 +300,16 @@ DEFAULT_FROM_EMAIL = 'alameednoreply@gmail.com'  # Replace with your from email
 
 CRONJOBS = [
     # run every day at 9 AM
-    ('0 9 * * *', 'src.apps.orders.cron.send_installment_notifications'),
+    ('0 9 * * *', 'src.apps.rental.cron.send_installment_notifications'),
+    ('0 9 * * *', 'src.apps.rental.cron.send_rental_return_reminders'),
+    # run every day just after midnight
+    ('5 0 * * *', 'src.apps.vehicles.cron.refresh_effective_prices'),
+    # run every hour
+    ('15 * * * *', 'src.apps.vehicles.cron.reconcile_statistics'),
+    # run every day at 3:30 AM
+    ('30 3 * * *', 'src.apps.alerts.cron.prune_user_events'),
+    # run every 10 minutes
+    ('*/10 * * * *', 'src.apps.alerts.cron.resume_broadcasts'),
+    # run every minute, sends the queued notification emails and pushes
+    ('* * * * *', 'src.apps.alerts.cron.send_outbox'),
 ]
@@ -21,6 +21,7 @@ from django.urls import path, include
 from fcm_django.api.rest_framework import FCMDeviceAuthorizedViewSet
 from rest_framework.routers import DefaultRouter
 
+from src.apps.alerts.api.viewsets import BroadcastViewSet, NotificationViewSet
 from src.apps.rental.api.viewsets import RentalViewSet, RentalRequestsViewSet
 from src.apps.reviews.api.viewsets import VehicleReviewViewSet
 from src.apps.services.api.viewsets import UpholsteryMaterialViewSet, UpholsteryTypeViewSet, \
@@ -62,6 +63,8 @@ router.register(r'services/upholstery/material-types', UpholsteryMaterialTypesVi
 router.register(r'services/car-listings', CarListingViewSet, basename='car-listing')
 router.register(r'services/car-comparison', VehicleComparisonViewSet, basename='vehicle-comparison')
 router.register('alerts/devices', FCMDeviceAuthorizedViewSet)
+router.register('alerts/notifications', NotificationViewSet, basename='notification')
+router.register('alerts/broadcasts', BroadcastViewSet)
 router.register('users/users', UsersViewSet, basename='users')
 router.register('users/permissions', PermissionsViewSet, basename='permissions')
 
@@ -0,0 +1,128 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Echo:
+    """File-like object handing back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+class Export:
+    """
+    Streams a queryset as NDJSON or CSV without loading it in memory.
+
+    ``fields`` are value paths (``brand__name``) read with values() and
+    iterated server side in chunks. Subclasses with nested data override
+    ``get_rows``; nested values end up JSON encoded in CSV cells.
+    """
+    chunk_size = 2000
+
+    def __init__(self, name, fields, date_field='created_at', status_field='status'):
+        self.name = name
+        self.fields = fields
+        self.date_field = date_field
+        self.status_field = status_field
+
+    def filter(self, queryset, params):
+        """Apply the ``date_from``, ``date_to`` and ``status`` filters"""
+        for param, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+            value = params.get(param)
+            if not value:
+                continue
+            date = parse_date(value)
+            if date is None:
+                raise ValidationError({param: "Use the YYYY-MM-DD format."})
+            queryset = queryset.filter(**{f'{self.date_field}__date__{lookup}': date})
+        if params.get('status'):
+            queryset = queryset.filter(**{f'{self.status_field}__in': params['status'].split(',')})
+        return queryset
+
+    def get_columns(self):
+        return list(self.fields)
+
+    def get_rows(self, queryset):
+        return queryset.values(*self.fields).order_by('pk').iterator(chunk_size=self.chunk_size)
+
+    def stream(self, queryset, file_format):
+        rows = self.get_rows(queryset)
+        if file_format == 'ndjson':
+            for row in rows:
+                yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+            return
+
+        writer = csv.writer(Echo())
+        # The BOM lets spreadsheet apps read Arabic text as UTF-8
+        yield '\ufeff' + writer.writerow(self.get_columns())
+        for row in rows:
+            yield writer.writerow([
+                json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+                for value in row.values()
+            ])
+
+    async def astream(self, queryset, file_format):
+        """
+        stream() for daphne: under ASGI Django reads a sync iterator to the
+        end before sending anything, so each chunk of lines is read on the
+        sync thread and sent before the next one is fetched
+        """
+        lines = self.stream(queryset, file_format)
+        read = sync_to_async(lambda: list(islice(lines, self.chunk_size)))
+        try:
+            while True:
+                chunk = await read()
+                if not chunk:
+                    return
+                yield ''.join(chunk)
+        finally:
+            # Release the server side cursor when the client goes away early
+            await sync_to_async(lines.close)()
+
+    def response(self, queryset, file_format='ndjson'):
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({'file_format': f"Choose one of {', '.join(EXPORT_FORMATS)}."})
+        response = StreamingHttpResponse(self.astream(queryset, file_format), content_type=EXPORT_FORMATS[file_format])
+        filename = f"{self.name}-{timezone.now():%Y%m%d-%H%M}.{file_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def admin_actions(self):
+        """Admin actions exporting the selected rows, one per format"""
+        actions = []
+        for file_format in EXPORT_FORMATS:
+            def export_selected(modeladmin, request, queryset, file_format=file_format):
+                return self.response(queryset, file_format)
+
+            export_selected.__name__ = f'export_{file_format}'
+            export_selected.short_description = f"Export selected as {file_format.upper()}"
+            actions.append(export_selected)
+        return actions
+
+
+class ExportMixin:
+    """
+    Adds an admin-only ``export`` action streaming the view's filtered
+    queryset with its ``export`` definition.
+    """
+    export = None
+
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsAdminUser])
+    def export_rows(self, request):
+        queryset = self.export.filter(self.filter_queryset(self.get_queryset()), request.query_params)
+        return self.export.response(queryset, request.query_params.get('file_format', 'ndjson'))
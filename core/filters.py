@@ -0,0 +1,19 @@
+from rest_framework import filters
+
+
+class AliasOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter sorting some of the view's ``ordering_fields`` on
+    another field, given as the view's ``ordering_aliases``, e.g.
+    ``{'price': 'effective_price'}``.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        aliases = getattr(view, 'ordering_aliases', None)
+        if not ordering or not aliases:
+            return ordering
+        return [
+            ('-' if term.startswith('-') else '') + aliases.get(term.lstrip('-'), term.lstrip('-'))
+            for term in ordering
+        ]
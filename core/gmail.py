@@ -1,6 +1,8 @@
 import base64
 import mimetypes
 import os
+import smtplib
+import threading
 from email import encoders
 from email.mime.audio import MIMEAudio
 from email.mime.base import MIMEBase
@@ -8,11 +10,15 @@ from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
+import httplib2
 from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from google.auth.exceptions import RefreshError, TransportError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest
 
 # Define scope for Gmail API
 SCOPES = ['https://www.googleapis.com/auth/gmail.send']
@@ -207,9 +213,185 @@ def send_message(credentials, sender, to, subject, message_text=None, message_ht
         return None
 
 
+class GmailUnavailable(Exception):
+    """Gmail can't be used without an interactive login; mail goes over SMTP instead"""
+
+
+class GmailClient:
+    """
+    Process-wide Gmail API client.
+
+    Credentials are read from the token file once and refreshed only when
+    they expire. Building the service parses the discovery document, so
+    each thread builds it once and keeps it (the underlying HTTP client is
+    not thread safe). Many messages go out in Gmail batch requests.
+    """
+    batch_limit = 50
+
+    def __init__(self, credentials_path=None, token_path=None, root_url=None, credentials=None):
+        self.credentials_path = credentials_path
+        self.token_path = token_path
+        self.root_url = root_url
+        self.credentials = credentials
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def get_credentials(self):
+        credentials_path = self.credentials_path or settings.BASE_DIR / 'secrets/credentials.json'
+        token_path = self.token_path or settings.BASE_DIR / 'secrets/token.json'
+        with self.lock:
+            if self.credentials is None:
+                if not os.path.exists(token_path):
+                    # The first login opens a browser, which a worker can't do
+                    raise GmailUnavailable(
+                        f"Token not found at {token_path}; run get_credentials('{credentials_path}', '{token_path}') once"
+                    )
+                self.credentials = Credentials.from_authorized_user_file(token_path, SCOPES)
+            credentials = self.credentials
+            if getattr(credentials, 'expired', False) and getattr(credentials, 'refresh_token', None):
+                try:
+                    credentials.refresh(Request())
+                except (RefreshError, TransportError) as e:
+                    # A revoked token or an unreachable token endpoint
+                    raise GmailUnavailable(f"Gmail credentials can't be refreshed: {e}") from e
+                with open(token_path, 'w') as token:
+                    token.write(credentials.to_json())
+            elif not credentials.valid and not getattr(credentials, 'refresh_token', None):
+                raise GmailUnavailable("Gmail credentials are invalid and can't be refreshed")
+            return credentials
+
+    def get_service(self):
+        credentials = self.get_credentials()
+        if getattr(self.local, 'credentials', None) is not credentials:
+            options = {'api_endpoint': self.root_url} if self.root_url else None
+            self.local.service = build('gmail', 'v1', credentials=credentials, cache_discovery=False, client_options=options)
+            self.local.credentials = credentials
+        return self.local.service
+
+    def new_batch(self, service, callback):
+        if self.root_url:
+            return BatchHttpRequest(callback=callback, batch_uri=f"{self.root_url.rstrip('/')}/batch")
+        return service.new_batch_http_request(callback=callback)
+
+    def send_many(self, messages):
+        """
+        Send ``messages`` (send_gmail keyword dicts); returns one result per
+        message. Raises GmailUnavailable when Gmail can't be used at all.
+        """
+        sender = getattr(settings, 'DEFAULT_FROM_EMAIL', None)
+        if not sender:
+            raise GmailUnavailable("DEFAULT_FROM_EMAIL not defined in settings")
+        service = self.get_service()
+        results = [None] * len(messages)
+
+        def store(request_id, response, exception):
+            if exception is not None:
+                results[int(request_id)] = {'success': False, 'error': str(exception)}
+            else:
+                results[int(request_id)] = {
+                    'success': True,
+                    'message_id': response.get('id', 'Unknown'),
+                    'message': f"Email sent successfully to {messages[int(request_id)]['to_email']}",
+                }
+
+        for start in range(0, len(messages), self.batch_limit):
+            batch = self.new_batch(service, store)
+            for index in range(start, min(start + self.batch_limit, len(messages))):
+                body = build_message(sender, **messages[index])
+                if body is None:
+                    results[index] = {'success': False, 'error': "Failed to build the email"}
+                    continue
+                batch.add(service.users().messages().send(userId="me", body=body), request_id=str(index))
+            try:
+                batch.execute()
+            except (RefreshError, OSError, httplib2.HttpLib2Error) as e:
+                if start == 0:
+                    raise GmailUnavailable(str(e)) from e
+                # Earlier batches went out; only this one failed
+                for index in range(start, min(start + self.batch_limit, len(messages))):
+                    results[index] = results[index] or {'success': False, 'error': str(e)}
+        return results
+
+
+class SMTPSender:
+    """
+    Sends over one SMTP connection kept open between calls, configured by
+    the EMAIL_* settings, and reconnects when the server drops it.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def send_one(self, message):
+        email = EmailMultiAlternatives(
+            message['subject'], message.get('message_text') or '', settings.DEFAULT_FROM_EMAIL,
+            [message['to_email']], connection=self.connection,
+        )
+        if message.get('message_html'):
+            email.attach_alternative(message['message_html'], 'text/html')
+        for file_path in message.get('file_paths') or []:
+            if os.path.exists(file_path):
+                email.attach_file(file_path)
+        email.send()
+
+    def send_many(self, messages):
+        results = []
+        with self.lock:
+            if self.connection is None:
+                self.connection = get_connection('django.core.mail.backends.smtp.EmailBackend', **self.options)
+            for message in messages:
+                try:
+                    # Opened here, the backend leaves the connection open after sending
+                    self.connection.open()
+                    try:
+                        self.send_one(message)
+                    except smtplib.SMTPServerDisconnected:
+                        self.connection.close()
+                        self.connection.open()
+                        self.send_one(message)
+                except Exception as e:
+                    results.append({'success': False, 'error': str(e)})
+                else:
+                    results.append({'success': True, 'message': f"Email sent over SMTP to {message['to_email']}"})
+        return results
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+gmail_client = GmailClient()
+smtp_sender = SMTPSender()
+
+
+def build_message(sender, to_email, subject, message_text=None, message_html=None, file_paths=None):
+    if file_paths:
+        return create_message_with_attachment(sender, to_email, subject, message_text, message_html, file_paths)
+    return create_message(sender, to_email, subject, message_text, message_html)
+
+
+def send_email_batch(messages):
+    """
+    Send many emails, each a dict of send_gmail's keyword arguments, with
+    the Gmail batch API, or over SMTP when Gmail isn't available. Returns
+    one result dict per message.
+    """
+    if not messages:
+        return []
+    try:
+        return gmail_client.send_many(messages)
+    except GmailUnavailable as e:
+        print(f"Gmail unavailable, sending over SMTP: {e}")
+        return smtp_sender.send_many(messages)
+
+
 def send_gmail(to_email, subject, message_text=None, message_html=None, file_paths=None):
     """
-    Sends an email using Gmail API.
+    Sends an email using Gmail API, or SMTP when Gmail isn't available.
 
     Args:
         to_email: Email address of the recipient.
@@ -221,55 +403,10 @@ def send_gmail(to_email, subject, message_text=None, message_html=None, file_pat
     Returns:
         Dictionary with success status and message or error details.
     """
-    try:
-        # Get paths for credentials and token
-        print("BASE_DIR", settings.BASE_DIR)
-        credentials_path = settings.BASE_DIR / 'secrets/credentials.json'
-        token_path = settings.BASE_DIR / 'secrets/token.json'
-
-        # Ensure credentials file exists
-        if not os.path.exists(credentials_path):
-            return {
-                'success': False,
-                'error': f"Credentials file not found at {credentials_path}"
-            }
-
-        # Get credentials
-        credentials = get_credentials(credentials_path, token_path)
-
-        # Get sender email from settings
-        sender_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None)
-        if not sender_email:
-            return {
-                'success': False,
-                'error': "DEFAULT_FROM_EMAIL not defined in settings"
-            }
-
-        # Send the message
-        result = send_message(
-            credentials=credentials,
-            sender=sender_email,
-            to=to_email,
-            subject=subject,
-            message_text=message_text,
-            message_html=message_html,
-            file_paths=file_paths
-        )
-
-        if result:
-            return {
-                'success': True,
-                'message_id': result.get('id', 'Unknown'),
-                'message': f"Email sent successfully to {to_email}"
-            }
-        else:
-            return {
-                'success': False,
-                'error': "Failed to send email"
-            }
-
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+    return send_email_batch([{
+        'to_email': to_email,
+        'subject': subject,
+        'message_text': message_text,
+        'message_html': message_html,
+        'file_paths': file_paths,
+    }])[0]
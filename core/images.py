@@ -0,0 +1,163 @@
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+# Bounding boxes; thumbnail() keeps the aspect ratio and never upscales
+VARIANT_SIZES = {
+    'thumbnail': (320, 320),
+    'card': (800, 600),
+    'full': (1920, 1920),
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+IMAGE_VARIANTS = []
+
+# Sent with the instance once its variants are stored with update()
+variants_generated = Signal()
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+    thread_name_prefix='image-variants',
+)
+
+
+class ImageVariants:
+    """
+    Resized WebP/JPEG copies of an image field, stored next to the original
+    under ``variants/`` and recorded in a JSON field on the same row.
+
+    Saving a row whose image has no variants yet queues it on a shared
+    thread pool once the transaction commits.
+    """
+
+    def __init__(self, model, field_name='image', variants_field='image_variants'):
+        self.model = model
+        self.field_name = field_name
+        self.variants_field = variants_field
+        IMAGE_VARIANTS.append(self)
+        post_save.connect(self.schedule, sender=model, dispatch_uid=f'image-variants-{model._meta.label}')
+
+    def is_current(self, instance):
+        name = getattr(instance, self.field_name).name
+        return not name or getattr(instance, self.variants_field).get('source') == name
+
+    def schedule(self, sender, instance, raw=False, **kwargs):
+        if raw or self.is_current(instance):
+            return
+        pk = instance.pk
+        transaction.on_commit(lambda: _executor.submit(self._run, pk))
+
+    def _run(self, pk):
+        close_old_connections()
+        try:
+            instance = self.model.objects.filter(pk=pk).first()
+            if instance is not None and not self.is_current(instance):
+                self.generate(instance)
+        except Exception as e:
+            print(f"Error generating image variants for {self.model.__name__} {pk}: {e}")
+        finally:
+            close_old_connections()
+
+    def generate(self, instance):
+        """Render and store every variant of the instance's image"""
+        field_file = getattr(instance, self.field_name)
+        variants = render_variants(field_file.storage, field_file.name)
+        # Skip the write if the image was replaced while rendering
+        updated = self.model.objects.filter(
+            pk=instance.pk, **{self.field_name: field_file.name}
+        ).update(**{self.variants_field: variants})
+        if updated:
+            setattr(instance, self.variants_field, variants)
+            variants_generated.send(sender=self.model, instance=instance)
+        return variants
+
+    def pending(self, force=False):
+        """Rows with an image whose variants are missing or stale"""
+        queryset = self.model.objects.exclude(**{self.field_name: ''}).exclude(**{f'{self.field_name}__isnull': True})
+        for instance in queryset.iterator():
+            if force or not self.is_current(instance):
+                yield instance
+
+
+def variant_path(name, variant, extension):
+    return posixpath.join('variants', f'{posixpath.splitext(name)[0]}-{variant}.{extension}')
+
+
+def render_variants(storage, name):
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    variants = {'source': name}
+    for variant, size in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        variants[variant] = {'width': resized.width, 'height': resized.height}
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            output = resized
+            if image_format == 'JPEG' and has_alpha:
+                # JPEG has no alpha channel, flatten logos onto white
+                output = Image.new('RGB', resized.size, 'white')
+                output.paste(resized, mask=resized.getchannel('A'))
+            buffer = BytesIO()
+            output.save(buffer, image_format, **options)
+            path = variant_path(name, variant, extension)
+            storage.delete(path)
+            variants[variant][extension] = storage.save(path, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def variant_urls(field_file, variants, request=None):
+    """
+    URLs of each variant plus a srcset per format, or None until the
+    variants of the current image exist.
+    """
+    if not field_file or variants.get('source') != field_file.name:
+        return None
+
+    def url(path):
+        location = field_file.storage.url(path)
+        return request.build_absolute_uri(location) if request is not None else location
+
+    data = {}
+    srcset = {extension: [] for extension in VARIANT_FORMATS}
+    for variant in VARIANT_SIZES:
+        stored = variants[variant]
+        data[variant] = {extension: url(stored[extension]) for extension in VARIANT_FORMATS}
+        for extension in VARIANT_FORMATS:
+            srcset[extension].append(f"{data[variant][extension]} {stored['width']}w")
+    data['srcset'] = {extension: ', '.join(entries) for extension, entries in srcset.items()}
+    return data
+
+
+class ImageVariantsField(serializers.Field):
+    """Read-only variant URLs of an image field, see variant_urls()"""
+
+    def __init__(self, image_field='image', variants_field='image_variants', **kwargs):
+        self.image_field = image_field
+        self.variants_field = variants_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return variant_urls(
+            getattr(instance, self.image_field),
+            getattr(instance, self.variants_field),
+            self.context.get('request'),
+        )
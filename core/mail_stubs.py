@@ -0,0 +1,130 @@
+"""
+Local stand-ins for the Gmail API and an SMTP server, for tests and
+benchmarks. Each runs on a background thread and counts what it receives.
+"""
+import json
+import socketserver
+import threading
+import time
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubServer:
+    """Runs ``server`` on a daemon thread; use as a context manager"""
+
+    def __init__(self, server):
+        self.server = server
+        self.server.stub = self
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.messages = 0
+        self.connections = 0
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def count(self, requests=0, messages=0, connections=0):
+        with self.lock:
+            self.requests += requests
+            self.messages += messages
+            self.connections += connections
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class GmailStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.stub.count(connections=1)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.latency)
+        if self.path.startswith('/batch'):
+            self.reply_batch(body)
+        else:
+            self.server.stub.count(requests=1, messages=1)
+            self.reply('application/json', json.dumps({'id': f'stub-{self.server.stub.messages}'}).encode())
+
+    def reply_batch(self, body):
+        content_type = self.headers['Content-Type']
+        request = BytesParser().parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+        parts = request.get_payload()
+        self.server.stub.count(requests=1, messages=len(parts))
+        boundary = 'stub-batch-boundary'
+        response = []
+        for index, part in enumerate(parts):
+            content_id = part['Content-ID'].strip('<>')
+            response.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n'
+                f'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n'
+                f'{json.dumps({"id": f"stub-{index}"})}\r\n'
+            )
+        response.append(f'--{boundary}--\r\n')
+        self.reply(f'multipart/mixed; boundary={boundary}', ''.join(response).encode())
+
+    def reply(self, content_type, payload):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def gmail_stub(latency=0.0):
+    """A Gmail API stub answering single sends and batch requests"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GmailStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    return StubServer(server)
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        stub = self.server.stub
+        stub.count(connections=1)
+        self.say('220 stub ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.say('250 stub')
+            elif command == 'DATA':
+                self.say('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                time.sleep(self.server.latency)
+                stub.count(requests=1, messages=1)
+                self.say('250 OK')
+            elif command == 'QUIT':
+                self.say('221 Bye')
+                return
+            else:
+                self.say('250 OK')
+
+    def say(self, reply):
+        self.wfile.write(f'{reply}\r\n'.encode())
+
+
+def smtp_stub(latency=0.0):
+    """An SMTP stub accepting every message, with no TLS or auth"""
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    return StubServer(server)
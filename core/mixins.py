@@ -1,4 +1,11 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import permissions
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
 
 
 class IsAdminUserOrReadOnly(permissions.BasePermission):
@@ -28,4 +35,78 @@ class AdminOnlyMixin:
     """
     Mixin to restrict write access to admin users only.
     """
-    permission_classes = [IsAdminUserOrReadOnly]
\ No newline at end of file
+    permission_classes = [IsAdminUserOrReadOnly]
+
+
+class ConditionalGetMixin:
+    """
+    Mixin answering list and detail GETs with 304 Not Modified when the
+    client's validators still match.
+
+    Validators come from ``last_modified_field`` and the row count of the
+    filtered queryset, so nothing is serialized for an unchanged resource.
+    Changes to related rows shown in the payload must move that field.
+    Lists only send an ETag because a delete doesn't move Last-Modified.
+    Cursor pages skip the COUNT and are validated by their own rows, and
+    offset pages reuse the validators' count instead of counting again.
+    """
+    last_modified_field = 'updated_at'
+
+    def get_last_modified(self, instance):
+        return getattr(instance, self.last_modified_field)
+
+    def get_retrieve_data(self, instance):
+        return self.get_serializer(instance).data
+
+    def make_etag(self, request, *parts):
+        seed = [request.get_full_path(), request.user.is_staff, *parts]
+        return quote_etag(hashlib.md5(repr(seed).encode()).hexdigest())
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        paginator = self.paginator
+        if paginator is not None and getattr(paginator, 'uses_keyset', lambda request: False)(request):
+            # The page query runs either way, and its rows are all the page shows
+            page = self.paginate_queryset(queryset)
+            rows = [(row.pk, self.get_last_modified(row)) for row in page]
+            etag = self.make_etag(request, rows, paginator.has_next)
+        else:
+            validators = queryset.order_by().aggregate(
+                count=Count('pk'), last_modified=Max(self.last_modified_field)
+            )
+            etag = self.make_etag(request, validators['count'], validators['last_modified'])
+            page = None
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        # Serialized from the same filtered queryset, as filtering may be costly
+        if page is None:
+            if isinstance(paginator, LimitOffsetPagination):
+                # The validators counted the rows already
+                paginator.get_count = lambda queryset: validators['count']
+            page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(queryset, many=True).data)
+        response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = self.get_last_modified(instance)
+        etag = self.make_etag(request, last_modified)
+
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(self.get_retrieve_data(instance))
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
@@ -0,0 +1,122 @@
+import base64
+import json
+from collections import OrderedDict
+from functools import reduce
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .search import FullTextSearchFilter
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination that switches to keyset pagination when the
+    client sends ``?cursor=`` (an empty value starts at the first page).
+
+    Keyset pages filter on the last row seen instead of using OFFSET and
+    skip the COUNT(*), so deep pages cost the same as the first one and rows
+    inserted meanwhile never shift the page boundaries. The view's
+    ``keyset_ordering`` must end with a unique field, and a requested
+    ordering or ranked search is refused in keyset mode rather than
+    dropped. Subclasses set ``keyset_by_default`` to page by cursor
+    without the parameter.
+    """
+    cursor_query_param = 'cursor'
+    keyset_by_default = False
+    keyset_ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def uses_keyset(self, request):
+        return self.keyset_by_default or self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_keyset = self.uses_keyset(request)
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.check_ordering(request, view)
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = getattr(view, 'keyset_ordering', self.keyset_ordering)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        results = list(queryset[:self.limit + 1])
+        self.has_next = len(results) > self.limit
+        self.page = results[:self.limit]
+        return self.page
+
+    def check_ordering(self, request, view):
+        """Keyset pages follow keyset_ordering, which would replace ?ordering= and the search rank"""
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                param = backend.ordering_param
+            elif issubclass(backend, FullTextSearchFilter):
+                param = backend.search_param
+            else:
+                continue
+            if request.query_params.get(param):
+                raise ValidationError({
+                    param: f"Can't be combined with {self.cursor_query_param}, page with limit and offset instead."
+                })
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.use_keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        position = [getattr(last, field.lstrip('-')) for field in self.ordering]
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position))
+
+    def get_position_filter(self, position):
+        """
+        Rows strictly after ``position`` in lexicographic keyset order, e.g.
+        created_at < x OR (created_at = x AND id < y) for descending keys.
+        """
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{name}__{lookup}': position[index]})
+            for previous, value in zip(self.ordering[:index], position[:index]):
+                condition &= Q(**{previous.lstrip('-'): value})
+            conditions.append(condition)
+        return reduce(lambda left, right: left | right, conditions)
+
+    def encode_cursor(self, position):
+        # str() keeps full microsecond precision, which equality on the keys needs
+        data = json.dumps(position, default=str)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
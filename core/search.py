@@ -0,0 +1,149 @@
+import re
+import unicodedata
+
+from django.db import connection
+from rest_framework import filters
+
+# Harakat, Quranic annotation marks and the tatweel
+ARABIC_MARKS = re.compile('[\u0610-\u061a\u0640\u064b-\u065f\u0670\u06d6-\u06ed]')
+
+ARABIC_LETTERS = str.maketrans({
+    'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+    **{chr(0x06f0 + i): str(i) for i in range(10)},  # Extended Arabic-Indic digits
+})
+
+# Anything FTS5 would treat as query syntax
+FTS_SPECIAL = re.compile(r'[^\w\s]')
+
+SEARCH_INDEXES = []
+
+
+def normalize_text(value):
+    """
+    Fold text so Arabic and Latin spelling variants match each other.
+
+    Hamza and madda forms of alef collapse to a bare alef, taa marbuta to haa,
+    alef maksura to yaa, diacritics are dropped and digits become ASCII.
+    """
+    if not value:
+        return ""
+    # NFKD splits hamza/madda carriers and accented Latin letters into base + combining mark
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    value = ARABIC_MARKS.sub('', value)
+    return value.translate(ARABIC_LETTERS).casefold()
+
+
+class SearchIndex:
+    """
+    SQLite FTS5 index holding one normalized document per model row.
+
+    On other database backends every method is a no-op and
+    FullTextSearchFilter falls back to DRF's SearchFilter.
+    """
+    chunk_size = 2000
+
+    def __init__(self, table, model, document):
+        self.table = table
+        self.model = model
+        self.document = document
+        SEARCH_INDEXES.append(self)
+
+    @staticmethod
+    def is_supported():
+        return connection.vendor == 'sqlite'
+
+    def get_document(self, instance):
+        return normalize_text(' '.join(str(value) for value in self.document(instance) if value))
+
+    def index(self, instances):
+        """Insert or replace the documents of the given instances"""
+        if not self.is_supported():
+            return
+        rows = []
+        with connection.cursor() as cursor:
+            for instance in instances:
+                rows.append((instance.pk, self.get_document(instance)))
+                if len(rows) >= self.chunk_size:
+                    self._write(cursor, rows)
+                    rows = []
+            if rows:
+                self._write(cursor, rows)
+
+    def _write(self, cursor, rows):
+        cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk, _ in rows])
+        cursor.executemany(f'INSERT INTO {self.table}(rowid, document) VALUES (%s, %s)', rows)
+
+    def remove(self, pk):
+        if not self.is_supported():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [pk])
+
+    def rebuild(self, queryset=None):
+        if not self.is_supported():
+            return
+        if queryset is None:
+            queryset = self.model.objects.all()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        self.index(queryset.iterator(chunk_size=self.chunk_size))
+
+    def fill_if_empty(self):
+        """
+        Index every row when the index has no documents but the model has
+        rows, e.g. right after its migration created the table
+        """
+        if not self.is_supported() or self.table not in connection.introspection.table_names():
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT 1 FROM {self.table} LIMIT 1')
+            if cursor.fetchone() is not None or not self.model.objects.exists():
+                return False
+        self.rebuild()
+        return True
+
+    def build_match(self, query):
+        """Turn user input into an FTS5 prefix query matching every term"""
+        terms = FTS_SPECIAL.sub(' ', normalize_text(query)).split()
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query):
+        """Filter the queryset to matching rows, best matches first"""
+        match = self.build_match(query)
+        if not match:
+            return queryset
+        db_table = queryset.model._meta.db_table
+        pk_column = queryset.model._meta.pk.column
+        # A join lets FTS5 produce the matches and their bm25 rank in one pass
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = "{db_table}"."{pk_column}"', f'{self.table} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'{self.table}.rank'},
+            order_by=['search_rank'],
+        )
+
+
+def fill_empty_indexes(sender, **kwargs):
+    """post_migrate receiver filling the empty search indexes of the migrated app"""
+    for search_index in SEARCH_INDEXES:
+        if search_index.model._meta.app_label == sender.label and search_index.fill_if_empty():
+            print(f"✅ Indexed {search_index.model._meta.verbose_name_plural} in {search_index.table}")
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the view's ``search_index`` when the database
+    supports it, falling back to ``search_fields`` lookups otherwise.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_index = getattr(view, 'search_index', None)
+        terms = self.get_search_terms(request)
+        if search_index is None or not search_index.is_supported() or not terms:
+            return super().filter_queryset(request, queryset, view)
+        return search_index.search(queryset, ' '.join(terms))
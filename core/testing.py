@@ -0,0 +1,41 @@
+"""
+Fixtures shared by the apps' test modules.
+"""
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from src.apps.vehicles.models import Brand, Vehicle
+
+VEHICLE_DEFAULTS = {
+    'model': 'Land Cruiser',
+    'year': 2024,
+    'price': 100,
+    'body_type': 'SUV',
+    'color': 'White',
+    'mileage': 0,
+    'engine_type': 'gasoline',
+    'engine_capacity': 4.0,
+    'cylinders': 8,
+    'transmission': 'automatic',
+    'seats': 7,
+}
+
+
+def create_vehicle(brand=None, **kwargs):
+    """A vehicle with valid defaults; without a brand it goes to a shared "Toyota" one"""
+    if brand is None:
+        brand = Brand.objects.get_or_create(name="Toyota")[0]
+    return Vehicle.objects.create(brand=brand, **{**VEHICLE_DEFAULTS, **kwargs})
+
+
+def create_user(username, **kwargs):
+    return get_user_model().objects.create_user(username=username, password='x', **kwargs)
+
+
+def api_client(user=None):
+    """An API client, authenticated as ``user`` when one is given"""
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
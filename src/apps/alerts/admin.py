@@ -1 +1,60 @@
-# Register your models here.
+from django.contrib import admin
+from django.utils import timezone
+
+from .broadcasts import resume, start
+from .models import Broadcast, OutboxEmail, OutboxPush, OutboxStatus
+
+
+class OutboxAdmin(admin.ModelAdmin):
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('notification', 'claim_token', 'claimed_at', 'last_error', 'created_at', 'sent_at')
+    actions = ['requeue']
+
+    @admin.action(description="Send selected rows again")
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status=OutboxStatus.SENDING).update(
+            status=OutboxStatus.PENDING, attempts=0, next_attempt_at=timezone.now(), last_error='',
+        )
+        self.message_user(request, f"{updated} rows queued again.")
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(OutboxAdmin):
+    list_display = ('subject', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    search_fields = ('recipient', 'subject')
+
+
+@admin.register(OutboxPush)
+class OutboxPushAdmin(OutboxAdmin):
+    list_display = ('notification', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    search_fields = ('notification__title', 'notification__user__username')
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('title', 'segment', 'status', 'sent', 'total', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'segment')
+    search_fields = ('title',)
+    readonly_fields = (
+        'status', 'total', 'sent', 'last_error', 'created_by', 'created_at', 'started_at', 'finished_at',
+    )
+    actions = ['resume']
+
+    def get_readonly_fields(self, request, obj=None):
+        # A broadcast already sent can't be edited
+        if obj is not None:
+            return ('title', 'message', 'segment', *self.readonly_fields)
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        created = obj.pk is None
+        if created:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        if created:
+            start(obj)
+            self.message_user(request, "The broadcast is being sent in the background.")
+
+    @admin.action(description="Resume selected failed broadcasts")
+    def resume(self, request, queryset):
+        self.message_user(request, f"{resume(queryset)} broadcasts queued again.")
@@ -0,0 +1,25 @@
+from rest_framework import serializers
+
+from ..models import Broadcast, Notification
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'title', 'message', 'is_read', 'created_at']
+
+
+class MarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500)
+
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Broadcast
+        fields = [
+            'id', 'title', 'message', 'segment', 'status', 'total', 'sent', 'progress', 'last_error',
+            'created_at', 'started_at', 'finished_at',
+        ]
+        read_only_fields = ['status', 'total', 'sent', 'last_error', 'started_at', 'finished_at']
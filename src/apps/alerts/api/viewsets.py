@@ -0,0 +1,66 @@
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from core.pagination import KeysetPagination
+
+from .serializers import BroadcastSerializer, MarkReadSerializer, NotificationSerializer
+from ..broadcasts import start
+from ..models import Broadcast, Notification
+from ..unread import mark_read, unread_count
+
+
+class InboxPagination(KeysetPagination):
+    keyset_by_default = True
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The requesting user's notifications, newest first, paged by cursor
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['is_read']
+    pagination_class = InboxPagination
+    keyset_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        return Notification.objects.filter(user=self.request.user)
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        return Response({'unread_count': unread_count(request.user.pk)})
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = mark_read(request.user, serializer.validated_data['ids'])
+        return Response({'updated': updated, 'unread_count': unread_count(request.user.pk)})
+
+    @action(detail=False, methods=['post'], url_path='mark-all-read')
+    def mark_all_read(self, request):
+        updated = mark_read(request.user)
+        return Response({'updated': updated, 'unread_count': unread_count(request.user.pk)})
+
+
+class BroadcastViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Staff notifications to every user of a segment. Creating one answers
+    202 right away; the notifications are written in the background and
+    the broadcast's status, sent and progress show how far it got.
+    """
+    serializer_class = BroadcastSerializer
+    permission_classes = [permissions.IsAdminUser]
+    queryset = Broadcast.objects.all()
+
+    def perform_create(self, serializer):
+        start(serializer.save(created_by=self.request.user))
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
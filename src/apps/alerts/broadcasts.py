@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from src.apps.rental.models import Installment, Rental, RentalStatus
+from .models import Broadcast, BroadcastSegment, BroadcastStatus, Notification
+from .outbox import enqueue_notifications
+from .unread import count_created
+
+CHUNK_SIZE = getattr(settings, 'BROADCAST_CHUNK_SIZE', 2000)
+# Broadcasts written at the same time by one process; more wait in the pool's queue
+WORKERS = getattr(settings, 'BROADCAST_WORKERS', 1)
+# A running broadcast that made no progress for this long lost its worker,
+# e.g. to a restart, and is picked up again by the resume_broadcasts job
+STALE_AFTER = timedelta(seconds=getattr(settings, 'BROADCAST_STALE_AFTER', 10 * 60))
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='broadcast')
+
+
+def recipients(segment, today=None):
+    """Active users of a segment, as one query"""
+    today = today or timezone.localdate()
+    if segment == BroadcastSegment.ACTIVE_RENTALS:
+        members = Rental.objects.filter(user=OuterRef('pk'), status=RentalStatus.ACTIVE)
+    elif segment == BroadcastSegment.OVERDUE_INSTALLMENTS:
+        members = Installment.objects.filter(user=OuterRef('pk'), is_paid=False, due_date__lt=today)
+    else:
+        raise ValueError(f"Unknown segment {segment!r}")
+    return get_user_model().objects.filter(Exists(members), is_active=True)
+
+
+def start(broadcast):
+    """Write the broadcast on the background pool once the current transaction commits"""
+    transaction.on_commit(lambda: _pool.submit(_run_in_background, broadcast.pk))
+
+
+def _run_in_background(broadcast_id):
+    try:
+        run(broadcast_id)
+    finally:
+        # This thread's connections would otherwise stay open until it exits
+        connections.close_all()
+
+
+def claim(broadcast_id):
+    """Mark a pending or stale broadcast running; False when another worker has it"""
+    now = timezone.now()
+    return bool(Broadcast.objects.filter(
+        Q(status=BroadcastStatus.PENDING) | Q(status=BroadcastStatus.RUNNING, updated_at__lt=now - STALE_AFTER),
+        pk=broadcast_id,
+    ).update(status=BroadcastStatus.RUNNING, updated_at=now))
+
+
+def run(broadcast_id):
+    """
+    Notify the users of a broadcast's segment in id order, CHUNK_SIZE at
+    a time: each chunk's notifications, their emails and pushes, unread
+    counters and the broadcast's progress are written in one transaction,
+    so a resumed run carries on after the last committed chunk.
+
+    Returns the number of users notified so far, or None when the
+    broadcast was not claimed.
+    """
+    if not claim(broadcast_id):
+        return None
+    broadcast = Broadcast.objects.get(pk=broadcast_id)
+    try:
+        users = recipients(broadcast.segment).order_by('pk').only('pk', 'email')
+        if broadcast.started_at is None:
+            broadcast.total = users.count()
+            broadcast.started_at = timezone.now()
+            broadcast.save(update_fields=['total', 'started_at', 'updated_at'])
+        while True:
+            chunk = list(users.filter(pk__gt=broadcast.last_user_id)[:CHUNK_SIZE])
+            if not chunk:
+                break
+            with transaction.atomic():
+                notifications = Notification.objects.bulk_create([
+                    Notification(user=user, title=broadcast.title, message=broadcast.message) for user in chunk
+                ])
+                enqueue_notifications(notifications)
+                count_created(notifications)
+                Broadcast.objects.filter(pk=broadcast.pk).update(
+                    sent=broadcast.sent + len(chunk), last_user_id=chunk[-1].pk, updated_at=timezone.now(),
+                )
+            broadcast.sent += len(chunk)
+            broadcast.last_user_id = chunk[-1].pk
+    except Exception as e:
+        print(f"Broadcast {broadcast.pk} failed: {e}")
+        Broadcast.objects.filter(pk=broadcast.pk).update(
+            status=BroadcastStatus.FAILED, last_error=str(e) or e.__class__.__name__, updated_at=timezone.now(),
+        )
+        return broadcast.sent
+    broadcast.status = BroadcastStatus.DONE
+    broadcast.finished_at = timezone.now()
+    broadcast.last_error = ''
+    broadcast.save(update_fields=['status', 'finished_at', 'last_error', 'updated_at'])
+    return broadcast.sent
+
+
+def resume(queryset):
+    """Queue failed broadcasts again; returns how many were queued"""
+    ids = list(queryset.filter(status=BroadcastStatus.FAILED).values_list('pk', flat=True))
+    Broadcast.objects.filter(pk__in=ids).update(status=BroadcastStatus.PENDING, updated_at=timezone.now())
+    for broadcast_id in ids:
+        transaction.on_commit(lambda broadcast_id=broadcast_id: _pool.submit(_run_in_background, broadcast_id))
+    return len(ids)
+
+
+def resume_stale():
+    """Finish on this thread the broadcasts whose worker went away; returns how many were finished"""
+    before = timezone.now() - STALE_AFTER
+    ids = Broadcast.objects.filter(
+        status__in=[BroadcastStatus.PENDING, BroadcastStatus.RUNNING], updated_at__lt=before,
+    ).values_list('pk', flat=True)
+    return sum(run(broadcast_id) is not None for broadcast_id in list(ids))
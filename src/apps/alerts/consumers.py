@@ -0,0 +1,162 @@
+import asyncio
+import json
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.utils import timezone
+
+from .events import group_name
+from .models import UserEvent
+
+# Wake-ups within this many seconds are answered with one frame
+COALESCE_DELAY = getattr(settings, 'USER_EVENTS_COALESCE_DELAY', 0.2)
+# Wake-ups only reach connections in the process that published, since the
+# channel layer is in memory; events from cron jobs and workers are read
+# on this timer instead
+POLL_INTERVAL = getattr(settings, 'USER_EVENTS_POLL_INTERVAL', 5)
+PAGE_SIZE = 200
+# Event ids are taken at insert but become visible at commit, so an event
+# can show up after higher ids were sent. Events created within this many
+# seconds are read again behind the cursor; it must outlast transactions.
+REREAD_WINDOW = timedelta(seconds=getattr(settings, 'USER_EVENTS_REREAD_WINDOW', 30))
+
+
+def coalesce(events):
+    """Fold the unread count changes of a frame into one event, after the others"""
+    unread = [event for event in events if event['kind'] == 'unread_count']
+    if len(unread) < 2:
+        return events
+    delta = sum(event['payload']['delta'] for event in unread)
+    others = [event for event in events if event['kind'] != 'unread_count']
+    return others + [{**unread[-1], 'payload': {'delta': delta}}]
+
+
+class UserEventsConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Streams the connected user's events: new notifications, unread count
+    changes, rental and upholstery booking status changes.
+
+    Connect with ``?last_event_id=<id>`` (or send ``{"type": "resume",
+    "last_event_id": <id>}``) to first get the events missed since then;
+    without it the stream starts at the latest event. Each frame carries
+    ``last_event_id`` to resume from.
+
+    Events published by other processes are read every POLL_INTERVAL
+    seconds. Events committed late, below ids already sent, are sent when
+    they show up; the connection skips ids it sent already. A resumed stream
+    also repeats the events of the last REREAD_WINDOW before its cursor,
+    which clients skip by id.
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+        self.group_name = group_name(self.user.pk)
+        self.flush_task = None
+        self.poll_task = None
+        self.lock = asyncio.Lock()
+        # Ids sent within REREAD_WINDOW, with their creation time
+        self.recent = {}
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        last_event_id = self.parse_event_id(self.query_params().get('last_event_id'))
+        if last_event_id is None:
+            self.last_event_id, self.recent = await self.current_position()
+        else:
+            self.last_event_id = last_event_id
+            await self.flush()
+        self.poll_task = asyncio.ensure_future(self.poll())
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'group_name', None):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        for task in (getattr(self, 'flush_task', None), getattr(self, 'poll_task', None)):
+            if task:
+                task.cancel()
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'resume':
+            last_event_id = self.parse_event_id(content.get('last_event_id'))
+            if last_event_id is None:
+                await self.send_json({'type': 'error', 'detail': "last_event_id must be a non-negative integer."})
+                return
+            async with self.lock:
+                self.last_event_id = last_event_id
+            await self.flush()
+
+    async def events_available(self, event):
+        # A burst of wake-ups schedules a single read
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        await asyncio.sleep(COALESCE_DELAY)
+        await self.flush()
+
+    async def poll(self):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            await self.flush()
+
+    async def flush(self):
+        async with self.lock:
+            late = await self.late_events(self.last_event_id, set(self.recent))
+            while True:
+                events = await self.events_after(self.last_event_id)
+                if not events and not late:
+                    break
+                if events:
+                    self.last_event_id = events[-1]['id']
+                events, late = late + events, []
+                await self.send_json({'type': 'events', 'events': coalesce(events), 'last_event_id': self.last_event_id})
+                self.recent.update((event['id'], event['created_at']) for event in events)
+                if len(events) < PAGE_SIZE:
+                    break
+            since = timezone.now() - REREAD_WINDOW
+            self.recent = {event_id: created_at for event_id, created_at in self.recent.items() if created_at >= since}
+
+    @classmethod
+    async def encode_json(cls, content):
+        return json.dumps(content, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+    def query_params(self):
+        query_string = self.scope.get('query_string', b'').decode()
+        return dict(part.split('=', 1) for part in query_string.split('&') if '=' in part)
+
+    @staticmethod
+    def parse_event_id(value):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return None
+        return value if value >= 0 else None
+
+    @database_sync_to_async
+    def current_position(self):
+        """The latest event id, and the recent events a new stream starts past"""
+        events = UserEvent.objects.filter(user=self.user)
+        latest = events.aggregate(latest=Max('id'))['latest'] or 0
+        recent = events.filter(id__lte=latest, created_at__gte=timezone.now() - REREAD_WINDOW)
+        return latest, dict(recent.values_list('id', 'created_at'))
+
+    @database_sync_to_async
+    def late_events(self, last_event_id, sent_ids):
+        """Recent events at or below the cursor that weren't sent, e.g. committed after higher ids"""
+        events = UserEvent.objects.filter(
+            user=self.user, id__lte=last_event_id, created_at__gte=timezone.now() - REREAD_WINDOW,
+        ).order_by('id').values('id', 'kind', 'payload', 'created_at')
+        return [event for event in events if event['id'] not in sent_ids]
+
+    @database_sync_to_async
+    def events_after(self, last_event_id):
+        return list(
+            UserEvent.objects.filter(user=self.user, id__gt=last_event_id).order_by('id')
+            .values('id', 'kind', 'payload', 'created_at')[:PAGE_SIZE]
+        )
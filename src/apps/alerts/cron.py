@@ -0,0 +1,19 @@
+from django.core.management import call_command
+
+from .broadcasts import resume_stale
+from .events import prune_events
+
+
+def prune_user_events():
+    deleted = prune_events()
+    print(f"✅ Pruned {deleted} user events")
+
+
+def resume_broadcasts():
+    resumed = resume_stale()
+    print(f"✅ Resumed {resumed} broadcasts")
+
+
+def send_outbox():
+    """One pass of the send_outbox worker; overlapping runs claim different rows"""
+    call_command('send_outbox', once=True)
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserEvent
+
+# How long events are kept for clients resuming after a disconnect
+RETENTION = timedelta(days=getattr(settings, 'USER_EVENTS_RETENTION_DAYS', 7))
+
+
+def group_name(user_id):
+    return f'user-events-{user_id}'
+
+
+def publish(events):
+    """
+    Record ``(user_id, kind, payload)`` events and, once the transaction
+    commits, tell the users' connections to read them. Rolled back events
+    are never seen.
+    """
+    events = [(user_id, kind, payload) for user_id, kind, payload in events if user_id is not None]
+    if not events:
+        return []
+    rows = UserEvent.objects.bulk_create([
+        UserEvent(user_id=user_id, kind=kind, payload=payload) for user_id, kind, payload in events
+    ])
+    user_ids = {user_id for user_id, _kind, _payload in events}
+    transaction.on_commit(lambda: wake(user_ids))
+    return rows
+
+
+def wake(user_ids):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    for user_id in user_ids:
+        try:
+            async_to_sync(layer.group_send)(group_name(user_id), {'type': 'events.available'})
+        except Exception as e:
+            # Connections still catch up on their next poll or reconnect
+            print(f"Error waking event listeners of user {user_id}: {e}")
+
+
+def prune_events():
+    """Delete events older than the retention; returns how many"""
+    deleted, _ = UserEvent.objects.filter(created_at__lt=timezone.now() - RETENTION).delete()
+    return deleted
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from google.auth.credentials import AnonymousCredentials
+
+from core.gmail import GmailClient, SMTPSender
+from core.mail_stubs import gmail_stub, smtp_stub
+
+
+class Command(BaseCommand):
+    help = 'Compares per-recipient and batched email sending against local Gmail and SMTP stubs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=500)
+        parser.add_argument('--latency', type=float, default=0.02, help='Seconds the stubs take per request')
+
+    def handle(self, *args, **options):
+        messages = [
+            {'to_email': f'user{i}@example.com', 'subject': 'Benchmark', 'message_html': f'<p>Message {i}</p>'}
+            for i in range(options['emails'])
+        ]
+
+        with gmail_stub(options['latency']) as stub:
+            root_url = f'http://127.0.0.1:{stub.address[1]}/'
+
+            def per_recipient():
+                # What send_gmail used to do: a new client and service for every recipient
+                return [
+                    GmailClient(root_url=root_url, credentials=AnonymousCredentials()).send_many([message])[0]
+                    for message in messages
+                ]
+
+            client = GmailClient(root_url=root_url, credentials=AnonymousCredentials())
+            self.measure('gmail per recipient', stub, per_recipient)
+            self.measure('gmail shared client, batched', stub, lambda: client.send_many(messages))
+
+        with smtp_stub(options['latency']) as stub:
+            server = {'host': '127.0.0.1', 'port': stub.address[1], 'username': '', 'password': ''}
+
+            def per_connection():
+                results = []
+                for message in messages:
+                    sender = SMTPSender(**server)
+                    results += sender.send_many([message])
+                    sender.close()
+                return results
+
+            sender = SMTPSender(**server)
+            self.measure('smtp connection per email', stub, per_connection)
+            self.measure('smtp persistent connection', stub, lambda: sender.send_many(messages))
+            sender.close()
+
+    def measure(self, label, stub, send):
+        requests, connections = stub.requests, stub.connections
+        started = time.perf_counter()
+        sent = sum(result['success'] for result in send())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{label}: {sent} emails in {elapsed * 1000:.0f} ms ({sent / elapsed:.0f}/s), "
+            f"{stub.requests - requests} requests, {stub.connections - connections} connections"
+        )
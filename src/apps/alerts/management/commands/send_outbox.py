@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...outbox import OutboxWorker, outbox_stats
+from ...push import PushWorker
+
+WORKERS = {
+    'email': OutboxWorker,
+    'push': PushWorker,
+}
+
+
+class Command(BaseCommand):
+    help = 'Sends queued notification emails and pushes from the outbox with a bounded pool of threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--channel', choices=[*WORKERS, 'all'], default='all')
+        parser.add_argument('--workers', type=int, default=4, help='Sends in flight at the same time, per channel')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--idle-sleep', type=float, default=2.0, help='Seconds to wait when nothing is due')
+        parser.add_argument('--once', action='store_true', help='Exit once nothing is due')
+
+    def handle(self, *args, **options):
+        channels = list(WORKERS) if options['channel'] == 'all' else [options['channel']]
+        workers = {
+            channel: WORKERS[channel](workers=options['workers'], batch_size=options['batch_size'])
+            for channel in channels
+        }
+        try:
+            while True:
+                claimed = 0
+                for channel, worker in workers.items():
+                    if worker.run_batch():
+                        claimed += 1
+                        self.report(channel, worker)
+                if claimed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['idle_sleep'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for worker in workers.values():
+                worker.close()
+        for channel, worker in workers.items():
+            stats = outbox_stats(worker.model)
+            self.stdout.write(
+                f"✅ {channel} outbox: {stats['pending']} pending, {stats['dead']} dead, "
+                f"oldest pending {stats['oldest_pending_seconds']:.0f} s"
+            )
+
+    def report(self, channel, worker):
+        metrics = worker.metrics
+        extra = ''.join(f", {metrics[name]} {name}" for name in ('calls', 'tokens', 'pruned') if name in metrics)
+        self.stdout.write(
+            f"{channel}: sent {metrics['sent']}, retried {metrics['retried']}, dead {metrics['dead']} "
+            f"in {metrics['batches']} batches{extra}, {worker.throughput():.1f}/s"
+        )
@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
-from django.db import models
-
-from core.utilis import send_notification_email
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
 
 
 # Create your models here.
@@ -21,13 +21,156 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']  # Newest notifications first
+        indexes = [
+            # A user's inbox, unread first or filtered on is_read, newest first
+            models.Index(fields=['user', 'is_read', 'created_at']),
+        ]
 
     def save(self, *args, **kwargs):
         """
-        Override save method to ensure that notifications are created with a user.
+        Save the notification and queue its email in the same transaction.
         """
+        from .outbox import enqueue_notifications
+
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                enqueue_notifications([self])
+
+
+class UnreadCounter(models.Model):
+    """
+    Unread notifications of a user, moved by alerts.unread as notifications
+    are created, read and deleted.
+    """
+    user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count} unread"
+
+
+class UserEvent(models.Model):
+    """
+    Something a user's open WebSocket connections are told about. The id
+    is the event id clients resume from after reconnecting.
+    """
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=30)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Events of a user after the last id a client saw
+        indexes = [models.Index(fields=['user', 'id'])]
+
+    def __str__(self):
+        return f"{self.kind} for {self.user_id}"
+
+
+class OutboxStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    SENDING = 'sending', 'Sending'
+    SENT = 'sent', 'Sent'
+    DEAD = 'dead', 'Dead'
+
+
+class OutboxItem(models.Model):
+    """
+    Delivery state of something the outbox worker (``send_outbox``) sends.
+    """
+    status = models.CharField(max_length=10, choices=OutboxStatus.choices, default=OutboxStatus.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.UUIDField(null=True, blank=True, editable=False)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+        # The worker picks due rows of a status in next_attempt_at order
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+
+class OutboxEmail(OutboxItem):
+    """
+    An email waiting to be sent.
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails')
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    html = models.TextField()
+    attachments = models.JSONField(default=list, blank=True)
+    # Held back to go out in one digest email with the recipient's other
+    # digest rows; the html is rendered when it's sent
+    digest = models.BooleanField(default=False)
+
+    class Meta(OutboxItem.Meta):
+        indexes = [
+            *OutboxItem.Meta.indexes,
+            # A recipient's recent and held back emails
+            models.Index(fields=['recipient', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipient} ({self.status})"
+
+
+class OutboxPush(OutboxItem):
+    """
+    A notification waiting to be pushed to its user's devices.
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='pushes')
+
+    def __str__(self):
+        return f"Push of {self.notification_id} ({self.status})"
+
+
+class BroadcastSegment(models.TextChoices):
+    ACTIVE_RENTALS = 'active_rentals', 'Customers with an active rental'
+    OVERDUE_INSTALLMENTS = 'overdue_installments', 'Customers with an overdue installment'
+
+
+class BroadcastStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    RUNNING = 'running', 'Running'
+    DONE = 'done', 'Done'
+    FAILED = 'failed', 'Failed'
+
+
+class Broadcast(models.Model):
+    """
+    One notification sent by staff to every user of a segment, written in
+    the background by alerts.broadcasts chunk by chunk.
+    """
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    segment = models.CharField(max_length=30, choices=BroadcastSegment.choices)
+    status = models.CharField(max_length=10, choices=BroadcastStatus.choices, default=BroadcastStatus.PENDING)
+    # Users in the segment when it started, and notified so far
+    total = models.PositiveIntegerField(null=True, blank=True)
+    sent = models.PositiveIntegerField(default=0)
+    # Users are notified in id order; a resumed run carries on after this one
+    last_user_id = models.BigIntegerField(default=0, editable=False)
+    last_error = models.TextField(blank=True)
+    created_by = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.title} to {self.segment} ({self.status})"
 
-        super().save(*args, **kwargs)
-        send_notification_email(self.title, "email.html", {
-            "message": self.message
-        }, [self.user.email])
+    @property
+    def progress(self):
+        """Share of the segment notified, from 0 to 1, or None before it started"""
+        if self.total is None:
+            return None
+        return min(self.sent / self.total, 1) if self.total else 1
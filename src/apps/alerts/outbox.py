@@ -0,0 +1,290 @@
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Min, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from fcm_django.models import FCMDevice
+
+from .events import publish
+from .models import Notification, OutboxEmail, OutboxPush, OutboxStatus
+
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 6)
+# Retries wait RETRY_BASE, 2 * RETRY_BASE, 4 * RETRY_BASE... seconds, up to RETRY_MAX
+RETRY_BASE = getattr(settings, 'OUTBOX_RETRY_BASE', 30)
+RETRY_MAX = getattr(settings, 'OUTBOX_RETRY_MAX', 60 * 60)
+# A claimed email not finished within the lease is picked up again, e.g.
+# after its worker was killed
+CLAIM_LEASE = timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_LEASE', 5 * 60))
+# A notification email arriving within this many seconds of another one to
+# the same address, or with one of these titles, waits this long and goes
+# out in one digest with the others held back meanwhile
+DIGEST_WINDOW = timedelta(seconds=getattr(settings, 'NOTIFICATION_DIGEST_WINDOW', 10 * 60))
+DIGEST_TITLES = frozenset(getattr(settings, 'NOTIFICATION_DIGEST_TITLES', ()))
+DIGEST_SUBJECT = "لديك {count} إشعارات جديدة"
+
+
+def get_sender():
+    """
+    The function delivering a list of emails, each a dict of
+    core.gmail.send_gmail's keyword arguments; it returns one result dict
+    per email, like send_gmail's
+    """
+    return import_string(getattr(settings, 'OUTBOX_EMAIL_SENDER', 'core.gmail.send_email_batch'))
+
+
+def enqueue(subject, html, recipients, attachments=None, notification=None):
+    """Queue one email per recipient; call inside the transaction writing the data it's about"""
+    return OutboxEmail.objects.bulk_create([
+        OutboxEmail(
+            notification=notification, recipient=recipient, subject=subject, html=html,
+            attachments=list(attachments or []),
+        )
+        for recipient in recipients if recipient
+    ])
+
+
+def render_many(template_name, contexts):
+    """Render a template once per distinct context; ``contexts`` are ``{'message': ...}`` dicts"""
+    rendered = {}
+    for context in contexts:
+        if context['message'] not in rendered:
+            rendered[context['message']] = render_to_string(template_name, context)
+    return [rendered[context['message']] for context in contexts]
+
+
+def enqueue_notifications(notifications, template_name="email.html"):
+    """
+    Queue the email of each notification whose user has an address and
+    its push when the user has an active device, and publish it to the
+    user's open connections.
+
+    Emails to an address that got one within DIGEST_WINDOW, that appears
+    more than once here, or with a DIGEST_TITLES title are held back for
+    a digest instead.
+    """
+    now = timezone.now()
+    mailed = [notification for notification in notifications if notification.user.email]
+    recipients = Counter(notification.user.email for notification in mailed)
+    recent = set(OutboxEmail.objects.filter(
+        recipient__in=recipients, notification__isnull=False, created_at__gte=now - DIGEST_WINDOW,
+    ).values_list('recipient', flat=True).distinct()) if recipients else set()
+    digest = [
+        notification.title in DIGEST_TITLES or recipients[notification.user.email] > 1
+        or notification.user.email in recent
+        for notification in mailed
+    ]
+    html = render_many(template_name, [
+        {"message": notification.message} for notification, held in zip(mailed, digest) if not held
+    ])
+    html.reverse()
+    emails = OutboxEmail.objects.bulk_create([
+        OutboxEmail(
+            notification=notification, recipient=notification.user.email, subject=notification.title,
+            html='' if held else html.pop(), digest=held, next_attempt_at=now + DIGEST_WINDOW if held else now,
+        )
+        for notification, held in zip(mailed, digest)
+    ])
+    with_devices = set(FCMDevice.objects.filter(
+        user_id__in={notification.user_id for notification in notifications}, active=True,
+    ).values_list('user_id', flat=True).distinct())
+    OutboxPush.objects.bulk_create([
+        OutboxPush(notification=notification) for notification in notifications if notification.user_id in with_devices
+    ])
+    publish([
+        (notification.user_id, 'notification', {
+            'id': notification.pk, 'title': notification.title, 'message': notification.message,
+            'created_at': notification.created_at,
+        })
+        for notification in notifications
+    ])
+    return emails
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX))
+
+
+def due(now):
+    """Pending emails whose retry time has come, and claims whose lease ran out"""
+    return Q(status=OutboxStatus.PENDING, next_attempt_at__lte=now) | Q(
+        status=OutboxStatus.SENDING, claimed_at__lt=now - CLAIM_LEASE
+    )
+
+
+def claim(model, batch_size):
+    """
+    Claim up to ``batch_size`` due rows of an outbox model for this worker.
+
+    The claim is a conditional update, so rows another worker took between
+    the select and the update are left out.
+    """
+    now = timezone.now()
+    ids = list(model.objects.filter(due(now)).order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4()
+    model.objects.filter(due(now), pk__in=ids).update(status=OutboxStatus.SENDING, claim_token=token, claimed_at=now)
+    return list(model.objects.filter(claim_token=token))
+
+
+def deliver(sender, messages):
+    """Send messages in one call; returns the error of each, or None for those that went out"""
+    try:
+        results = sender(messages)
+    except Exception as e:
+        return [str(e) or e.__class__.__name__] * len(messages)
+    return [None if result.get('success') else result.get('error') or "Failed to send email" for result in results]
+
+
+class OutboxWorker:
+    """
+    Drains the email outbox in batches with a bounded pool of sending threads.
+
+    Held back digest emails of a recipient are claimed together and sent
+    as one email. The messages of a batch are split in one chunk per
+    thread and each chunk goes to the sender in one call; claiming and
+    recording the results happen on the calling thread, a few queries per
+    batch. Failed rows are retried with exponential backoff and marked
+    dead after MAX_ATTEMPTS.
+    """
+    model = OutboxEmail
+
+    def __init__(self, workers=4, batch_size=100, sender=None):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.sender = sender or self.get_sender()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbox')
+        self.metrics = {'batches': 0, 'sent': 0, 'retried': 0, 'dead': 0}
+        self.started = time.monotonic()
+
+    def get_sender(self):
+        return get_sender()
+
+    def run_batch(self):
+        """Send one batch; returns the number of rows claimed"""
+        items = self.claim()
+        if items:
+            self.record(items, self.deliver(items))
+        return len(items)
+
+    def claim(self):
+        """
+        Claim a batch, plus the other held back digest emails of the
+        recipients it has digest emails for. Digest emails backing off
+        after a failed send wait for their retry time.
+        """
+        emails = claim(self.model, self.batch_size)
+        recipients = {email.recipient for email in emails if email.digest}
+        if recipients:
+            token = emails[0].claim_token
+            OutboxEmail.objects.filter(
+                Q(attempts=0) | Q(next_attempt_at__lte=emails[0].claimed_at),
+                status=OutboxStatus.PENDING, digest=True, recipient__in=recipients,
+            ).update(status=OutboxStatus.SENDING, claim_token=token, claimed_at=emails[0].claimed_at)
+            emails = list(OutboxEmail.objects.filter(claim_token=token))
+        return emails
+
+    def deliver(self, emails):
+        """The error of each email, or None for those that went out"""
+        groups = [[email] for email in emails if not email.digest]
+        digests = defaultdict(list)
+        for email in emails:
+            if email.digest:
+                digests[email.recipient].append(email)
+        groups += digests.values()
+        messages = self.messages(groups)
+
+        # One sender call per pool thread, e.g. one Gmail batch request each
+        size = -(-len(messages) // self.workers)
+        chunks = [messages[start:start + size] for start in range(0, len(messages), size)]
+        group_errors = [error for chunk in self.pool.map(lambda chunk: deliver(self.sender, chunk), chunks) for error in chunk]
+        errors = {email.pk: error for group, error in zip(groups, group_errors) for email in group}
+        return [errors[email.pk] for email in emails]
+
+    def messages(self, groups, template_name="email.html"):
+        """One message per group; digest groups are rendered into one email, once per distinct text"""
+        notifications = Notification.objects.in_bulk({
+            email.notification_id for group in groups for email in group if email.digest and email.notification_id
+        })
+        digests = []
+        for group in groups:
+            if group[0].digest:
+                texts = []
+                for email in sorted(group, key=lambda email: email.created_at):
+                    notification = notifications.get(email.notification_id)
+                    texts.append(f"{email.subject}\n{notification.message}" if notification else email.subject)
+                digests.append({"message": "\n\n".join(texts)})
+        rendered = iter(render_many(template_name, digests))
+        return [
+            {
+                'to_email': group[0].recipient,
+                'subject': DIGEST_SUBJECT.format(count=len(group)) if len(group) > 1 else group[0].subject,
+                'message_html': next(rendered) if group[0].digest else group[0].html,
+                'file_paths': [path for email in group for path in email.attachments],
+            }
+            for group in groups
+        ]
+
+    def record(self, items, errors):
+        """
+        Write the results of claimed rows. Rows reclaimed by another worker
+        after this one's lease ran out have a new claim token and are left
+        to that worker.
+        """
+        now = timezone.now()
+        tokens = defaultdict(list)
+        for item in items:
+            tokens[item.claim_token].append(item)
+        for item, error in zip(items, errors):
+            item.attempts += 1
+            item.claim_token = item.claimed_at = None
+            if error is None:
+                item.status = OutboxStatus.SENT
+                item.sent_at = now
+                item.last_error = ''
+                self.metrics['sent'] += 1
+            elif item.attempts >= MAX_ATTEMPTS:
+                item.status = OutboxStatus.DEAD
+                item.last_error = error
+                self.metrics['dead'] += 1
+            else:
+                item.status = OutboxStatus.PENDING
+                item.next_attempt_at = now + retry_delay(item.attempts)
+                item.last_error = error
+                self.metrics['retried'] += 1
+        updated = 0
+        for token, claimed in tokens.items():
+            updated += self.model.objects.filter(claim_token=token).bulk_update(claimed, [
+                'status', 'attempts', 'next_attempt_at', 'claim_token', 'claimed_at', 'last_error', 'sent_at',
+            ])
+        if updated < len(items):
+            print(f"{len(items) - updated} outbox rows were reclaimed by another worker before their results were saved")
+        self.metrics['batches'] += 1
+
+    def drain(self):
+        """Send batches until nothing is due"""
+        while self.run_batch():
+            pass
+
+    def throughput(self):
+        """Rows sent per second since the worker started"""
+        return self.metrics['sent'] / max(time.monotonic() - self.started, 1e-9)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def outbox_stats(model=OutboxEmail):
+    """Rows of an outbox per status and the age in seconds of the oldest pending one"""
+    counts = dict(model.objects.order_by().values_list('status').annotate(total=Count('pk')))
+    oldest = model.objects.filter(status=OutboxStatus.PENDING).aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        **{status: counts.get(status, 0) for status in OutboxStatus.values},
+        'oldest_pending_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0,
+    }
@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from fcm_django.models import FCMDevice
+from firebase_admin import messaging
+
+from .models import Notification, OutboxPush
+from .outbox import OutboxWorker, claim
+
+# Tokens FCM accepts in one multicast call
+MULTICAST_LIMIT = 500
+
+
+def send_multicast(tokens, title, body, data=None):
+    """
+    Push one notification to up to MULTICAST_LIMIT tokens; returns
+    firebase's SendResponse of each token
+    """
+    message = messaging.MulticastMessage(
+        tokens=tokens, notification=messaging.Notification(title=title, body=body), data=data,
+    )
+    return messaging.send_each_for_multicast(message).responses
+
+
+def get_push_sender():
+    """The function pushing to many tokens, called like send_multicast"""
+    return import_string(getattr(settings, 'PUSH_SENDER', 'src.apps.alerts.push.send_multicast'))
+
+
+class PushWorker(OutboxWorker):
+    """
+    Pushes queued notifications to their users' active FCM devices.
+
+    Notifications with the same title and message share multicast calls
+    of up to MULTICAST_LIMIT tokens, spread over the pool. Tokens FCM
+    reports as unregistered are deactivated through fcm_django, which
+    deletes them with DELETE_INACTIVE_DEVICES. A push fails only when
+    none of its tokens got it and some failed for another reason.
+    """
+    model = OutboxPush
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics.update({'calls': 0, 'tokens': 0, 'pruned': 0})
+
+    def get_sender(self):
+        return get_push_sender()
+
+    def claim(self):
+        return claim(self.model, self.batch_size)
+
+    def deliver(self, pushes):
+        notifications = Notification.objects.in_bulk({push.notification_id for push in pushes})
+        tokens = defaultdict(list)
+        for user_id, token in FCMDevice.objects.filter(
+            user_id__in={notification.user_id for notification in notifications.values()}, active=True,
+        ).values_list('user_id', 'registration_id'):
+            tokens[user_id].append(token)
+
+        # (title, message) -> [(push id, token)]
+        groups = defaultdict(list)
+        for push in pushes:
+            notification = notifications.get(push.notification_id)
+            if notification is not None:
+                for token in tokens[notification.user_id]:
+                    groups[notification.title, notification.message].append((push.pk, token))
+        calls = [
+            (title, message, targets[start:start + MULTICAST_LIMIT])
+            for (title, message), targets in groups.items()
+            for start in range(0, len(targets), MULTICAST_LIMIT)
+        ]
+        targets = [target for _title, _message, call_targets in calls for target in call_targets]
+        responses = [response for call_responses in self.pool.map(self.multicast, calls) for response in call_responses]
+        pruned = set(FCMDevice.objects.all().deactivate_devices_with_error_results(
+            [token for _push_id, token in targets], responses,
+        ))
+
+        delivered, errors = set(), {}
+        for (push_id, token), response in zip(targets, responses):
+            if response.success:
+                delivered.add(push_id)
+            elif token not in pruned:
+                errors.setdefault(push_id, str(response.exception))
+        self.metrics['calls'] += len(calls)
+        self.metrics['tokens'] += len(targets)
+        self.metrics['pruned'] += len(pruned)
+        return [None if push.pk in delivered else errors.get(push.pk) for push in pushes]
+
+    def multicast(self, call):
+        title, message, targets = call
+        try:
+            return self.sender([token for _push_id, token in targets], title, message)
+        except Exception as e:
+            return [messaging.SendResponse(None, e)] * len(targets)
@@ -1 +1,565 @@
-# Create your tests here.
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.models.signals import pre_save
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from fcm_django.models import FCMDevice
+from firebase_admin import messaging
+from google.auth.credentials import AnonymousCredentials
+from google.oauth2.credentials import Credentials
+
+from config.routing import websocket_urlpatterns
+from core import gmail as gmail_module
+from core.gmail import GmailClient, GmailUnavailable, SMTPSender
+from core.mail_stubs import gmail_stub, smtp_stub
+from core.testing import api_client, create_user, create_vehicle
+from src.apps.rental.models import Installment, Rental
+from . import broadcasts, consumers, cron, outbox
+from .events import wake
+from .models import Broadcast, Notification, OutboxEmail, OutboxPush, UnreadCounter, UserEvent
+from .push import PushWorker
+from .unread import count_created, unread_count
+
+
+class StubSender:
+    """Records sent emails in place of Gmail; addresses in ``failing`` fail"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def __call__(self, messages):
+        results = []
+        for message in messages:
+            if message['to_email'] in self.failing:
+                results.append({'success': False, 'error': "Mailbox unavailable"})
+                continue
+            with self.lock:
+                self.sent.append(message['to_email'])
+            results.append({'success': True, 'message_id': str(len(self.sent))})
+        return results
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('renter', email='renter@example.com')
+        self.other = create_user('other', email='bounce@example.com')
+
+    def worker(self, sender):
+        worker = outbox.OutboxWorker(workers=3, batch_size=2, sender=sender)
+        self.addCleanup(worker.close)
+        return worker
+
+    def test_notification_is_queued_once_with_its_email(self):
+        notification = Notification.objects.create(user=self.user, title="Hi", message="Hello")
+        notification.is_read = True
+        notification.save()
+        self.assertEqual(list(notification.emails.values_list('recipient', flat=True)), ['renter@example.com'])
+
+    def test_worker_sends_in_batches_and_retries_with_backoff(self):
+        OutboxEmail.objects.all().delete()
+        third = create_user('third', email='third@example.com')
+        for user in (self.user, self.other, third):
+            Notification.objects.create(user=user, title="Hi", message="Hello")
+        sender = StubSender(failing={'bounce@example.com'})
+        worker = self.worker(sender)
+        worker.drain()
+
+        self.assertEqual(sorted(sender.sent), ['renter@example.com', 'third@example.com'])
+        self.assertEqual(worker.metrics, {'batches': 2, 'sent': 2, 'retried': 1, 'dead': 0})
+        failed = OutboxEmail.objects.get(recipient='bounce@example.com')
+        self.assertEqual((failed.status, failed.attempts, failed.last_error), ('pending', 1, "Mailbox unavailable"))
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=outbox.RETRY_BASE - 5))
+        self.assertEqual(outbox.retry_delay(3), timedelta(seconds=outbox.RETRY_BASE * 4))
+
+    def test_dead_letter_after_max_attempts(self):
+        OutboxEmail.objects.all().delete()
+        Notification.objects.create(user=self.other, title="Hi", message="Hello")
+        worker = self.worker(StubSender(failing={'bounce@example.com'}))
+        for _ in range(outbox.MAX_ATTEMPTS):
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            worker.drain()
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ('dead', outbox.MAX_ATTEMPTS))
+        self.assertEqual(outbox.outbox_stats()['dead'], 1)
+
+    def test_claims_are_exclusive_until_the_lease_ends(self):
+        OutboxEmail.objects.all().delete()
+        outbox.enqueue("Hi", "<p>Hello</p>", ['a@example.com', 'b@example.com'])
+        self.assertEqual(len(outbox.claim(OutboxEmail, 10)), 2)
+        self.assertEqual(outbox.claim(OutboxEmail, 10), [])
+
+        OutboxEmail.objects.update(claimed_at=timezone.now() - outbox.CLAIM_LEASE - timedelta(seconds=1))
+        self.assertEqual(len(outbox.claim(OutboxEmail, 10)), 2)
+
+    def test_expired_claim_does_not_overwrite_the_new_one(self):
+        OutboxEmail.objects.all().delete()
+        outbox.enqueue("Hi", "<p>Hello</p>", ['a@example.com'])
+        slow = self.worker(StubSender(failing={'a@example.com'}))
+        stale = slow.claim()
+        OutboxEmail.objects.update(claimed_at=timezone.now() - outbox.CLAIM_LEASE - timedelta(seconds=1))
+        self.worker(StubSender()).drain()
+
+        slow.record(stale, slow.deliver(stale))
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.last_error), ('sent', 1, ''))
+
+
+    def test_cron_pass_sends_what_is_queued(self):
+        OutboxEmail.objects.all().delete()
+        Notification.objects.create(user=self.user, title="Hi", message="Hello")
+        sender = StubSender()
+        self.addCleanup(setattr, outbox.OutboxWorker, 'get_sender', outbox.OutboxWorker.get_sender)
+        outbox.OutboxWorker.get_sender = lambda worker: sender
+        self.addCleanup(setattr, PushWorker, 'get_sender', PushWorker.get_sender)
+        PushWorker.get_sender = lambda worker: StubFCM()
+
+        self.assertIn(('* * * * *', 'src.apps.alerts.cron.send_outbox'), settings.CRONJOBS)
+        cron.send_outbox()
+        self.assertEqual(sender.sent, ['renter@example.com'])
+        self.assertEqual(OutboxEmail.objects.get().status, 'sent')
+
+class EmailClientTests(TestCase):
+    messages = [{'to_email': f'user{i}@example.com', 'subject': "Hi", 'message_html': "<p>Hello</p>"} for i in range(120)]
+
+    def test_gmail_client_batches_on_one_service(self):
+        with gmail_stub() as stub:
+            client = GmailClient(root_url=f'http://127.0.0.1:{stub.address[1]}/', credentials=AnonymousCredentials())
+            results = client.send_many(self.messages)
+            service = client.get_service()
+            client.send_many(self.messages[:1])
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual((stub.requests, stub.messages, stub.connections), (4, 121, 1))
+        self.assertIs(client.get_service(), service)
+
+    def test_gmail_without_token_is_unavailable(self):
+        client = GmailClient(token_path='/nonexistent/token.json')
+        with self.assertRaises(GmailUnavailable):
+            client.send_many(self.messages[:1])
+
+    def test_expired_token_falls_back_to_smtp(self):
+        token_path = os.path.join(tempfile.mkdtemp(), 'token.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(token_path))
+        with gmail_stub() as gmail, smtp_stub() as smtp:
+            # The stub's token endpoint answers without an access token, like a revoked grant
+            revoked = Credentials(
+                token='old', refresh_token='revoked', client_id='id', client_secret='secret',
+                token_uri=f'http://127.0.0.1:{gmail.address[1]}/token', expiry=datetime(2020, 1, 1),
+            )
+            # Nothing listens on port 1, so the token endpoint is unreachable
+            unreachable = Credentials(
+                token='old', refresh_token='refresh', client_id='id', client_secret='secret',
+                token_uri='http://127.0.0.1:1/token', expiry=datetime(2020, 1, 1),
+            )
+            self.addCleanup(setattr, gmail_module, 'gmail_client', gmail_module.gmail_client)
+            self.addCleanup(setattr, gmail_module, 'smtp_sender', gmail_module.smtp_sender)
+            gmail_module.smtp_sender = SMTPSender(host='127.0.0.1', port=smtp.address[1], username='', password='')
+            self.addCleanup(gmail_module.smtp_sender.close)
+            results = []
+            for credentials in (revoked, unreachable):
+                gmail_module.gmail_client = GmailClient(token_path=token_path, credentials=credentials)
+                results += gmail_module.send_email_batch(self.messages[:1])
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(smtp.messages, 2)
+
+    def test_smtp_keeps_one_connection(self):
+        with smtp_stub() as stub:
+            sender = SMTPSender(host='127.0.0.1', port=stub.address[1], username='', password='')
+            results = sender.send_many(self.messages[:3]) + sender.send_many(self.messages[3:5])
+            sender.close()
+
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual((stub.messages, stub.connections), (5, 1))
+
+
+class StubFCM:
+    """Answers multicast calls like FCM; tokens starting with ``stale`` are unregistered"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, tokens, title, body, data=None):
+        with self.lock:
+            self.calls.append(len(tokens))
+        return [
+            messaging.SendResponse(None, messaging.UnregisteredError("Requested entity was not found."))
+            if token.startswith('stale') else messaging.SendResponse({'name': f'projects/stub/messages/{token}'}, None)
+            for token in tokens
+        ]
+
+
+class PushTests(TestCase):
+
+    def setUp(self):
+        self.users = [create_user(f'user{i}') for i in range(3)]
+        FCMDevice.objects.bulk_create(
+            [FCMDevice(user=user, registration_id=f'token-{user.pk}-{i}', type='android') for user in self.users for i in range(300)]
+            + [FCMDevice(user=self.users[0], registration_id='stale-token', type='android')]
+        )
+        self.lonely = create_user('lonely')
+
+    def worker(self, fcm):
+        worker = PushWorker(workers=2, batch_size=50, sender=fcm)
+        self.addCleanup(worker.close)
+        return worker
+
+    def test_only_users_with_devices_get_a_push(self):
+        Notification.objects.create(user=self.lonely, title="Hi", message="Hello")
+        self.assertFalse(OutboxPush.objects.exists())
+        notification = Notification.objects.create(user=self.users[0], title="Hi", message="Hello")
+        self.assertEqual(notification.pushes.count(), 1)
+
+    def test_same_message_is_multicast_in_batches_and_stale_tokens_pruned(self):
+        for user in self.users:
+            Notification.objects.create(user=user, title="Sale", message="Everything 10% off")
+        fcm = StubFCM()
+        worker = self.worker(fcm)
+        worker.drain()
+
+        self.assertEqual(sorted(fcm.calls), [401, 500])
+        self.assertEqual({key: worker.metrics[key] for key in ('sent', 'calls', 'tokens', 'pruned')},
+                         {'sent': 3, 'calls': 2, 'tokens': 901, 'pruned': 1})
+        self.assertFalse(FCMDevice.objects.filter(registration_id='stale-token').exists())
+        self.assertEqual(OutboxPush.objects.filter(status='sent').count(), 3)
+
+    def test_failed_push_is_retried(self):
+        Notification.objects.create(user=self.users[1], title="Hi", message="Hello")
+
+        def over_quota(tokens, title, body, data=None):
+            raise messaging.QuotaExceededError("Sending quota exceeded")
+
+        self.worker(over_quota).drain()
+        push = OutboxPush.objects.get()
+        self.assertEqual((push.status, push.attempts, push.last_error), ('pending', 1, "Sending quota exceeded"))
+
+
+class NotificationInboxTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('renter')
+        self.other = create_user('other')
+        self.client = api_client(self.user)
+        Notification.objects.all().delete()
+        self.notifications = [
+            Notification.objects.create(user=self.user, title=f"Title {i}", message="Hello") for i in range(5)
+        ]
+        Notification.objects.create(user=self.other, title="Other", message="Hello")
+
+    def test_cursor_pages_cover_the_inbox_once(self):
+        seen = []
+        url = '/api/alerts/notifications/?limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, [notification.pk for notification in reversed(self.notifications)])
+
+    def test_counter_follows_create_read_and_delete(self):
+        self.assertEqual(self.client.get('/api/alerts/notifications/unread-count/').data, {'unread_count': 5})
+
+        ids = [self.notifications[0].pk, self.notifications[1].pk, Notification.objects.get(user=self.other).pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/alerts/notifications/mark-read/', {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'updated': 2, 'unread_count': 3})
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "alerts_notification"')]), 1)
+
+        self.notifications[2].delete()
+        count_created(Notification.objects.bulk_create([Notification(user=self.user, title="Bulk", message="Hi")]))
+        notification = self.notifications[3]
+        notification.is_read = True
+        notification.save()
+        self.assertEqual(unread_count(self.user.pk), 2)
+
+        response = self.client.post('/api/alerts/notifications/mark-all-read/')
+        self.assertEqual(response.data, {'updated': 2, 'unread_count': 0})
+        self.assertEqual(unread_count(self.other.pk), 1)
+        self.assertEqual(self.client.get('/api/alerts/notifications/?is_read=false').data['results'], [])
+
+
+    def test_notification_landing_while_the_counter_is_created_is_counted(self):
+        newcomer = create_user('newcomer')
+        Notification.objects.create(user=newcomer, title="First", message="Hello")
+
+        # A request that writes a notification before the counter row exists
+        def notify(sender, instance, **kwargs):
+            if instance.user_id == newcomer.pk:
+                Notification.objects.create(user=newcomer, title="Second", message="Hello")
+        pre_save.connect(notify, sender=UnreadCounter, dispatch_uid='test-notify')
+        self.addCleanup(pre_save.disconnect, sender=UnreadCounter, dispatch_uid='test-notify')
+
+        self.assertEqual(unread_count(newcomer.pk), 2)
+
+
+class UserEventsTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('renter')
+        self.vehicle = create_vehicle()
+
+    def connect(self, query=''):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/events/{query}')
+        communicator.scope['user'] = self.user
+        return communicator
+
+    def notify(self, count):
+        for i in range(count):
+            Notification.objects.create(user=self.user, title=f"Title {i}", message="Hello")
+
+    def test_burst_is_one_frame_and_resume_replays(self):
+        unread_count(self.user.pk)
+        rental = Rental.objects.bulk_create([Rental(
+            vehicle=self.vehicle, user=self.user, start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=3), total_price=300,
+        )])[0]
+
+        async def scenario():
+            communicator = self.connect()
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await database_sync_to_async(self.notify)(3)
+            await database_sync_to_async(rental.change_status)('confirmed')
+
+            frame = await communicator.receive_json_from(timeout=3)
+            self.assertTrue(await communicator.receive_nothing(timeout=0.5))
+            await communicator.disconnect()
+            return frame
+
+        frame = async_to_sync(scenario)()
+        kinds = [event['kind'] for event in frame['events']]
+        self.assertEqual(kinds, ['notification'] * 3 + ['rental_status', 'unread_count'])
+        self.assertEqual(frame['events'][-1]['payload'], {'delta': 3})
+        self.assertEqual(frame['events'][3]['payload']['status'], 'confirmed')
+
+        first_notification = frame['events'][0]['id']
+
+        async def resume():
+            communicator = self.connect(f'?last_event_id={first_notification}')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            replay = await communicator.receive_json_from(timeout=3)
+            await communicator.disconnect()
+            return replay
+
+        replay = async_to_sync(resume)()
+        # The window behind the cursor is read again; clients skip ids they have
+        missed = [event['kind'] for event in replay['events'] if event['id'] > first_notification]
+        self.assertEqual(missed, ['notification'] * 2 + ['rental_status', 'unread_count'])
+        self.assertEqual(replay['last_event_id'], frame['last_event_id'])
+
+    def test_events_published_without_a_wake_up_are_polled(self):
+        self.addCleanup(setattr, consumers, 'POLL_INTERVAL', consumers.POLL_INTERVAL)
+        consumers.POLL_INTERVAL = 0.2
+
+        async def scenario():
+            communicator = self.connect()
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            # Written by a cron job: its wake-up stays in its own process
+            await database_sync_to_async(UserEvent.objects.create)(user=self.user, kind='notification', payload={})
+            frame = await communicator.receive_json_from(timeout=3)
+            await communicator.disconnect()
+            return frame
+
+        frame = async_to_sync(scenario)()
+        self.assertEqual([event['kind'] for event in frame['events']], ['notification'])
+
+    def test_event_committed_after_a_higher_id_is_delivered_once(self):
+        def commit(event_id):
+            # As if its transaction took the id earlier and committed now
+            UserEvent.objects.create(id=event_id, user=self.user, kind='notification', payload={'n': event_id})
+            wake([self.user.pk])
+
+        async def scenario():
+            communicator = self.connect()
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await database_sync_to_async(commit)(1001)
+            first = await communicator.receive_json_from(timeout=3)
+            await database_sync_to_async(commit)(1000)
+            second = await communicator.receive_json_from(timeout=3)
+            await database_sync_to_async(commit)(1002)
+            third = await communicator.receive_json_from(timeout=3)
+            await communicator.disconnect()
+            return first, second, third
+
+        frames = async_to_sync(scenario)()
+        self.assertEqual([[event['id'] for event in frame['events']] for frame in frames], [[1001], [1000], [1002]])
+        self.assertEqual([frame['last_event_id'] for frame in frames], [1001, 1001, 1002])
+
+    def test_anonymous_is_rejected(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/events/')
+            communicator.scope['user'] = AnonymousUser()
+            connected, _ = await communicator.connect()
+            return connected
+
+        self.assertFalse(async_to_sync(scenario)())
+
+
+class DigestTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('renter', email='renter@example.com')
+        OutboxEmail.objects.all().delete()
+        self.sender = StubSender()
+        self.worker = outbox.OutboxWorker(workers=2, batch_size=10, sender=self.sender)
+        self.addCleanup(self.worker.close)
+
+    def test_burst_is_merged_into_one_email(self):
+        for i in range(3):
+            Notification.objects.create(user=self.user, title=f"Title {i}", message=f"Message {i}")
+        first, *held = OutboxEmail.objects.order_by('pk')
+        self.assertFalse(first.digest)
+        self.assertTrue(all(email.digest and not email.html for email in held))
+
+        self.worker.drain()
+        self.assertEqual(self.sender.sent, ['renter@example.com'])
+
+        OutboxEmail.objects.filter(pk=held[0].pk).update(next_attempt_at=timezone.now())
+        messages = []
+        self.worker.sender = lambda batch: messages.extend(batch) or [{'success': True}] * len(batch)
+        self.worker.drain()
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]['subject'], outbox.DIGEST_SUBJECT.format(count=2))
+        self.assertIn("Message 1", messages[0]['message_html'])
+        self.assertIn("Message 2", messages[0]['message_html'])
+        self.assertEqual(OutboxEmail.objects.filter(status='sent').count(), 3)
+
+    def test_bulk_renders_each_distinct_message_once(self):
+        html = outbox.render_many("email.html", [{"message": "Same"}, {"message": "Other"}, {"message": "Same"}])
+        self.assertIs(html[0], html[2])
+        self.assertIsNot(html[0], html[1])
+
+        users = [
+            create_user(f'user{i}', email=f'user{i}@example.com')
+            for i in range(3)
+        ]
+        OutboxEmail.objects.all().delete()
+        notifications = Notification.objects.bulk_create(
+            [Notification(user=user, title="Sale", message="Same text") for user in users]
+            + [Notification(user=self.user, title=f"Reminder {i}", message="Due") for i in range(2)]
+        )
+        outbox.enqueue_notifications(notifications)
+        emails = list(OutboxEmail.objects.order_by('pk'))
+        self.assertEqual([email.digest for email in emails], [False] * 3 + [True] * 2)
+
+    def test_digest_email_backing_off_waits_for_its_retry(self):
+        for i in range(3):
+            Notification.objects.create(user=self.user, title=f"Title {i}", message=f"Message {i}")
+        _first, failed, due = OutboxEmail.objects.order_by('pk')
+        OutboxEmail.objects.filter(pk=failed.pk).update(attempts=1, next_attempt_at=timezone.now() + timedelta(hours=1))
+        OutboxEmail.objects.filter(pk=due.pk).update(next_attempt_at=timezone.now())
+        self.worker.drain()
+
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertEqual(OutboxEmail.objects.filter(status='sent').count(), 2)
+
+    def test_configured_titles_are_always_digested(self):
+        self.addCleanup(setattr, outbox, 'DIGEST_TITLES', outbox.DIGEST_TITLES)
+        outbox.DIGEST_TITLES = frozenset({"Weekly"})
+        Notification.objects.create(user=self.user, title="Weekly", message="Summary")
+        self.assertTrue(OutboxEmail.objects.get().digest)
+
+
+class BroadcastTests(TestCase):
+
+    def setUp(self):
+        self.staff = create_user('staff', is_staff=True)
+        self.vehicle = create_vehicle()
+        now = timezone.now()
+        self.renters = [
+            create_user(f'renter{i}', email=f'renter{i}@example.com')
+            for i in range(5)
+        ]
+        rentals = Rental.objects.bulk_create([
+            Rental(
+                vehicle=self.vehicle, user=user, start_date=now - timedelta(days=5), end_date=now + timedelta(days=5),
+                status='active' if i < 4 else 'completed', total_price=100,
+            )
+            for i, user in enumerate(self.renters)
+        ])
+        today = timezone.localdate()
+        Installment.objects.bulk_create([
+            Installment(rental=rentals[0], user=self.renters[0], amount=50, due_date=today - timedelta(days=2)),
+            Installment(rental=rentals[1], user=self.renters[1], amount=50, due_date=today - timedelta(days=2), is_paid=True),
+            Installment(rental=rentals[2], user=self.renters[2], amount=50, due_date=today),
+        ])
+        self.client = api_client(self.staff)
+        self.addCleanup(setattr, broadcasts, 'CHUNK_SIZE', broadcasts.CHUNK_SIZE)
+        broadcasts.CHUNK_SIZE = 3
+
+    def test_segments_resolve_in_one_query(self):
+        with self.assertNumQueries(1):
+            active = set(broadcasts.recipients('active_rentals').values_list('pk', flat=True))
+        self.assertEqual(active, {user.pk for user in self.renters[:4]})
+        overdue = set(broadcasts.recipients('overdue_installments').values_list('pk', flat=True))
+        self.assertEqual(overdue, {self.renters[0].pk})
+
+    def test_broadcast_is_written_in_the_background_in_chunks(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/alerts/broadcasts/', {
+                'title': "Closed on Friday", 'message': "Our office is closed on Friday.", 'segment': 'active_rentals',
+            }, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Notification.objects.filter(title="Closed on Friday").exists())
+
+        self.assertEqual(broadcasts.run(response.data['id']), 4)
+        self.assertIsNone(broadcasts.run(response.data['id']))
+        data = self.client.get(f"/api/alerts/broadcasts/{response.data['id']}/").data
+        self.assertEqual((data['status'], data['total'], data['sent'], data['progress']), ('done', 4, 4, 1.0))
+        notified = Notification.objects.filter(title="Closed on Friday")
+        self.assertEqual(set(notified.values_list('user_id', flat=True)), {user.pk for user in self.renters[:4]})
+        self.assertEqual(OutboxEmail.objects.filter(notification__in=notified).count(), 4)
+        self.assertEqual(unread_count(self.renters[0].pk), 1)
+
+    def test_failed_broadcast_resumes_after_the_last_chunk(self):
+        broadcast = Broadcast.objects.create(title="Overdue", message="Please pay", segment='active_rentals')
+        real_count_created = broadcasts.count_created
+        calls = []
+
+        def fail_second_chunk(notifications):
+            calls.append(len(notifications))
+            if len(calls) == 2:
+                raise OperationalError("database is locked")
+            real_count_created(notifications)
+
+        self.addCleanup(setattr, broadcasts, 'count_created', real_count_created)
+        broadcasts.count_created = fail_second_chunk
+        self.assertEqual(broadcasts.run(broadcast.pk), 3)
+        broadcast.refresh_from_db()
+        self.assertEqual((broadcast.status, broadcast.sent), ('failed', 3))
+
+        with self.captureOnCommitCallbacks():
+            self.assertEqual(broadcasts.resume(Broadcast.objects.all()), 1)
+        self.assertEqual(broadcasts.run(broadcast.pk), 4)
+        self.assertEqual(Notification.objects.filter(title="Overdue").count(), 4)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.renters[0])
+        response = self.client.post('/api/alerts/broadcasts/', {
+            'title': "Hi", 'message': "Hi", 'segment': 'active_rentals',
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
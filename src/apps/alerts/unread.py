@@ -0,0 +1,80 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .events import publish
+from .models import Notification, UnreadCounter
+
+
+def unread_count(user_id):
+    """
+    A user's unread notifications. The counter is created the first time
+    it's read; until then there's nothing to move.
+    """
+    count = UnreadCounter.objects.filter(user_id=user_id).values_list('count', flat=True).first()
+    if count is not None:
+        return count
+    with transaction.atomic():
+        # The row goes in before the count, so a notification that lands
+        # after the count moves the counter instead of being missed
+        counter, created = UnreadCounter.objects.get_or_create(user_id=user_id)
+        if created:
+            counter.count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+            counter.save(update_fields=['count'])
+    return counter.count
+
+
+def add_unread(deltas):
+    """
+    Move the counters of ``{user_id: delta}`` that exist, one UPDATE per
+    distinct delta, and publish the changes to the users' connections
+    """
+    users = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            users[delta].append(user_id)
+    for delta, user_ids in users.items():
+        UnreadCounter.objects.filter(user_id__in=user_ids).update(count=F('count') + delta)
+    publish([(user_id, 'unread_count', {'delta': delta}) for delta, user_ids in users.items() for user_id in user_ids])
+
+
+def count_created(notifications):
+    """Count notifications written with bulk_create, which sends no signals"""
+    add_unread(Counter(notification.user_id for notification in notifications if not notification.is_read))
+
+
+def mark_read(user, ids=None):
+    """Mark some (or all) of a user's notifications read in one UPDATE; returns how many changed"""
+    notifications = Notification.objects.filter(user=user, is_read=False)
+    if ids is not None:
+        notifications = notifications.filter(pk__in=ids)
+    with transaction.atomic():
+        updated = notifications.update(is_read=True)
+        add_unread({user.pk: -updated})
+    return updated
+
+
+def notification_saving(sender, instance, raw=False, **kwargs):
+    # Remember whether the row was unread before this save
+    if raw or instance.pk is None:
+        return
+    instance.__dict__['_was_unread'] = Notification.objects.filter(pk=instance.pk, is_read=False).exists()
+
+
+def notification_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_unread = False if created else instance.__dict__.pop('_was_unread', False)
+    add_unread({instance.user_id: int(not instance.is_read) - int(was_unread)})
+
+
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        add_unread({instance.user_id: -1})
+
+
+pre_save.connect(notification_saving, sender=Notification, dispatch_uid='unread-notifications')
+post_save.connect(notification_saved, sender=Notification, dispatch_uid='unread-notifications')
+post_delete.connect(notification_deleted, sender=Notification, dispatch_uid='unread-notifications')
@@ -1,8 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
+from src.apps.vehicles.pricing import quote
+
+from .exports import rental_export
 from .models import CustomerData, Rental
 
 
@@ -136,38 +139,50 @@ class RentalAdmin(admin.ModelAdmin):
     def calculated_total_price(self, obj):
         """Show calculated total price based on vehicle rate and duration"""
         if obj.vehicle and obj.start_date and obj.end_date:
-            delta = obj.end_date - obj.start_date
-            days = delta.days + (1 if delta.seconds > 0 else 0)
-            calculated = obj.vehicle.price * days
-            return f"${calculated:.2f} ({days} days × ${obj.vehicle.price}/day)"
+            price = quote(obj.vehicle, obj.start_date, obj.end_date)
+            return f"${price['total']:.2f} ({price['days']} days × ${price['price_per_day']}/day)"
         return "Cannot calculate"
 
     calculated_total_price.short_description = 'Calculated Price'
 
     # Custom actions
-    actions = ['mark_as_confirmed', 'mark_as_active', 'mark_as_completed', 'mark_as_cancelled']
+    actions = [
+        'mark_as_confirmed', 'mark_as_active', 'mark_as_completed', 'mark_as_cancelled',
+        *rental_export.admin_actions(),
+    ]
+
+    def change_status(self, request, queryset, status):
+        # One by one, so each transition takes or releases its vehicle unit
+        updated, failed = 0, []
+        for rental in queryset.select_related('vehicle').exclude(status=status):
+            try:
+                rental.change_status(status)
+                updated += 1
+            except ValueError:
+                failed.append(rental)
+        self.message_user(request, f'{updated} rental(s) marked as {status}.')
+        if failed:
+            self.message_user(
+                request, f"No units left for {', '.join(f'#{rental.pk}' for rental in failed)}.", messages.WARNING
+            )
 
     def mark_as_confirmed(self, request, queryset):
-        updated = queryset.update(status='confirmed')
-        self.message_user(request, f'{updated} rental(s) marked as confirmed.')
+        self.change_status(request, queryset, 'confirmed')
 
     mark_as_confirmed.short_description = 'Mark selected rentals as confirmed'
 
     def mark_as_active(self, request, queryset):
-        updated = queryset.update(status='active')
-        self.message_user(request, f'{updated} rental(s) marked as active.')
+        self.change_status(request, queryset, 'active')
 
     mark_as_active.short_description = 'Mark selected rentals as active'
 
     def mark_as_completed(self, request, queryset):
-        updated = queryset.update(status='completed')
-        self.message_user(request, f'{updated} rental(s) marked as completed.')
+        self.change_status(request, queryset, 'completed')
 
     mark_as_completed.short_description = 'Mark selected rentals as completed'
 
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
-        self.message_user(request, f'{updated} rental(s) marked as cancelled.')
+        self.change_status(request, queryset, 'cancelled')
 
     mark_as_cancelled.short_description = 'Mark selected rentals as cancelled'
 
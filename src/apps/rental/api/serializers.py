@@ -1,8 +1,10 @@
 from rest_framework import serializers
 
+from ..availability import is_available
 from ..models import CustomerData, Rental, Installment
 from ...users.api.serializers import SimpleUserSerializer
 from ...vehicles.api.serializers import VehicleDetailSerializer
+from ...vehicles.models import Vehicle
 
 
 class CustomerDataSerializer(serializers.ModelSerializer):
@@ -55,17 +57,8 @@ class RentalCreateSerializer(serializers.ModelSerializer):
         if end_date < start_date:
             raise serializers.ValidationError({"end_date": "End date must be after start date"})
 
-        # Check if vehicle is available for the requested dates
-        conflicting_rentals = Rental.objects.filter(
-            vehicle=vehicle,
-            status__in=['pending', 'confirmed', 'active'],
-        ).exclude(
-            end_date__lt=start_date
-        ).exclude(
-            start_date__gt=end_date
-        )
-
-        if conflicting_rentals.exists():
+        # Check if vehicle has a free unit for the requested dates
+        if not is_available(vehicle, start_date, end_date):
             raise serializers.ValidationError(
                 {"vehicle": "This vehicle is not available for the selected dates"}
             )
@@ -99,6 +92,26 @@ class StaffRentalCreateSerializer(serializers.ModelSerializer):
 
         return data
 
+class RentalPreviewSerializer(serializers.Serializer):
+    """Proposed rental dates to price and schedule without saving anything"""
+    vehicle = serializers.PrimaryKeyRelatedField(queryset=Vehicle.objects.filter(is_active=True))
+    start_date = serializers.DateTimeField()
+    end_date = serializers.DateTimeField()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Only staff may see staff_only vehicles, as in the vehicle listing
+        request = self.context.get('request')
+        if not (request and request.user.is_staff):
+            fields['vehicle'].queryset = fields['vehicle'].queryset.exclude(staff_only=True)
+        return fields
+
+    def validate(self, data):
+        if data['end_date'] <= data['start_date']:
+            raise serializers.ValidationError({"end_date": "End date must be after start date"})
+        return data
+
+
 class RentalDetailSerializer(serializers.ModelSerializer):
     customer_data = CustomerDataSerializer(read_only=True)
     vehicle = VehicleDetailSerializer(read_only=True)
@@ -1,20 +1,26 @@
 from django.db import transaction
-from django.db.models import Q
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 from rest_framework.response import Response
 
+from core.exports import ExportMixin
+from core.pagination import KeysetPagination
+
 from .serializers import (
     CustomerDataSerializer,
     RentalCreateSerializer,
     RentalDetailSerializer,
-    RentalUpdateSerializer, StaffRentalCreateSerializer
+    RentalUpdateSerializer, StaffRentalCreateSerializer, RentalPreviewSerializer
 )
+from ..exports import rental_export
 from ..models import CustomerData, Rental, Installment
+from ..schedule import installment_schedule
 from ...alerts.models import Notification
+from ...vehicles.pricing import quote
 
 
 class CustomerDataViewSet(viewsets.ModelViewSet):
@@ -51,7 +57,41 @@ class RentalViewSet(viewsets.ModelViewSet):
         """
         Automatically set the created_by field to the current user
         """
-        serializer.save(user=self.request.user)
+        try:
+            serializer.save(user=self.request.user)
+        except ValueError as e:
+            raise ValidationError({"vehicle": str(e)})
+
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except ValueError as e:
+            raise ValidationError({"status": str(e)})
+
+    @action(detail=False, methods=['post'])
+    def preview(self, request):
+        """
+        Price and installment schedule of proposed dates, for the checkout
+        screen; nothing is saved
+        """
+        serializer = RentalPreviewSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        vehicle, start_date, end_date = (
+            serializer.validated_data[field] for field in ('vehicle', 'start_date', 'end_date')
+        )
+
+        price = quote(vehicle, start_date, end_date)
+        schedule = installment_schedule(start_date.date(), price['days'], price['total'])
+        return Response({
+            'vehicle': vehicle.pk,
+            'start_date': start_date,
+            'end_date': end_date,
+            'days': price['days'],
+            'price_per_day': price['price_per_day'],
+            'total_price': price['total'],
+            'monthly_amount': schedule[0][1],
+            'installments': [{'due_date': due_date, 'amount': amount} for due_date, amount in schedule],
+        })
 
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
@@ -65,8 +105,7 @@ class RentalViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        rental.status = 'confirmed'
-        rental.save()
+        rental.change_status('confirmed')
         serializer = RentalDetailSerializer(rental)
         return Response(serializer.data)
 
@@ -82,8 +121,10 @@ class RentalViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        rental.status = 'active'
-        rental.save()
+        try:
+            rental.change_status('active')
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         serializer = RentalDetailSerializer(rental)
         return Response(serializer.data)
 
@@ -99,8 +140,7 @@ class RentalViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        rental.status = 'completed'
-        rental.save()
+        rental.change_status('completed')
         serializer = RentalDetailSerializer(rental)
         return Response(serializer.data)
 
@@ -116,8 +156,7 @@ class RentalViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        rental.status = 'cancelled'
-        rental.save()
+        rental.change_status('cancelled')
         serializer = RentalDetailSerializer(rental)
         return Response(serializer.data)
 
@@ -156,20 +195,7 @@ class RentalViewSet(viewsets.ModelViewSet):
             )
 
         # calculate new total
-        delta = new_end_date - rental.start_date
-        total_days = delta.days + (1 if delta.seconds > 0 else 0)
-
-        price_tier = rental.vehicle.price_tiers.filter(
-            min_days__lte=total_days
-        ).filter(
-            Q(max_days__gte=total_days) | Q(max_days__isnull=True)
-        ).order_by('min_days').first()
-
-        if price_tier:
-            new_total = price_tier.price_per_day * total_days
-        else:
-            new_total = rental.vehicle.price * total_days
-
+        new_total = quote(rental.vehicle, rental.start_date, new_end_date)['total']
         additional_amount = new_total - (rental.total_price or 0)
 
         if additional_amount <= 0:
@@ -207,12 +233,15 @@ class RentalViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class RentalRequestsViewSet(viewsets.ModelViewSet):
+class RentalRequestsViewSet(ExportMixin, viewsets.ModelViewSet):
     serializer_class = RentalDetailSerializer
+    export = rental_export
     filter_backends = [DjangoFilterBackend,]
     filterset_fields = [
         "user","user__is_staff"
     ]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
     def get_queryset(self):
         """
         All users can see rentals they created
@@ -7,5 +7,8 @@ class RentalConfig(AppConfig):
     name = 'src.apps.rental'
 
     def ready(self):
+        from . import availability  # noqa
         from src.apps.rental.models import create_rental_perms
+        from src.apps.vehicles.statistics import Counter
         create_rental_perms()
+        Counter('active_rentals', self.get_model('Rental'), filters={'status': 'active'}).connect()
@@ -0,0 +1,163 @@
+import calendar
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from src.apps.vehicles.models import Vehicle
+from .models import Rental, RentalStatus
+
+# Rentals holding a unit for their dates
+BLOCKING_STATUSES = (RentalStatus.PENDING, RentalStatus.CONFIRMED, RentalStatus.ACTIVE)
+BOOKINGS_TIMEOUT = getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 5 * 60)
+
+
+def _bookings_key(vehicle_id, updated_at):
+    # Rental saves and unit changes move the vehicle's updated_at, which
+    # retires the old entry in every process without deleting it
+    return f'vehicle-bookings:{vehicle_id}:{updated_at.isoformat()}'
+
+
+def overlapping(start, end):
+    """Blocking rentals sharing at least one instant with [start, end]"""
+    return Q(status__in=BLOCKING_STATUSES, end_date__gte=start, start_date__lte=end)
+
+
+class Bookings:
+    """
+    A vehicle's unit count and its blocking rentals as (start, end)
+    intervals sorted by start.
+
+    Active rentals have already taken a unit off ``available_units``, so
+    they are added back to get the fleet size the intervals compete for.
+    """
+
+    def __init__(self, units, intervals):
+        self.units = units
+        self.intervals = sorted(intervals)
+
+    def booked(self, start, end):
+        """Most units in use at any one moment of [start, end]"""
+        events = []
+        for booked_start, booked_end in self.intervals:
+            if booked_start > end:
+                break
+            if booked_end >= start:
+                events.append((max(booked_start, start), 0))
+                events.append((min(booked_end, end), 1))
+        # Ends are inclusive, so at equal times starts are counted first
+        busy = peak = 0
+        for _moment, is_end in sorted(events):
+            busy += -1 if is_end else 1
+            peak = max(peak, busy)
+        return peak
+
+    def free_units(self, start, end):
+        return max(self.units - self.booked(start, end), 0)
+
+
+def get_bookings(vehicle_ids):
+    """
+    Bookings of several vehicles: one query reads their current state and
+    one more loads the rentals of those not cached in that state
+    """
+    vehicles = Vehicle.objects.filter(pk__in=list(vehicle_ids)).values_list('pk', 'updated_at', 'available_units')
+    keys, units = {}, {}
+    for vehicle_id, updated_at, available_units in vehicles:
+        keys[vehicle_id] = _bookings_key(vehicle_id, updated_at)
+        units[vehicle_id] = available_units
+    cached = cache.get_many(keys.values())
+    bookings = {vehicle_id: cached[key] for vehicle_id, key in keys.items() if key in cached}
+
+    missing = [vehicle_id for vehicle_id in keys if vehicle_id not in bookings]
+    if missing:
+        units = {vehicle_id: units[vehicle_id] for vehicle_id in missing}
+        intervals = {vehicle_id: [] for vehicle_id in units}
+        rentals = Rental.objects.filter(vehicle_id__in=units, status__in=BLOCKING_STATUSES)
+        for vehicle_id, start, end, status in rentals.values_list('vehicle_id', 'start_date', 'end_date', 'status'):
+            intervals[vehicle_id].append((start, end))
+            if status == RentalStatus.ACTIVE:
+                units[vehicle_id] += 1
+        loaded = {vehicle_id: Bookings(units[vehicle_id], intervals[vehicle_id]) for vehicle_id in units}
+        cache.set_many({keys[vehicle_id]: value for vehicle_id, value in loaded.items()}, BOOKINGS_TIMEOUT)
+        bookings.update(loaded)
+    return bookings
+
+
+def is_available(vehicle, start, end):
+    bookings = get_bookings([vehicle.pk]).get(vehicle.pk)
+    return bookings is not None and bookings.free_units(start, end) > 0
+
+
+def unavailable_vehicle_ids(start, end):
+    """
+    Vehicles with no free unit at some moment of [start, end].
+
+    One grouped query finds the vehicles with rentals in the range; only
+    those with at least as many rentals as units can be full, and just
+    these are checked against their bookings.
+    """
+    counts = dict(
+        Rental.objects.filter(overlapping(start, end)).order_by()
+        .values_list('vehicle_id').annotate(total=Count('pk'))
+    )
+    if not counts:
+        return set()
+    bookings = get_bookings(counts)
+    return {
+        vehicle_id for vehicle_id, total in counts.items()
+        if vehicle_id in bookings and total >= bookings[vehicle_id].units
+        and bookings[vehicle_id].free_units(start, end) == 0
+    }
+
+
+def month_calendar(vehicle, year, month):
+    """Free units of a vehicle on each day of a month, in the current timezone"""
+    bookings = get_bookings([vehicle.pk])[vehicle.pk]
+    days = []
+    for day in range(1, calendar.monthrange(year, month)[1] + 1):
+        start = timezone.make_aware(datetime(year, month, day))
+        end = start + timedelta(days=1) - timedelta(microseconds=1)
+        days.append({'date': start.date(), 'free_units': bookings.free_units(start, end)})
+    return {'units': bookings.units, 'days': days}
+
+
+def parse_moment(value, param, end_of_day=False):
+    """A datetime, or a date meaning the start (or end) of that day"""
+    moment = parse_datetime(value)
+    if moment is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValidationError({param: "Use YYYY-MM-DD or an ISO 8601 datetime."})
+        moment = datetime.combine(date, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class AvailabilityFilter(BaseFilterBackend):
+    """
+    Keeps vehicles with a free unit during ``available_from`` to
+    ``available_to``; either bound alone means that single day.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        start = request.query_params.get('available_from') or request.query_params.get('available_to')
+        if not start:
+            return queryset
+        end = request.query_params.get('available_to') or start
+        start = parse_moment(start, 'available_from')
+        end = parse_moment(end, 'available_to', end_of_day=True)
+        if end < start:
+            raise ValidationError({'available_to': "Must not be before available_from."})
+
+        active = Rental.objects.filter(status=RentalStatus.ACTIVE).values('vehicle_id')
+        return queryset.exclude(pk__in=unavailable_vehicle_ids(start, end)).exclude(
+            Q(available_units=0) & ~Q(pk__in=active)
+        )
+
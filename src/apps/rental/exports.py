@@ -0,0 +1,32 @@
+from core.exports import Export
+from .models import Installment
+
+
+class RentalExport(Export):
+    """Rentals with their installments nested under each row"""
+    installment_fields = ['due_date', 'amount', 'is_paid']
+
+    def get_columns(self):
+        return [*self.fields, 'installments']
+
+    def get_rows(self, queryset):
+        # Both streams are ordered by rental id, so they can be merged as they go
+        installments = Installment.objects.filter(rental__in=queryset.values('pk')).order_by(
+            'rental_id', 'due_date', 'pk'
+        ).values('rental_id', *self.installment_fields).iterator(chunk_size=self.chunk_size)
+
+        pending = next(installments, None)
+        for rental in super().get_rows(queryset):
+            rental['installments'] = []
+            while pending is not None and pending['rental_id'] <= rental['id']:
+                if pending.pop('rental_id') == rental['id']:
+                    rental['installments'].append(pending)
+                pending = next(installments, None)
+            yield rental
+
+
+rental_export = RentalExport('rentals', [
+    'id', 'status', 'vehicle_id', 'vehicle__brand__name', 'vehicle__model', 'user__username',
+    'customer_data__first_name', 'customer_data__last_name', 'customer_data__phone_number',
+    'customer_data__id_number', 'start_date', 'end_date', 'total_price', 'created_at', 'updated_at',
+])
@@ -0,0 +1,59 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from src.apps.vehicles.models import Brand, Vehicle
+from ...models import Installment, Rental, RentalStatus
+from ...reminders import send_installment_reminders
+
+
+class Command(BaseCommand):
+    help = 'Measures the installment reminder job against synthetic installments (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--installments', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            User = get_user_model()
+            users = User.objects.bulk_create([
+                User(username=f'reminder-bench-{i}', email=f'reminder-bench-{i}@example.com')
+                for i in range(options['users'])
+            ], batch_size=5000)
+            vehicle = Vehicle.objects.create(
+                brand=Brand.objects.create(name='Reminder Bench'), model='Bench', year=2024, price=100,
+                body_type='Sedan', color='White', mileage=0, engine_type='gasoline', engine_capacity=2.0,
+                cylinders=4, transmission='automatic', seats=5,
+            )
+            now = timezone.now()
+            rentals = Rental.objects.bulk_create([
+                Rental(vehicle=vehicle, user=user, start_date=now, end_date=now + timedelta(days=90),
+                       status=RentalStatus.ACTIVE, total_price=3000)
+                for user in users
+            ], batch_size=5000)
+
+            self.stdout.write(f"Creating {options['installments']} installments...")
+            today = timezone.localdate()
+            Installment.objects.bulk_create([
+                Installment(
+                    rental=rental, user_id=rental.user_id, amount=1000,
+                    due_date=today + timedelta(days=random.randint(-30, 60)), is_paid=random.random() < 0.3,
+                )
+                for rental in (random.choice(rentals) for _ in range(options['installments']))
+            ], batch_size=5000)
+
+            for label in ('first run', 'rerun'):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    sent = send_installment_reminders(today)
+                    elapsed = (time.perf_counter() - started) * 1000
+                self.stdout.write(f"{label}: {sent} reminders in {elapsed:.0f} ms, {len(queries)} queries")
+
+            transaction.set_rollback(True)
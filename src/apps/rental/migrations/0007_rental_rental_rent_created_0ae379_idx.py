@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rental', '0006_installment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['created_at', 'id'], name='rental_rent_created_0ae379_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rental', '0007_rental_rental_rent_created_0ae379_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['start_date', 'end_date'], name='rental_rent_start_d_ffe3ec_idx'),
+        ),
+    ]
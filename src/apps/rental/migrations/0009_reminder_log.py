@@ -0,0 +1,36 @@
+# Generated by Django 4.2.17 on 2026-10-17 01:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rental', '0008_rental_date_range_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('days_before', models.PositiveSmallIntegerField()),
+                ('target_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='installment',
+            index=models.Index(fields=['is_paid', 'due_date'], name='rental_inst_is_paid_34140c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['status', 'end_date'], name='rental_rent_status_398ec2_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminderlog',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'days_before', 'target_date'), name='unique_reminder'),
+        ),
+    ]
@@ -1,12 +1,13 @@
-from dateutil.relativedelta import relativedelta
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.db import models, transaction
-from django.db.models import Q
 
+from src.apps.alerts.events import publish
 from src.apps.alerts.models import Notification
 from src.apps.vehicles.models import Vehicle
+from src.apps.vehicles.pricing import quote, rental_days
+from .schedule import installment_schedule
 
 
 class CustomerData(models.Model):
@@ -34,6 +35,10 @@ class Installment(models.Model):
     is_paid = models.BooleanField(default=False)
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='installments')
 
+    class Meta:
+        # Reminder jobs look up unpaid installments due on a given day
+        indexes = [models.Index(fields=['is_paid', 'due_date'])]
+
     def __str__(self):
         return f"Installment for {self.rental} due on {self.due_date}"
 
@@ -63,98 +68,94 @@ class Rental(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     inspection_form = models.FileField(upload_to='inspections/', null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            # Date range lookups of the availability filter
+            models.Index(fields=['start_date', 'end_date']),
+            # Return reminders for active rentals ending on a given day
+            models.Index(fields=['status', 'end_date']),
+        ]
+
     def __str__(self):
         return f"{self.customer_data} - {self.vehicle} ({self.start_date} to {self.end_date})"
 
     def save(self, *args, **kwargs):
-        delta = self.end_date - self.start_date
-        total_days = delta.days + (1 if delta.seconds > 0 else 0)
+        total_days = rental_days(self.start_date, self.end_date)
 
         if not self.total_price and self.vehicle and self.start_date and self.end_date:
-            # Try to find a matching price tier first
-            price_tier = self.vehicle.price_tiers.filter(
-                min_days__lte=total_days
-            ).filter(
-                Q(max_days__gte=total_days) | Q(max_days__isnull=True)
-            ).order_by('min_days').first()
-
-            if price_tier:
-                self.total_price = price_tier.price_per_day * total_days
-            else:
-                self.total_price = self.vehicle.price * total_days
-
-        vehicle = self.vehicle
-
-        # If staff, auto-activate rental
-        if self.user.is_staff:
-            self.status = RentalStatus.ACTIVE
+            self.total_price = quote(self.vehicle, self.start_date, self.end_date)['total']
 
-        # If this rental is newly becoming active
+        # If staff, auto-activate new rentals
         is_new = self.pk is None
-        already_active = not is_new and Rental.objects.filter(pk=self.pk, status=RentalStatus.ACTIVE).exists()
-
-        if (is_new or not already_active) and self.status == RentalStatus.ACTIVE:
-            if vehicle.available_units > 0:
-                vehicle.available_units -= 1
+        if is_new and self.user.is_staff:
+            self.status = RentalStatus.ACTIVE
 
-                if vehicle.available_units <= 0:
-                    vehicle.status = 'rented'
-                    vehicle.is_available = False
+        with transaction.atomic():
+            # Lock the row so two transitions of one rental can't both move a unit
+            previous = None if is_new else (
+                Rental.objects.select_for_update().filter(pk=self.pk).values_list('status', flat=True).first()
+            )
+            self.move_unit(previous, self.status)
+            super().save(*args, **kwargs)
+            if not is_new and previous != self.status:
+                publish([(self.user_id, 'rental_status', {'id': self.pk, 'status': self.status, 'previous': previous})])
+
+            # Installments and the confirmation only go out for new rentals
+            if not is_new:
+                return
+            schedule = installment_schedule(self.start_date.date(), total_days, self.total_price)
+            Installment.objects.bulk_create([
+                Installment(rental=self, due_date=due_date, amount=amount, user=self.user)
+                for due_date, amount in schedule
+            ])
+
+        first_due, first_amount = schedule[0]
+        Notification.objects.create(
+            user=self.user,
+            title="تم تأجير المركبة",
+            message=(
+                f"تم تأجير المركبة بنجاح.\n"
+                f"يرجى العلم أن القسط الأول مستحق بتاريخ {first_due} "
+                f"بمبلغ قدره {first_amount} دينار.\n"
+                "شكرًا لاختياركم خدمتنا ونتمنى لكم تجربة قيادة آمنة."
+            )
+        )
 
-                vehicle.save()
-            else:
+    def move_unit(self, previous, status):
+        """An active rental holds one unit of its vehicle"""
+        if status == RentalStatus.ACTIVE and previous != RentalStatus.ACTIVE:
+            if not self.vehicle.reserve_unit():
                 raise ValueError("No available units left for this vehicle.")
+        elif previous == RentalStatus.ACTIVE and status != RentalStatus.ACTIVE:
+            self.vehicle.release_unit()
+
+    def change_status(self, status):
+        """Move to ``status``, taking or giving back a vehicle unit in the same transaction"""
+        self.status = status
+        self.save(update_fields=['status', 'updated_at'])
+
+
+class ReminderLog(models.Model):
+    """
+    One row per reminder sent, so a rerun of a reminder job on the same
+    day skips what already went out. The reminded date is part of the key,
+    so moving a due date or extending a rental gets reminded again.
+    """
+    kind = models.CharField(max_length=30)
+    object_id = models.PositiveBigIntegerField()
+    days_before = models.PositiveSmallIntegerField()
+    # The installment's due date or the rental's end date reminded about
+    target_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
 
-        super().save(*args, **kwargs)
-
-
-        # Create installments if not staff and not already created
-        if not self.installments.exists():
-            full_months = total_days // 30
-            remaining_days = total_days % 30
-
-            with transaction.atomic():
-                if full_months == 0:
-                    Installment.objects.create(
-                        rental=self,
-                        due_date=self.start_date.date(),
-                        amount=self.total_price,
-                        user=self.user,
-                    )
-                else:
-                    monthly_amount = (self.total_price / total_days) * 30
-                    remaining_amount = self.total_price - (monthly_amount * full_months)
-
-                    due_date = self.start_date
-                    for i in range(full_months):
-                        Installment.objects.create(
-                            rental=self,
-                            due_date=(due_date + relativedelta(months=i)).date(),
-                            amount=monthly_amount,
-                            user=self.user,
-                        )
-                    if remaining_days > 0:
-                        Installment.objects.create(
-                            rental=self,
-                            due_date=(due_date + relativedelta(months=full_months)).date(),
-                            amount=remaining_amount,
-                            user=self.user,
-                        )
-        next_installment = self.installments.filter(
-        ).order_by('due_date').first()
-        print(f"Next installment: {next_installment}")
-
-        if next_installment:
-            Notification.objects.create(
-                user=self.user,
-                title="تم تأجير المركبة",
-                message=(
-                    f"تم تأجير المركبة بنجاح.\n"
-                    f"يرجى العلم أن القسط الأول مستحق بتاريخ {next_installment.due_date} "
-                    f"بمبلغ قدره {next_installment.amount} دينار.\n"
-                    "شكرًا لاختياركم خدمتنا ونتمنى لكم تجربة قيادة آمنة."
-                )
-            )
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id', 'days_before', 'target_date'], name='unique_reminder'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} ({self.days_before} days before {self.target_date})"
 
 
 def create_rental_perms():
@@ -0,0 +1,117 @@
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from src.apps.alerts.models import Notification
+from src.apps.alerts.outbox import enqueue_notifications
+from src.apps.alerts.unread import count_created
+from .models import Installment, ReminderLog, Rental, RentalStatus
+
+# Installments are reminded on the due date and 1 and 3 days before
+INSTALLMENT_DAYS_BEFORE = (0, 1, 3)
+RETURN_DAYS_BEFORE = 1
+CHUNK_SIZE = 2000
+
+
+def installment_message(amount, due_date, days_before):
+    when_text = "اليوم" if days_before == 0 else f"بعد {days_before} أيام"
+    return (
+        "تذكير بدفع القسط",
+        f"لديك قسط مستحق {when_text} بتاريخ {due_date} "
+        f"بمبلغ {amount} دينار.\n"
+        "يرجى التأكد من الدفع في الوقت المحدد لتجنب أي رسوم إضافية."
+    )
+
+
+def return_message(vehicle, end_date):
+    return (
+        "تذكير بإرجاع السيارة",
+        f"عزيزي العميل، تنتهي مدة تأجير سيارتك ({vehicle}) بتاريخ {end_date}.\n"
+        "يرجى إعادة السيارة في الموعد المحدد لتجنب أي رسوم إضافية.\n"
+        "شكرًا لتعاملكم معنا."
+    )
+
+
+def not_reminded(kind, days_before, target_date):
+    """Rows without a ledger entry for this reminder of ``target_date``"""
+    return ~Exists(ReminderLog.objects.filter(
+        kind=kind, object_id=OuterRef('pk'), days_before=days_before, target_date=target_date,
+    ))
+
+
+def send_reminders(kind, days_before, target_date, rows, build):
+    """
+    Write the notifications, their emails and ledger rows of
+    ``(object_id, user, message)`` triples chunk by chunk. When another
+    run logged some rows of a chunk first, the chunk's ledger insert fails
+    on the unique constraint and the chunk is written again without them.
+    """
+    sent = 0
+    chunk = []
+
+    def flush(chunk):
+        while chunk:
+            try:
+                with transaction.atomic():
+                    ReminderLog.objects.bulk_create([
+                        ReminderLog(kind=kind, object_id=object_id, days_before=days_before, target_date=target_date)
+                        for object_id, _row in chunk
+                    ])
+                    notifications = Notification.objects.bulk_create([
+                        Notification(user=user, title=title, message=message)
+                        for _object_id, (user, (title, message)) in chunk
+                    ])
+                    enqueue_notifications(notifications)
+                    count_created(notifications)
+                return len(notifications)
+            except IntegrityError:
+                logged = set(ReminderLog.objects.filter(
+                    kind=kind, days_before=days_before, target_date=target_date,
+                    object_id__in=[object_id for object_id, _row in chunk],
+                ).values_list('object_id', flat=True))
+                if not logged:
+                    raise
+                print(f"Skipping {len(logged)} {kind} reminders already sent by another run")
+                chunk = [(object_id, row) for object_id, row in chunk if object_id not in logged]
+        return 0
+
+    for row in rows:
+        chunk.append((row.pk, (row.user, build(row))))
+        if len(chunk) >= CHUNK_SIZE:
+            sent += flush(chunk)
+            chunk = []
+    if chunk:
+        sent += flush(chunk)
+    return sent
+
+
+def send_installment_reminders(today=None):
+    """Remind unpaid installments due today, tomorrow and in 3 days; returns the count sent"""
+    today = today or timezone.localdate()
+    sent = 0
+    for days_before in INSTALLMENT_DAYS_BEFORE:
+        due_date = today + timedelta(days=days_before)
+        installments = Installment.objects.filter(is_paid=False, due_date=due_date).filter(
+            not_reminded('installment', days_before, due_date)
+        ).select_related('user').order_by('pk')
+        sent += send_reminders(
+            'installment', days_before, due_date, installments.iterator(chunk_size=CHUNK_SIZE),
+            lambda installment: installment_message(installment.amount, installment.due_date, days_before),
+        )
+    return sent
+
+
+def send_return_reminders(today=None):
+    """Remind active rentals ending tomorrow to bring the vehicle back; returns the count sent"""
+    today = today or timezone.localdate()
+    day = today + timedelta(days=RETURN_DAYS_BEFORE)
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    rentals = Rental.objects.filter(
+        status=RentalStatus.ACTIVE, end_date__gte=start, end_date__lt=start + timedelta(days=1),
+    ).filter(not_reminded('rental_return', RETURN_DAYS_BEFORE, day)).select_related('user', 'vehicle__brand').order_by('pk')
+    return send_reminders(
+        'rental_return', RETURN_DAYS_BEFORE, day, rentals.iterator(chunk_size=CHUNK_SIZE),
+        lambda rental: return_message(rental.vehicle, timezone.localtime(rental.end_date).date()),
+    )
@@ -0,0 +1,30 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from dateutil.relativedelta import relativedelta
+
+# Installments are billed per started block of this many days
+BILLING_PERIOD_DAYS = 30
+CENT = Decimal('0.01')
+
+
+def installment_schedule(start_date, total_days, total_price):
+    """
+    ``(due_date, amount)`` pairs for a rental, without touching the database.
+
+    Rentals shorter than a period pay everything on the start date. Longer
+    ones pay the monthly share of the price on each month's anniversary and
+    the leftover days with one last installment. Amounts are rounded to
+    cents and the last one absorbs the rounding, so they add up to the
+    total.
+    """
+    total_price = Decimal(total_price)
+    full_months, remaining_days = divmod(total_days, BILLING_PERIOD_DAYS)
+    if full_months == 0:
+        return [(start_date, total_price)]
+
+    monthly_amount = (total_price / total_days * BILLING_PERIOD_DAYS).quantize(CENT, ROUND_HALF_UP)
+    count = full_months + (1 if remaining_days else 0)
+    schedule = [(start_date + relativedelta(months=i), monthly_amount) for i in range(count)]
+    last_due, _amount = schedule[-1]
+    schedule[-1] = (last_due, total_price - monthly_amount * (count - 1))
+    return schedule
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ReviewsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.apps.reviews"
+
+    def ready(self):
+        from src.apps.vehicles.statistics import Counter
+        Counter('total_reviews', self.get_model('VehicleReview')).connect()
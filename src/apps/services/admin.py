@@ -6,8 +6,9 @@ from django.utils.safestring import mark_safe
 from .models import (
     UpholsteryMaterial, UpholsteryType, UpholsteryGalleryImage,
     ServiceLocation, ServiceTimeSlot, UpholsteryCarModels,
-    UpholsteryMaterialTypes, UpholsteryBooking, BookingImage, VehicleComparison
+    UpholsteryMaterialTypes, UpholsteryBooking, BookingImage, VehicleComparison, CarListing
 )
+from .exports import booking_export, car_listing_export
 
 
 @admin.register(UpholsteryMaterial)
@@ -261,7 +262,10 @@ class UpholsteryBookingAdmin(admin.ModelAdmin):
     )
 
     # Custom actions
-    actions = ['mark_as_confirmed', 'mark_as_in_progress', 'mark_as_completed', 'mark_as_cancelled']
+    actions = [
+        'mark_as_confirmed', 'mark_as_in_progress', 'mark_as_completed', 'mark_as_cancelled',
+        *booking_export.admin_actions(),
+    ]
 
     def booking_id(self, obj):
         return f"Booking #{obj.id}"
@@ -363,3 +367,12 @@ class BookingImageAdmin(admin.ModelAdmin):
 UpholsteryTypeAdmin.inlines = [UpholsteryGalleryImageInline]
 ServiceLocationAdmin.inlines = [ServiceTimeSlotInline]
 admin.site.register(VehicleComparison)
+
+
+@admin.register(CarListing)
+class CarListingAdmin(admin.ModelAdmin):
+    list_display = ('brand_model', 'year', 'price', 'seller_name', 'status', 'created_at')
+    list_filter = ('status', 'fuel_type', 'transmission', 'created_at')
+    search_fields = ('brand_model', 'seller_name', 'seller_phone')
+    date_hierarchy = 'created_at'
+    actions = car_listing_export.admin_actions()
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from core.images import ImageVariantsField
+
 from ..models import (
     UpholsteryMaterial,
     UpholsteryType,
@@ -35,12 +37,13 @@ class UpholsteryGalleryImageSerializer(serializers.ModelSerializer):
     """Serializer for gallery images"""
     upholstery_type_name = serializers.CharField(source='upholstery_type.name', read_only=True)
     material_name = serializers.CharField(source='material.name', read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = UpholsteryGalleryImage
         fields = [
             'id', 'upholstery_type', 'upholstery_type_name',
-            'material', 'material_name', 'image',
+            'material', 'material_name', 'image', 'image_variants',
             'caption'
 
             , 'featured'
@@ -74,10 +77,11 @@ class ServiceTimeSlotSerializer(serializers.ModelSerializer):
 
 class BookingImageSerializer(serializers.ModelSerializer):
     """Serializer for booking before/after images"""
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = BookingImage
-        fields = ['id', 'booking', 'image', 'is_before', 'caption']
+        fields = ['id', 'booking', 'image', 'image_variants', 'is_before', 'caption']
 
 
 # class UpholsteryBookingListSerializer(serializers.ModelSerializer):
@@ -238,6 +242,8 @@ class UpholsteryMaterialTypesSerializer(serializers.ModelSerializer):
 
 
 class CarImageSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = CarImage
         fields = "__all__"
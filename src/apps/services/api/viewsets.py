@@ -6,7 +6,10 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 
-from core.mixins import AdminOnlyMixin
+from core.exports import ExportMixin
+from core.mixins import AdminOnlyMixin, ConditionalGetMixin
+from core.pagination import KeysetPagination
+from core.search import FullTextSearchFilter
 from .serializers import (
     UpholsteryMaterialSerializer,
     UpholsteryTypeSerializer,
@@ -28,9 +31,11 @@ from ..models import (
     UpholsteryBooking,
     BookingImage, UpholsteryCarModels, UpholsteryMaterialTypes, CarImage, CarListing, VehicleComparison
 )
+from ..exports import booking_export, car_listing_export
+from ..search import car_listing_index
 
 
-class UpholsteryMaterialViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
+class UpholsteryMaterialViewSet(ConditionalGetMixin, AdminOnlyMixin, viewsets.ModelViewSet):
     """ViewSet for upholstery materials (admin only for create/update/delete)"""
     queryset = UpholsteryMaterial.objects.all()
     serializer_class = UpholsteryMaterialSerializer
@@ -199,9 +204,10 @@ class ServiceTimeSlotViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
             )
 
 
-class UpholsteryBookingViewSet(viewsets.ModelViewSet):
+class UpholsteryBookingViewSet(ExportMixin, viewsets.ModelViewSet):
     """ViewSet for upholstery bookings"""
     queryset = UpholsteryBooking.objects.all()
+    export = booking_export
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['status', ]
     search_fields = ['user__first_name']
@@ -395,7 +401,7 @@ class BookingImageViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
         return queryset.filter(booking__customer_phone=user.phone)
 
 
-class UpholsteryCarModelsViewSet(viewsets.ModelViewSet):
+class UpholsteryCarModelsViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = UpholsteryCarModels.objects.all()
     serializer_class = UpholsteryCarModelsSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -411,15 +417,20 @@ class UpholsteryMaterialTypesViewSet(viewsets.ModelViewSet):
     filterset_fields = ['upholstery_material', 'upholstery_car_model']
 
 
-class CarListingViewSet(viewsets.ModelViewSet):
+class CarListingViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = CarListing.objects.all()
     serializer_class = CarListingSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['fuel_type', 'transmission', 'year', 'status', 'body_condition', 'previous_owners_count',"user"]
     search_fields = ['brand_model', 'color', 'seller_name', 'accessories']
+    search_index = car_listing_index
+    export = car_listing_export
     ordering_fields = ['created_at', 'price', 'year', 'mileage']
-    ordering = ['-created_at']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+    # No default ordering: CarListing.Meta already sorts by -created_at, and
+    # a default here would override the relevance order of search results
 
     def get_queryset(self):
         queryset = CarListing.objects.all()
@@ -0,0 +1,12 @@
+from core.exports import Export
+
+booking_export = Export('upholstery-bookings', [
+    'id', 'status', 'user__username', 'user__email', 'car_model__name', 'primary_material__name',
+    'material_type__name', 'created_at', 'updated_at', 'completed_at',
+])
+
+car_listing_export = Export('car-listings', [
+    'id', 'status', 'brand_model', 'year', 'mileage', 'fuel_type', 'transmission', 'color',
+    'previous_accidents', 'previous_owners_count', 'body_condition', 'accessories', 'price',
+    'price_negotiable', 'seller_name', 'seller_phone', 'seller_email', 'created_at', 'updated_at',
+])
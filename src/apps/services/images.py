@@ -0,0 +1,6 @@
+from core.images import ImageVariants
+from .models import BookingImage, CarImage, UpholsteryGalleryImage
+
+car_image_variants = ImageVariants(CarImage)
+gallery_image_variants = ImageVariants(UpholsteryGalleryImage)
+booking_image_variants = ImageVariants(BookingImage)
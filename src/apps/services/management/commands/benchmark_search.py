@@ -0,0 +1,54 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from ...api.viewsets import CarListingViewSet
+from ...models import CarListing
+
+BRANDS = ['تويوتا لاندكروزر', 'نيسان باترول', 'مرسيدس', 'Toyota Camry', 'Lexus LX', 'هيونداي النترا', 'BMW X5']
+COLORS = ['أبيض', 'اسود', 'فضي', 'Red', 'Blue']
+QUERIES = ['تويوتا', 'لاندكروزر ابيض', 'مرسيدس', 'camry', 'lexus', 'النترا فضي', 'x5']
+
+
+class Command(BaseCommand):
+    help = 'Measures car listing search latency against a synthetic catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Creating {options['listings']} listings...")
+            CarListing.objects.bulk_create([
+                CarListing(
+                    brand_model=random.choice(BRANDS), year=random.randint(2000, 2025),
+                    mileage=random.randint(0, 300000), fuel_type='gasoline', transmission='automatic',
+                    color=random.choice(COLORS), previous_accidents=False, previous_owners_count=1,
+                    body_condition='good', price=random.randint(1000, 50000),
+                    seller_name=f'Seller {i}', seller_phone='0000', status='active',
+                ) for i in range(options['listings'])
+            ], batch_size=5000)
+
+            from ...search import car_listing_index
+            car_listing_index.rebuild()
+
+            view = CarListingViewSet.as_view({'get': 'list'})
+            factory = RequestFactory()
+            for query in QUERIES:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    response = view(factory.get('/', {'search': query, 'limit': 20}))
+                    response.render()
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f"{query!r}: {response.data['count']} hits, "
+                    f"median {timings[len(timings) // 2]:.1f} ms, max {timings[-1]:.1f} ms"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_carlisting_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carlisting',
+            index=models.Index(fields=['created_at', 'id'], name='services_ca_created_dcc28b_idx'),
+        ),
+    ]
@@ -13,6 +13,7 @@ class UpholsteryMaterial(models.Model):
     # description = models.TextField(_("Description"), blank=True)
     image = models.ImageField(_("Material Image"), upload_to='upholstery/materials/', blank=True, null=True)
     price = models.DecimalField(_("Price"), max_digits=8, decimal_places=3, default=240)
+    updated_at = models.DateTimeField(auto_now=True)
 
     # price_per_seat = models.DecimalField(_("Price per Seat"), max_digits=8, decimal_places=3)
     # available = models.BooleanField(_("Available"), default=True)
@@ -66,6 +67,7 @@ class UpholsteryGalleryImage(models.Model):
         related_name="gallery_images"
     )
     image = models.ImageField(_("Image"), upload_to='upholstery/gallery/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(_("Caption"), max_length=255, blank=True)
     vehicle_info = models.CharField(_("Vehicle Information"), max_length=255, blank=True)
     featured = models.BooleanField(_("Featured"), default=False)
@@ -127,6 +129,7 @@ class ServiceTimeSlot(models.Model):
 
 class UpholsteryCarModels(models.Model):
     name = models.CharField(_("Car Model Name"), max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
     upholstery_material = models.ForeignKey(
         UpholsteryMaterial,
         on_delete=models.CASCADE,
@@ -292,6 +295,7 @@ class BookingImage(models.Model):
         related_name="images"
     )
     image = models.ImageField(_("Image"), upload_to='upholstery/bookings/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_before = models.BooleanField(_("Before Image"), default=True)
     caption = models.CharField(_("Caption"), max_length=255, blank=True)
 
@@ -405,6 +409,7 @@ class CarListing(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at', 'id'])]
 
     def __str__(self):
         return f"{self.brand_model} - {self.year}"
@@ -427,6 +432,7 @@ class CarImage(models.Model):
         upload_to='car_images/%Y/%m/%d/',
         verbose_name='صورة السيارة'
     )
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name = "Car Image"
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.search import SearchIndex
+from .models import CarListing
+
+car_listing_index = SearchIndex(
+    'services_carlisting_fts',
+    CarListing,
+    lambda listing: [listing.brand_model, listing.color, listing.seller_name, listing.accessories, listing.year],
+)
+
+
+@receiver(post_save, sender=CarListing)
+def index_car_listing(sender, instance, raw=False, **kwargs):
+    if not raw:
+        car_listing_index.index([instance])
+
+
+@receiver(post_delete, sender=CarListing)
+def unindex_car_listing(sender, instance, **kwargs):
+    car_listing_index.remove(instance.pk)
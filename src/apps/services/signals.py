@@ -1,9 +1,10 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
 from core.utilis import send_notification_email
-from .models import CarListing
+from src.apps.alerts.events import publish
+from .models import CarListing, UpholsteryBooking
 
 
 @receiver(post_save, sender=CarListing)
@@ -18,3 +19,20 @@ def send_car_listing_email(sender, instance, created, **kwargs):
             },
             recipient_list=[instance.seller_email]
         )
+
+
+@receiver(pre_save, sender=UpholsteryBooking)
+def remember_booking_status(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance.__dict__['_previous_status'] = (
+        UpholsteryBooking.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=UpholsteryBooking)
+def publish_booking_status(sender, instance, created, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_status', None)
+    if raw or created or previous == instance.status:
+        return
+    publish([(instance.user_id, 'booking_status', {'id': instance.pk, 'status': instance.status, 'previous': previous})])
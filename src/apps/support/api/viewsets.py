@@ -3,6 +3,8 @@ from rest_framework import filters, viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from core.pagination import KeysetPagination
+
 from .serializers import ChatMessageSerializer, FileSerializer, TicketSerializer, ContactMessageSerializer
 from ..models import ChatMessage, ChatFile, Ticket, ContactMessage
 
@@ -21,6 +23,8 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         "room__id",
     ]
     http_method_names = ["get", "head", "options"]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('index', 'id')
 
     def get_queryset(self):
         return ChatMessage.objects.all()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ChatConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.apps.support"
+
+    def ready(self):
+        from src.apps.vehicles.statistics import Counter
+        Counter('open_tickets', self.get_model('Ticket'), filters={'status': 'open'}).connect()
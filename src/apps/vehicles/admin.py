@@ -3,6 +3,7 @@ from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
+from .exports import vehicle_export
 from .models import Brand, VehicleType, Feature, Vehicle, VehicleImage, InquiryData
 
 
@@ -158,7 +159,7 @@ class VehicleAdmin(admin.ModelAdmin):
     # Custom actions
     actions = [
         'mark_as_featured', 'unmark_as_featured', 'mark_as_active',
-        'mark_as_inactive',
+        'mark_as_inactive', *vehicle_export.admin_actions(),
     ]
 
     def vehicle_info(self, obj):
@@ -1,11 +1,15 @@
+from django.db import models
 from django.utils import timezone
 from rest_framework import serializers
 
+from core.images import ImageVariantsField, variant_urls
 from ..models import Brand, VehicleType, Feature, Vehicle, VehicleImage, InquiryData, FavoriteVehicle, VehiclePrice, \
     VehiclePriceTier, VehicleRequest
 
 
 class BrandSerializer(serializers.ModelSerializer):
+    logo_variants = ImageVariantsField('logo', 'logo_variants')
+
     class Meta:
         model = Brand
         fields = '__all__'
@@ -30,6 +34,8 @@ class InquiryDataSerializer(serializers.ModelSerializer):
 
 
 class VehicleImageSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = VehicleImage
         fields = '__all__'
@@ -37,34 +43,77 @@ class VehicleImageSerializer(serializers.ModelSerializer):
 
 class VehicleImageListSerializer(serializers.ModelSerializer):
     """Serializer for listing vehicle images (used in VehicleDetailSerializer)"""
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = VehicleImage
-        fields = ['id', 'image', 'is_primary', 'caption']
+        fields = ['id', 'image', 'image_variants', 'is_primary', 'caption']
+
+
+class FavoriteFlagListSerializer(serializers.ListSerializer):
+    """Looks up which vehicles of the page the user favorited in one query"""
+
+    def to_representation(self, data):
+        vehicles = list(data.all() if isinstance(data, models.Manager) else data)
+        request = self.context.get('request')
+        self.child.favorite_ids = FavoriteVehicle.vehicle_ids(
+            request and request.user, [vehicle.pk for vehicle in vehicles]
+        )
+        return super().to_representation(vehicles)
 
 
 class VehicleListSerializer(serializers.ModelSerializer):
     """Serializer for listing vehicles with minimal information"""
     brand_name = serializers.CharField(source='brand.name', read_only=True)
     primary_image = serializers.SerializerMethodField()
+    primary_image_variants = serializers.SerializerMethodField()
+    is_favorited = serializers.SerializerMethodField()
 
     class Meta:
         model = Vehicle
         fields = [
             'id', 'brand', 'brand_name', 'model', 'year', 'price', 'currency',
             'body_type', 'color', 'mileage', 'engine_type', 'transmission',
-             'is_featured', 'primary_image', "is_negotiable", "created_at", "staff_only",
-            "is_available", "status", "available_units","type"
+             'is_featured', 'primary_image', 'primary_image_variants', "is_negotiable", "created_at", "staff_only",
+            "is_available", "status", "available_units","type", "is_favorited"
         ]
+        list_serializer_class = FavoriteFlagListSerializer
+
+    def primary_image_of(self, obj):
+        # Querysets built with Vehicle.objects.with_listing_data() carry the path already
+        if hasattr(obj, 'primary_image_path'):
+            if obj.primary_image_path:
+                return VehicleImage(image=obj.primary_image_path, image_variants=obj.primary_image_variants or {})
+            return None
+        if not hasattr(obj, '_primary_image'):
+            obj._primary_image = obj.images.filter(is_primary=True).first()
+        return obj._primary_image
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return primary_image.image.url
-        return None
+        primary_image = self.primary_image_of(obj)
+        if primary_image is None:
+            return None
+        variants = variant_urls(primary_image.image, primary_image.image_variants)
+        if variants:
+            return variants['card']['jpeg']
+        return primary_image.image.url
+
+    def get_primary_image_variants(self, obj):
+        primary_image = self.primary_image_of(obj)
+        if primary_image is None:
+            return None
+        return variant_urls(primary_image.image, primary_image.image_variants)
+
+    def get_is_favorited(self, obj):
+        favorite_ids = getattr(self, 'favorite_ids', None)
+        if favorite_ids is None:
+            request = self.context.get('request')
+            favorite_ids = FavoriteVehicle.vehicle_ids(request and request.user, [obj.pk])
+        return obj.pk in favorite_ids
+
     def to_representation(self, instance):
         data= super().to_representation(instance)
-        data["current_price"] = instance.current_price
+        data["current_price"] = instance.effective_price if instance.effective_price is not None else instance.price
         return data
 
 class VehicleDetailSerializer(serializers.ModelSerializer):
@@ -93,7 +142,7 @@ class VehicleDetailSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data= super().to_representation(instance)
-        data["current_price"] = instance.current_price
+        data["current_price"] = instance.effective_price if instance.effective_price is not None else instance.price
         return data
 
 class VehicleCreateUpdateSerializer(serializers.ModelSerializer):
@@ -215,10 +264,41 @@ class FavoriteVehicleSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['vehicles'] = VehicleListSerializer(instance.vehicles, many=True).data
+        representation['vehicles'] = VehicleListSerializer(instance.vehicles, many=True, context=self.context).data
         return representation
 
 
+class FavoriteBatchSerializer(serializers.Serializer):
+    """Vehicle ids to add to, remove from or toggle in the user's favorites"""
+    add = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=500)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=500)
+    toggle = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=500)
+
+    def validate(self, data):
+        if not any(data.values()):
+            raise serializers.ValidationError("Send at least one of add, remove or toggle.")
+        add, remove, toggle = set(data['add']), set(data['remove']), set(data['toggle'])
+        if add & remove or add & toggle or remove & toggle:
+            raise serializers.ValidationError("A vehicle can only appear in one of add, remove or toggle.")
+        return data
+
+
+class QuoteItemSerializer(serializers.Serializer):
+    vehicle = serializers.IntegerField()
+    start_date = serializers.DateTimeField()
+    end_date = serializers.DateTimeField()
+
+    def validate(self, data):
+        if data['end_date'] <= data['start_date']:
+            raise serializers.ValidationError({"end_date": "End date must be after the start date."})
+        return data
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    """Up to 200 (vehicle, start_date, end_date) combinations to price"""
+    items = QuoteItemSerializer(many=True, allow_empty=False, max_length=200)
+
+
 class VehiclePriceSerializer(serializers.ModelSerializer):
     class Meta:
         model = VehiclePrice
@@ -1,12 +1,19 @@
+from django.db.models import Count, Max
+from django.utils import timezone, translation
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from core.mixins import AdminOnlyMixin
+from core.exports import ExportMixin
+from core.filters import AliasOrderingFilter
+from core.mixins import AdminOnlyMixin, ConditionalGetMixin
+from core.pagination import KeysetPagination
+from core.search import FullTextSearchFilter
 from .serializers import (
     BrandSerializer,
     VehicleTypeSerializer,
@@ -16,14 +23,21 @@ from .serializers import (
     VehicleCreateUpdateSerializer,
     VehicleImageSerializer,
     InquiryDataSerializer, FavoriteVehicleSerializer, VehiclePriceSerializer, VehiclePriceTierSerializer,
-    VehicleRequestSerializer
+    VehicleRequestSerializer, FavoriteBatchSerializer, QuoteRequestSerializer
 )
+from ..cache import get_cache_stats, get_vehicle_detail
+from ..exports import vehicle_export
+from ..importer import VehicleImporter, read_rows
 from ..models import Brand, VehicleType, Feature, Vehicle, VehicleImage, InquiryData, FavoriteVehicle, VehiclePrice, \
     VehiclePriceTier, VehicleRequest
-from ...reviews.models import VehicleReview
+from ..pricing import quote_many
+from ..search import vehicle_index
+from ..similarity import vehicle_similarity
+from ..statistics import get_statistics
+from ...rental.availability import AvailabilityFilter, month_calendar
 
 
-class BrandViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
+class BrandViewSet(ConditionalGetMixin, AdminOnlyMixin, viewsets.ModelViewSet):
     """
     ViewSet for Brand model
     Admin only for write operations
@@ -40,8 +54,8 @@ class BrandViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
         Get all vehicles for a specific brand
         """
         brand = self.get_object()
-        vehicles = brand.vehicles.filter(is_active=True)
-        serializer = VehicleListSerializer(vehicles, many=True)
+        vehicles = Vehicle.objects.with_listing_data().filter(brand=brand, is_active=True)
+        serializer = VehicleListSerializer(vehicles, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
 
@@ -54,7 +68,7 @@ class VehicleTypeViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
     serializer_class = VehicleTypeSerializer
 
 
-class FeatureViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
+class FeatureViewSet(ConditionalGetMixin, AdminOnlyMixin, viewsets.ModelViewSet):
     """
     ViewSet for Feature model
     Admin only for write operations
@@ -65,24 +79,56 @@ class FeatureViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
     search_fields = ['name']
 
 
-class VehicleViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
+class VehicleViewSet(ExportMixin, ConditionalGetMixin, AdminOnlyMixin, viewsets.ModelViewSet):
     """
     ViewSet for Vehicle model
     Admin only for write operations
     """
     queryset = Vehicle.objects.filter(is_active=True)
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, AvailabilityFilter, AliasOrderingFilter]
     filterset_fields = [
         'brand', 'year', 'body_type', 'engine_type',
         'transmission', 'is_featured',"staff_only","is_available","type"
     ]
     search_fields = ['model', 'color', 'brand__name']
+    search_index = vehicle_index
+    export = vehicle_export
     ordering_fields = ['price', 'year', 'created_at']
+    # Listings show the effective price, so that's what price sorts on
+    ordering_aliases = {'price': 'effective_price'}
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
     parser_classes = [MultiPartParser, FormParser, JSONParser]
     def get_queryset(self):
+        queryset = Vehicle.objects.with_listing_data()
         if not self.request.user.is_staff:
-            return Vehicle.objects.exclude(staff_only=True)
-        return Vehicle.objects.all()
+            return queryset.exclude(staff_only=True)
+        return queryset
+
+    def get_last_modified(self, instance):
+        # Image, price and feature changes touch the vehicle; the brand is nested too
+        return max(instance.updated_at, instance.brand.updated_at)
+
+    def make_etag(self, request, *parts):
+        # is_favorited differs per user: adding or removing a favorite changes
+        # the count or the newest link id
+        if request.user.is_authenticated:
+            links = FavoriteVehicle.vehicles.through.objects.filter(favoritevehicle__user=request.user)
+            favorites = links.aggregate(count=Count('pk'), last=Max('pk'))
+            parts += (favorites['count'], favorites['last'])
+        return super().make_etag(request, *parts)
+
+    def get_retrieve_data(self, instance):
+        data = get_vehicle_detail(
+            instance,
+            self.request.get_host(),
+            translation.get_language(),
+            self.request.user.is_staff,
+            lambda: super(VehicleViewSet, self).get_retrieve_data(instance),
+        )
+        # The cached detail is shared between users, the flag is not
+        favorite_ids = FavoriteVehicle.vehicle_ids(self.request.user, [instance.pk])
+        return {**data, 'is_favorited': instance.pk in favorite_ids}
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -96,8 +142,8 @@ class VehicleViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
         """
         Get all featured vehicles
         """
-        featured_vehicles = self.queryset.filter(is_featured=True)
-        serializer = VehicleListSerializer(featured_vehicles, many=True)
+        featured_vehicles = self.queryset.with_listing_data().filter(is_featured=True)
+        serializer = VehicleListSerializer(featured_vehicles, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
@@ -108,15 +154,121 @@ class VehicleViewSet(AdminOnlyMixin, viewsets.ModelViewSet):
         min_price = request.query_params.get('min', None)
         max_price = request.query_params.get('max', None)
 
-        vehicles = self.queryset
+        vehicles = self.queryset.with_listing_data()
         if min_price:
-            vehicles = vehicles.filter(price__gte=min_price)
+            vehicles = vehicles.filter(effective_price__gte=min_price)
         if max_price:
-            vehicles = vehicles.filter(price__lte=max_price)
+            vehicles = vehicles.filter(effective_price__lte=max_price)
 
-        serializer = VehicleListSerializer(vehicles, many=True)
+        serializer = VehicleListSerializer(vehicles, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        The most similar active vehicles, nearest first (``?k=``, at most 50)
+        """
+        vehicle = self.get_object()
+        try:
+            k = min(max(int(request.query_params.get('k', 10)), 1), 50)
+        except ValueError:
+            return Response({"error": "k must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Deletes made by other processes never reach this process's index, so
+        # the ids are checked against the database and more are asked for
+        # until k are left or the index runs out
+        queryset = self.get_queryset().filter(is_active=True)
+        checked = {}
+        wanted = k
+        while True:
+            ids = vehicle_similarity.similar(vehicle.pk, wanted, include_staff_only=request.user.is_staff)
+            unchecked = [pk for pk in ids if pk not in checked]
+            checked.update(dict.fromkeys(unchecked))
+            checked.update(queryset.in_bulk(unchecked))
+            results = [checked[pk] for pk in ids if checked[pk] is not None][:k]
+            if len(results) == k or len(ids) < wanted:
+                break
+            wanted *= 2
+        return Response(VehicleListSerializer(results, many=True, context=self.get_serializer_context()).data)
+
+    @action(detail=True, methods=['get'])
+    def calendar(self, request, pk=None):
+        """
+        Free units per day over a month (``?month=YYYY-MM``, default this month)
+        """
+        vehicle = self.get_object()
+        month = request.query_params.get('month')
+        if month:
+            try:
+                year, month = (int(part) for part in month.split('-'))
+                if not (1 <= month <= 12 and year >= 1):
+                    raise ValueError
+            except ValueError:
+                return Response({"error": "month must look like YYYY-MM"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            today = timezone.localdate()
+            year, month = today.year, today.month
+        return Response({'vehicle': vehicle.pk, 'month': f'{year:04d}-{month:02d}', **month_calendar(vehicle, year, month)})
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Facet counts for the filter UI, after the same filters and search
+        as the list
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(queryset.facet_counts())
+
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    def quote(self, request):
+        """
+        Price many ``{"vehicle", "start_date", "end_date"}`` items at once,
+        with the same tier rules as a rental
+        """
+        serializer = QuoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = [(item['vehicle'], item['start_date'], item['end_date']) for item in serializer.validated_data['items']]
+
+        vehicles = Vehicle.objects.filter(is_active=True, pk__in={item[0] for item in items})
+        if not request.user.is_staff:
+            vehicles = vehicles.exclude(staff_only=True)
+        vehicles = vehicles.only('id', 'effective_price', 'currency', 'updated_at').in_bulk()
+
+        results = []
+        for (vehicle_id, start, end), price in zip(items, quote_many(vehicles, items)):
+            result = {'vehicle': vehicle_id, 'start_date': start, 'end_date': end}
+            if price is None:
+                result['error'] = "Vehicle not found"
+            else:
+                result.update(price, currency=vehicles[vehicle_id].currency)
+            results.append(result)
+        return Response(results)
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminUser],
+            parser_classes=[MultiPartParser])
+    def import_vehicles(self, request):
+        """
+        Bulk import vehicles from an uploaded CSV or JSONL ``file``
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in ('csv', 'jsonl', 'ndjson'):
+            return Response({"error": "file must be CSV or JSONL"}, status=status.HTTP_400_BAD_REQUEST)
+
+        create_missing = str(request.data.get('create_missing', '')).lower() in ('1', 'true')
+        report = VehicleImporter(create_missing=create_missing).run(read_rows(upload, file_format))
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        """
+        Hit/miss counters of the vehicle detail cache
+        """
+        return Response(get_cache_stats())
+
 class VehicleImageViewSet(viewsets.ModelViewSet):
     """
     ViewSet for VehicleImage model
@@ -222,16 +374,43 @@ class FavoriteVehicleViewSet(viewsets.ModelViewSet):
         user = self.request.user
         return FavoriteVehicle.objects.filter(user=user)
 
+    def get_available_vehicles(self):
+        """Vehicles the user may see and therefore favorite"""
+        vehicles = Vehicle.objects.filter(is_active=True)
+        if not self.request.user.is_staff:
+            vehicles = vehicles.exclude(staff_only=True)
+        return vehicles
+
     def list(self, request, *args, **kwargs):
-        return self.retrieve(request, *args, **kwargs)
+        """
+        The user's favorite vehicles, most recently added first, paginated
+        """
+        links = FavoriteVehicle.vehicles.through.objects.filter(
+            favoritevehicle__user=request.user, vehicle__in=self.get_available_vehicles()
+        ).order_by('-pk')
+        page = self.paginate_queryset(links.values_list('vehicle_id', flat=True))
+        vehicles = Vehicle.objects.with_listing_data().in_bulk(page)
+        serializer = VehicleListSerializer(
+            [vehicles[pk] for pk in page if pk in vehicles], many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
 
     def get_object(self):
         """
         Get the favorite vehicle for the current user
         """
-        user = self.request.user
+        return FavoriteVehicle.for_user(self.request.user)
 
-        return FavoriteVehicle.objects.get_or_create(user=user)[0]
+    @action(detail=False, methods=['post'])
+    def batch(self, request, *args, **kwargs):
+        """
+        Add, remove and toggle several vehicles at once, e.g.
+        ``{"add": [1, 2], "remove": [3], "toggle": [4]}``
+        """
+        serializer = FavoriteBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        favorite = FavoriteVehicle.for_user(request.user)
+        return Response(favorite.update_vehicles(self.get_available_vehicles(), **serializer.validated_data))
 
     @action(detail=False, methods=['post'])
     def add_to_favorites(self, request, *args, **kwargs):
@@ -239,8 +418,10 @@ class FavoriteVehicleViewSet(viewsets.ModelViewSet):
         Add a vehicle to the user's favorites
         """
         vehicle_id = request.data.get('vehicle_id')
-        favorite = FavoriteVehicle.objects.get_or_create(user=self.request.user)[0]
-        favorite.vehicles.add(vehicle_id)
+        favorite = FavoriteVehicle.for_user(self.request.user)
+        result = favorite.update_vehicles(self.get_available_vehicles(), add=self.vehicle_ids(vehicle_id))
+        if result['not_found']:
+            return Response({"error": "Vehicle not found"}, status=status.HTTP_404_NOT_FOUND)
 
         return Response(
             {"status": "success", "message": "Vehicle added to favorites"},
@@ -249,34 +430,31 @@ class FavoriteVehicleViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def remove_from_favorites(self, request, *args, **kwargs):
         """
-        Add a vehicle to the user's favorites
+        Remove a vehicle from the user's favorites
         """
         vehicle_id = request.data.get('vehicle_id')
-        favorite = FavoriteVehicle.objects.get_or_create(user=self.request.user)[0]
-        favorite.vehicles.remove(vehicle_id)
+        favorite = FavoriteVehicle.for_user(self.request.user)
+        favorite.update_vehicles(self.get_available_vehicles(), remove=self.vehicle_ids(vehicle_id))
 
         return Response(
             {"status": "success", "message": "Vehicle removed from favorites"},
         )
 
+    @staticmethod
+    def vehicle_ids(vehicle_id):
+        try:
+            return [int(vehicle_id)]
+        except (TypeError, ValueError):
+            raise ValidationError({"vehicle_id": "A valid vehicle id is required."})
+
 
 class StatisticsAPIView(APIView):
     permission_classes = [AllowAny]
     def get(self, request, *args, **kwargs):
         """
-        Get statistics about vehicles
+        Get statistics about vehicles, rentals and support tickets
         """
-        total_vehicles = Vehicle.objects.count()
-        total_favorited_vehicles = FavoriteVehicle.vehicles.through.objects.count()
-        total_reviews = VehicleReview.objects.count()
-
-        stats = {
-            "total_vehicles": total_vehicles,
-            "total_favorited_vehicles": total_favorited_vehicles,
-            "total_reviews": total_reviews,
-        }
-
-        return Response(stats)
+        return Response(get_statistics())
 
 class VehiclePriceViewSet(viewsets.ModelViewSet):
     queryset = VehiclePrice.objects.all()
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class VehiclesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.apps.vehicles"
+
+    def ready(self):
+        from . import signals, search, images, similarity, statistics  # noqa
+        from core.search import fill_empty_indexes
+        post_migrate.connect(fill_empty_indexes, sender=self, dispatch_uid=f'search-index-{self.label}')
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.cache import cache
+
+DETAIL_TIMEOUT = getattr(settings, 'VEHICLE_DETAIL_CACHE_TIMEOUT', 60 * 60)
+HITS_KEY = 'vehicle-detail:hits'
+MISSES_KEY = 'vehicle-detail:misses'
+
+
+def _detail_key(vehicle, host, language, is_staff):
+    # The cache is per process and writers such as cron jobs and imports run
+    # in others, so the key names the row's state instead of being deleted:
+    # every change to the payload moves updated_at
+    state = f'{vehicle.updated_at.isoformat()}:{vehicle.brand.updated_at.isoformat()}:' \
+            f'{vehicle.effective_price}:{vehicle.available_units}'
+    return f'vehicle-detail:{vehicle.pk}:{state}:{host}:{language}:{int(is_staff)}'
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_vehicle_detail(vehicle, host, language, is_staff, build):
+    """
+    Return the cached serialized detail payload, building and storing it
+    with ``build()`` on a miss. The host is part of the key because image
+    URLs in the payload are absolute; old states are left to expire.
+    """
+    key = _detail_key(vehicle, host, language, is_staff)
+    data = cache.get(key)
+    if data is not None:
+        _count(HITS_KEY)
+        return data
+
+    _count(MISSES_KEY)
+    data = build()
+    cache.set(key, data, DETAIL_TIMEOUT)
+    return data
+
+
+def get_cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,21 @@
+from django.utils import timezone
+
+from src.apps.vehicles import statistics
+from src.apps.vehicles.models import Vehicle
+
+
+def refresh_effective_prices():
+    """
+    Roll scheduled VehiclePrice entries forward once their start date arrives.
+    """
+    today = timezone.now().date()
+    updated = Vehicle.objects.filter(prices__start_date__lte=today).refresh_effective_price()
+    print(f"✅ Refreshed effective price for {updated} vehicles")
+
+
+def reconcile_statistics():
+    """
+    Recount the statistics counters in case bulk writes skipped the signals.
+    """
+    counts = statistics.reconcile()
+    print(f"✅ Reconciled {len(counts)} statistics counters")
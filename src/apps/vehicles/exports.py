@@ -0,0 +1,8 @@
+from core.exports import Export
+
+vehicle_export = Export('vehicles', [
+    'id', 'brand__name', 'model', 'year', 'type', 'status', 'price', 'effective_price', 'currency',
+    'body_type', 'color', 'mileage', 'engine_type', 'engine_capacity', 'cylinders', 'transmission',
+    'seats', 'available_units', 'is_active', 'is_available', 'is_featured', 'staff_only',
+    'insurance_expiry', 'created_at', 'updated_at',
+])
@@ -0,0 +1,5 @@
+from core.images import ImageVariants
+from .models import Brand, VehicleImage
+
+vehicle_image_variants = ImageVariants(VehicleImage)
+brand_logo_variants = ImageVariants(Brand, 'logo', 'logo_variants')
@@ -0,0 +1,211 @@
+import codecs
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, models, transaction
+
+from .images import vehicle_image_variants
+from .models import Brand, Feature, Vehicle, VehicleImage, VehiclePrice, VehiclePriceTier
+from .search import vehicle_index
+from .statistics import count_created
+
+# Vehicle columns taken as-is; brand and features are resolved by name
+IMPORT_FIELDS = [
+    field.name for field in Vehicle._meta.concrete_fields
+    if field.editable and not field.primary_key and field.name not in ('brand', 'inquiry_data')
+]
+# CSV cells holding several values separate them with a pipe
+LIST_SEPARATOR = '|'
+
+
+def read_rows(file, file_format):
+    """
+    Yield ``(line, row)`` pairs from a CSV or JSONL byte stream without
+    reading it all into memory.
+    """
+    lines = codecs.iterdecode(file, 'utf-8-sig')
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format in ('jsonl', 'ndjson'):
+        for line_num, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = e
+            yield line_num, row
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+class VehicleImporter:
+    """
+    Bulk import of vehicles with their images, features, price schedule
+    and price tiers.
+
+    Rows are validated one by one and written with bulk_create in chunks,
+    each chunk in its own transaction, so a bad row never blocks the rest.
+    Image paths must already exist in media storage; their variants are
+    queued after each chunk unless ``queue_variants`` is off.
+    """
+
+    def __init__(self, chunk_size=500, create_missing=False, queue_variants=True):
+        self.chunk_size = chunk_size
+        self.create_missing = create_missing
+        self.queue_variants = queue_variants
+        self.brands = {brand.name.casefold(): brand for brand in Brand.objects.all()}
+        self.features = {feature.name.casefold(): feature for feature in Feature.objects.all()}
+        self.created = 0
+        self.errors = []
+
+    def run(self, rows):
+        chunk = []
+        for line, row in rows:
+            try:
+                chunk.append((line, self.build(row)))
+            except ValidationError as e:
+                self.errors.append({'row': line, 'errors': getattr(e, 'message_dict', None) or e.messages})
+                continue
+            if len(chunk) >= self.chunk_size:
+                self.write(chunk)
+                chunk = []
+        if chunk:
+            self.write(chunk)
+        return self.report()
+
+    def report(self):
+        return {'created': self.created, 'failed': len(self.errors), 'errors': self.errors}
+
+    def build(self, row):
+        """Validate a row into an unsaved vehicle plus its related rows"""
+        if isinstance(row, Exception):
+            raise ValidationError(f"Invalid JSON: {row}")
+        if not isinstance(row, dict):
+            raise ValidationError("Each row must be an object.")
+
+        values = {}
+        for name in IMPORT_FIELDS:
+            value = row.get(name)
+            if value in (None, ''):
+                continue
+            if isinstance(Vehicle._meta.get_field(name), models.BooleanField) and isinstance(value, str):
+                value = value.strip().lower() in ('1', 'true', 'yes')
+            values[name] = value
+
+        vehicle = Vehicle(brand=self.resolve_brand(row.get('brand')), **values)
+        vehicle.full_clean(exclude=['brand', 'inquiry_data'], validate_unique=False)
+        vehicle.effective_price = vehicle.price
+
+        features = [self.resolve_feature(name) for name in self.split(row.get('features'))]
+        images = [
+            VehicleImage(image=path, is_primary=index == 0)
+            for index, path in enumerate(self.split(row.get('images')))
+        ]
+        try:
+            prices = [self.build_price(entry) for entry in self.load(row.get('prices'))]
+        except ValidationError as e:
+            raise ValidationError({'prices': e.messages})
+        if len({price.start_date for price in prices}) != len(prices):
+            raise ValidationError({'prices': ["Two prices start on the same date."]})
+        try:
+            tiers = [self.build_tier(entry) for entry in self.load(row.get('price_tiers'))]
+        except ValidationError as e:
+            raise ValidationError({'price_tiers': e.messages})
+        return vehicle, features, images, prices, tiers
+
+    def write(self, chunk):
+        try:
+            self.save_chunk([built for _line, built in chunk])
+        except DatabaseError as e:
+            self.errors += [{'row': line, 'errors': [str(e)]} for line, _built in chunk]
+
+    def save_chunk(self, chunk):
+        vehicles = [vehicle for vehicle, *_ in chunk]
+        with transaction.atomic():
+            Vehicle.objects.bulk_create(vehicles)
+
+            feature_links, images, prices, tiers = [], [], [], []
+            for vehicle, vehicle_features, vehicle_images, vehicle_prices, vehicle_tiers in chunk:
+                feature_links += [
+                    Vehicle.features.through(vehicle_id=vehicle.pk, feature_id=feature.pk)
+                    for feature in {feature.pk: feature for feature in vehicle_features}.values()
+                ]
+                for related in (*vehicle_images, *vehicle_prices, *vehicle_tiers):
+                    related.vehicle = vehicle
+                images += vehicle_images
+                prices += vehicle_prices
+                tiers += vehicle_tiers
+
+            Vehicle.features.through.objects.bulk_create(feature_links)
+            VehicleImage.objects.bulk_create(images)
+            VehiclePrice.objects.bulk_create(prices)
+            VehiclePriceTier.objects.bulk_create(tiers)
+
+            # bulk_create skips the signals that keep these in sync
+            if prices:
+                Vehicle.objects.filter(pk__in={price.vehicle_id for price in prices}).refresh_effective_price()
+            vehicle_index.index(Vehicle.objects.filter(pk__in=[v.pk for v in vehicles]).select_related('brand'))
+            count_created(Vehicle, vehicles)
+            if self.queue_variants:
+                for image in images:
+                    vehicle_image_variants.schedule(VehicleImage, image)
+
+        self.created += len(vehicles)
+
+    def resolve_brand(self, name):
+        name = str(name or '').strip()
+        if not name:
+            raise ValidationError({'brand': ["This field is required."]})
+        brand = self.brands.get(name.casefold())
+        if brand is None:
+            if not self.create_missing:
+                raise ValidationError({'brand': [f"Unknown brand: {name}"]})
+            brand = self.brands[name.casefold()] = Brand.objects.create(name=name)
+        return brand
+
+    def resolve_feature(self, name):
+        feature = self.features.get(name.casefold())
+        if feature is None:
+            if not self.create_missing:
+                raise ValidationError({'features': [f"Unknown feature: {name}"]})
+            feature = self.features[name.casefold()] = Feature.objects.create(name=name)
+        return feature
+
+    def build_price(self, entry):
+        price = VehiclePrice(price=entry.get('price'), start_date=entry.get('start_date'))
+        price.full_clean(exclude=['vehicle'], validate_unique=False)
+        return price
+
+    def build_tier(self, entry):
+        tier = VehiclePriceTier(
+            min_days=entry.get('min_days'), max_days=entry.get('max_days') or None,
+            price_per_day=entry.get('price_per_day'),
+        )
+        tier.full_clean(exclude=['vehicle'])
+        return tier
+
+    @staticmethod
+    def split(value):
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = value.split(LIST_SEPARATOR)
+        return [str(item).strip() for item in value if str(item).strip()]
+
+    @staticmethod
+    def load(value):
+        """Price schedules and tiers are lists of objects, JSON encoded in CSV cells"""
+        if not value:
+            return []
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise ValidationError("Prices and price tiers must be JSON lists.")
+        if not isinstance(value, list) or not all(isinstance(entry, dict) for entry in value):
+            raise ValidationError("Prices and price tiers must be JSON lists.")
+        return value
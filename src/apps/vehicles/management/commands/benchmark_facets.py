@@ -0,0 +1,56 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from ...api.viewsets import VehicleViewSet
+from ...models import Brand, Vehicle
+from ...search import vehicle_index
+
+BRANDS = ['تويوتا', 'نيسان', 'Lexus', 'Mercedes', 'BMW', 'Hyundai', 'Kia', 'Ford']
+BODY_TYPES = ['SUV', 'Sedan', 'Pickup', 'Coupe', 'Hatchback', 'Van']
+REQUESTS = [{}, {'transmission': 'automatic'}, {'search': 'تويوتا'}, {'search': 'suv', 'engine_type': 'diesel'}]
+
+
+class Command(BaseCommand):
+    help = 'Measures vehicle facet latency against a synthetic catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehicles', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            brands = [Brand.objects.create(name=name) for name in BRANDS]
+            self.stdout.write(f"Creating {options['vehicles']} vehicles...")
+            vehicles = []
+            for i in range(options['vehicles']):
+                price = random.randint(1000, 150000)
+                vehicles.append(Vehicle(
+                    brand=random.choice(brands), model=f'Model {i}', year=random.randint(2000, 2025),
+                    price=price, effective_price=price, body_type=random.choice(BODY_TYPES),
+                    color='White', mileage=0, engine_type=random.choice(['gasoline', 'diesel', 'hybrid']),
+                    engine_capacity=2.0, cylinders=4, transmission=random.choice(['automatic', 'manual']),
+                    seats=5, type=random.choice(['new', 'used', 'rent']), staff_only=random.random() < 0.1,
+                ))
+            Vehicle.objects.bulk_create(vehicles, batch_size=5000)
+            vehicle_index.rebuild()
+
+            view = VehicleViewSet.as_view({'get': 'facets'})
+            factory = RequestFactory()
+            for params in REQUESTS:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    response = view(factory.get('/', params))
+                    response.render()
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f"{params}: {response.data['count']} vehicles, "
+                    f"median {timings[len(timings) // 2]:.1f} ms, max {timings[-1]:.1f} ms"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,71 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from ...api.viewsets import VehicleViewSet
+from ...models import Brand, Feature, Vehicle
+from ...similarity import vehicle_similarity
+
+BODY_TYPES = ['SUV', 'Sedan', 'Pickup', 'Coupe', 'Hatchback', 'Van']
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Measures similar-vehicle latency against a synthetic catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehicles', type=int, default=50000)
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            brands = [Brand.objects.create(name=f'Brand {i}') for i in range(40)]
+            features = [Feature.objects.create(name=f'Feature {i}') for i in range(60)]
+            self.stdout.write(f"Creating {options['vehicles']} vehicles...")
+            vehicles = []
+            for i in range(options['vehicles']):
+                price = random.randint(1000, 150000)
+                vehicles.append(Vehicle(
+                    brand=random.choice(brands), model=f'Model {i}', year=random.randint(2000, 2025),
+                    price=price, effective_price=price, body_type=random.choice(BODY_TYPES),
+                    color='White', mileage=random.randint(0, 300000),
+                    engine_type=random.choice(['gasoline', 'diesel', 'hybrid', 'electric']),
+                    engine_capacity=random.choice([1.5, 2.0, 2.5, 3.5, 4.0]), cylinders=4,
+                    transmission=random.choice(['automatic', 'manual', 'cvt']), seats=random.choice([2, 5, 7, 8]),
+                ))
+            vehicles = Vehicle.objects.bulk_create(vehicles, batch_size=5000)
+            Vehicle.features.through.objects.bulk_create([
+                Vehicle.features.through(vehicle_id=vehicle.pk, feature_id=feature.pk)
+                for vehicle in vehicles for feature in random.sample(features, random.randint(0, 8))
+            ], batch_size=5000)
+
+            vehicle_similarity.reset()
+            started = time.perf_counter()
+            vehicle_similarity.sync(force=True)
+            self.stdout.write(f"Built index in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+            ids = [vehicle.pk for vehicle in random.sample(vehicles, min(options['requests'], len(vehicles)))]
+            view = VehicleViewSet.as_view({'get': 'similar'})
+            factory = RequestFactory()
+            for label, call in (
+                ('index lookup', lambda pk: vehicle_similarity.similar(pk, 10)),
+                ('endpoint', lambda pk: view(factory.get('/'), pk=pk).render()),
+            ):
+                timings = []
+                for pk in ids:
+                    started = time.perf_counter()
+                    call(pk)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f"{label}: p50 {percentile(timings, 0.5):.2f} ms, "
+                    f"p99 {percentile(timings, 0.99):.2f} ms, max {timings[-1]:.2f} ms"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.images import IMAGE_VARIANTS
+
+
+class Command(BaseCommand):
+    help = 'Generates missing thumbnail/card/full variants for every registered image field'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist')
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for image_variants in IMAGE_VARIANTS:
+                label = f'{image_variants.model.__name__}.{image_variants.field_name}'
+
+                def generate(instance, image_variants=image_variants):
+                    try:
+                        image_variants.generate(instance)
+                        return True
+                    except Exception as e:
+                        self.stderr.write(f'{label} {instance.pk}: {e}')
+                        return False
+                    finally:
+                        close_old_connections()
+
+                results = list(executor.map(generate, image_variants.pending(force=options['force'])))
+                self.stdout.write(self.style.SUCCESS(
+                    f'{label}: generated {sum(results)}, failed {len(results) - sum(results)}'
+                ))
@@ -0,0 +1,42 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importer import VehicleImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Imports vehicles from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--create-missing', action='store_true', help='Create unknown brands and features')
+        parser.add_argument(
+            '--queue-variants', action='store_true',
+            help='Generate image variants in the background instead of leaving them to generate_image_variants'
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if file_format not in ('csv', 'jsonl', 'ndjson'):
+            raise CommandError(f'Unsupported import format: {file_format}')
+
+        started = time.perf_counter()
+        importer = VehicleImporter(
+            chunk_size=options['chunk_size'],
+            create_missing=options['create_missing'],
+            queue_variants=options['queue_variants'],
+        )
+        with open(options['path'], 'rb') as file:
+            report = importer.run(read_rows(file, file_format))
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} vehicles, {report['failed']} rows failed "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
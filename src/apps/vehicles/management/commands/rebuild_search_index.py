@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.search import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search indexes for vehicles and car listings'
+
+    def handle(self, *args, **kwargs):
+        for search_index in SEARCH_INDEXES:
+            if not search_index.is_supported():
+                self.stdout.write(self.style.WARNING(f'Skipping {search_index.table}: database not supported'))
+                continue
+
+            with transaction.atomic():
+                search_index.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {search_index.table}'))
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:07
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def populate_effective_price(apps, schema_editor):
+    Vehicle = apps.get_model('vehicles', 'Vehicle')
+    VehiclePrice = apps.get_model('vehicles', 'VehiclePrice')
+
+    price_entry = VehiclePrice.objects.filter(
+        vehicle=OuterRef('pk'), start_date__lte=timezone.now().date()
+    ).order_by('-start_date').values('price')[:1]
+    Vehicle.objects.update(effective_price=Coalesce(
+        Subquery(price_entry), 'price',
+        output_field=models.DecimalField(max_digits=10, decimal_places=3)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0013_vehiclerequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='effective_price',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=3, editable=False, help_text='Price customers currently see, kept in sync with the price schedule.', max_digits=10, null=True, verbose_name='Effective Price'),
+        ),
+        migrations.RunPython(populate_effective_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class RunSQLiteSQL(migrations.RunSQL):
+    """FTS5 tables only exist on SQLite; other backends search with LIKE lookups"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0014_vehicle_effective_price'),
+    ]
+
+    # Rows are indexed by core.search.fill_empty_indexes after migrating
+    operations = [
+        RunSQLiteSQL(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS vehicles_vehicle_fts USING fts5(document, tokenize="unicode61 remove_diacritics 2")',
+            'DROP TABLE IF EXISTS vehicles_vehicle_fts',
+        ),
+    ]
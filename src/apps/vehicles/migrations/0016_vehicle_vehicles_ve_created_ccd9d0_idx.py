@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0015_vehicle_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['created_at', 'id'], name='vehicles_ve_created_ccd9d0_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-17 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0018_brand_logo_variants_vehicleimage_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['updated_at'], name='vehicles_ve_updated_d02ef6_idx'),
+        ),
+    ]
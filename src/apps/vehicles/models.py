@@ -1,16 +1,24 @@
 # Create your models here.
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
+# Upper bounds of the price facet buckets, the last bucket is open ended
+PRICE_FACET_BUCKETS = (5000, 10000, 20000, 50000, 100000)
+
+
 class Brand(models.Model):
     """Brand model to categorize vehicles by manufacturer"""
     name = models.CharField(_("Brand Name"), max_length=100)
     logo = models.ImageField(_("Brand Logo"), upload_to='brands/', blank=True, null=True)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField(_("Description"), blank=True)
     primary = models.BooleanField(_("Primary Brand"), default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -29,11 +37,103 @@ class VehicleType(models.Model):
 class Feature(models.Model):
     """Features that can be assigned to vehicles"""
     name = models.CharField(_("Feature Name"), max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
 
+class VehicleQuerySet(models.QuerySet):
+
+    def with_listing_data(self):
+        """
+        Annotate the primary image path and variants so list serializers
+        don't need a query per row. The price customers see is stored in effective_price.
+        """
+        primary_image = VehicleImage.objects.filter(
+            vehicle=OuterRef('pk'), is_primary=True
+        ).order_by('id').values('image')[:1]
+
+        return self.select_related('brand').annotate(
+            primary_image_path=Subquery(primary_image),
+            primary_image_variants=Subquery(
+                primary_image.values('image_variants'), output_field=models.JSONField()
+            ),
+        )
+
+    def facet_counts(self, price_buckets=PRICE_FACET_BUCKETS):
+        """
+        Count the rows per brand, body type, year, choice field value and
+        effective price bucket. Choice fields and price buckets come from one
+        conditional aggregate; the open ended fields need a GROUP BY each.
+        """
+        queryset = self.order_by()
+        choice_fields = ('engine_type', 'transmission', 'type')
+        bounds = list(zip((None, *price_buckets), (*price_buckets, None)))
+
+        aggregates = {'total': Count('pk')}
+        for name in choice_fields:
+            for index, (value, _label) in enumerate(self.model._meta.get_field(name).choices):
+                aggregates[f'{name}_{index}'] = Count('pk', filter=Q(**{name: value}))
+        for index, (low, high) in enumerate(bounds):
+            condition = Q(effective_price__isnull=False)
+            if low is not None:
+                condition &= Q(effective_price__gte=low)
+            if high is not None:
+                condition &= Q(effective_price__lt=high)
+            aggregates[f'price_{index}'] = Count('pk', filter=condition)
+        totals = queryset.aggregate(**aggregates)
+
+        facets = {'count': totals['total']}
+        facets['brand'] = [
+            {'value': row['brand'], 'label': row['brand__name'], 'count': row['count']}
+            for row in queryset.values('brand', 'brand__name').annotate(count=Count('pk')).order_by('-count', 'brand__name')
+        ]
+        for name in choice_fields:
+            facets[name] = [
+                {'value': value, 'label': str(label), 'count': totals[f'{name}_{index}']}
+                for index, (value, label) in enumerate(self.model._meta.get_field(name).choices)
+                if totals[f'{name}_{index}']
+            ]
+        facets['body_type'] = [
+            {'value': row['body_type'], 'label': row['body_type'], 'count': row['count']}
+            for row in queryset.values('body_type').annotate(count=Count('pk')).order_by('-count', 'body_type')
+        ]
+        facets['year'] = [
+            {'value': row['year'], 'label': str(row['year']), 'count': row['count']}
+            for row in queryset.values('year').annotate(count=Count('pk')).order_by('-year')
+        ]
+        facets['price'] = [
+            {'min': low, 'max': high, 'count': totals[f'price_{index}']}
+            for index, (low, high) in enumerate(bounds)
+            if totals[f'price_{index}']
+        ]
+        return facets
+
+    def refresh_effective_price(self):
+        """
+        Recompute effective_price from the latest VehiclePrice entry that has
+        started, falling back to the base price. Only rows whose price
+        actually changes are updated (and get a new updated_at).
+        """
+        today = timezone.now().date()
+        price_entry = VehiclePrice.objects.filter(
+            vehicle=OuterRef('pk'), start_date__lte=today
+        ).order_by('-start_date').values('price')[:1]
+        new_price = Coalesce(
+            Subquery(price_entry), 'price',
+            output_field=models.DecimalField(max_digits=10, decimal_places=3)
+        )
+
+        changed = self.annotate(new_price=new_price).exclude(effective_price=F('new_price'))
+        vehicle_ids = list(changed.values_list('pk', flat=True))
+        if not vehicle_ids:
+            return 0
+        return Vehicle.objects.filter(pk__in=vehicle_ids).update(
+            effective_price=new_price, updated_at=timezone.now()
+        )
+
+
 class Vehicle(models.Model):
     """Main vehicle model with all specifications"""
     # Basic Info
@@ -109,9 +209,20 @@ class Vehicle(models.Model):
         default=1,
         help_text=_("Number of identical vehicles available for rent.")
     )
+    effective_price = models.DecimalField(
+        _("Effective Price"), max_digits=10, decimal_places=3, null=True, blank=True,
+        editable=False, db_index=True,
+        help_text=_("Price customers currently see, kept in sync with the price schedule.")
+    )
+
+    objects = VehicleQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at']),
+        ]
 
     def __str__(self):
         return f"{self.brand} {self.model} {self.year}"
@@ -121,12 +232,41 @@ class Vehicle(models.Model):
         price_entry = self.prices.filter(start_date__lte=today).order_by('-start_date').first()
         return price_entry.price if price_entry else self.price
 
+    def save(self, *args, **kwargs):
+        # New vehicles have no price schedule yet, so the base price applies
+        self.effective_price = self.current_price if self.pk else self.price
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'price' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'effective_price'}
+        super().save(*args, **kwargs)
+
+    def reserve_unit(self):
+        """
+        Take one unit in a single conditional UPDATE, so concurrent
+        reservations can't both get the last one. False when none is left.
+        """
+        now = timezone.now()
+        vehicles = Vehicle.objects.filter(pk=self.pk)
+        if not vehicles.filter(available_units__gt=0).update(available_units=F('available_units') - 1, updated_at=now):
+            return False
+        vehicles.filter(available_units=0).update(status='rented', is_available=False)
+        self.refresh_from_db(fields=['available_units', 'status', 'is_available', 'updated_at'])
+        return True
+
+    def release_unit(self):
+        """Give a unit back, making a fully rented vehicle available again"""
+        vehicles = Vehicle.objects.filter(pk=self.pk)
+        vehicles.update(available_units=F('available_units') + 1, updated_at=timezone.now())
+        vehicles.filter(status='rented').update(status='available', is_available=True)
+        self.refresh_from_db(fields=['available_units', 'status', 'is_available', 'updated_at'])
+
 
 
 class VehicleImage(models.Model):
     """Additional images for the vehicle"""
     vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(_("Image"), upload_to='vehicles/gallery/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_primary = models.BooleanField(_("Primary Image"), default=False)
     caption = models.CharField(_("Caption"), max_length=255, blank=True)
 
@@ -157,6 +297,45 @@ class FavoriteVehicle(models.Model):
     def __str__(self):
         return self.user.username
 
+    @classmethod
+    def for_user(cls, user):
+        """The user's favorites, created on first use"""
+        return cls.objects.filter(user=user).first() or cls.objects.create(user=user)
+
+    @classmethod
+    def vehicle_ids(cls, user, vehicle_ids=None):
+        """Ids of the vehicles the user favorited, optionally limited to ``vehicle_ids``"""
+        if user is None or not user.is_authenticated:
+            return set()
+        links = cls.vehicles.through.objects.filter(favoritevehicle__user=user)
+        if vehicle_ids is not None:
+            links = links.filter(vehicle_id__in=vehicle_ids)
+        return set(links.values_list('vehicle_id', flat=True))
+
+    def update_vehicles(self, available, add=(), remove=(), toggle=()):
+        """
+        Apply a batch of changes with one lookup of the current favorites.
+
+        Only vehicles in the ``available`` queryset can be added; anything
+        already favorited can always be removed.
+        """
+        add, remove, toggle = set(add), set(remove), set(toggle)
+        current = set(self.vehicles.filter(pk__in=add | remove | toggle).values_list('pk', flat=True))
+        wanted = add | (toggle - current)
+        found = set(available.filter(pk__in=wanted - current).values_list('pk', flat=True))
+
+        added = found
+        removed = (remove | toggle) & current
+        if added:
+            self.vehicles.add(*added)
+        if removed:
+            self.vehicles.remove(*removed)
+        return {
+            'added': sorted(added),
+            'removed': sorted(removed),
+            'not_found': sorted(wanted - current - found),
+        }
+
 
 class VehiclePrice(models.Model):
     vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='prices')
@@ -190,3 +369,13 @@ class VehicleRequest(models.Model):
 
     def __str__(self):
         return f"Request for {self.vehicle_name} by {self.user.username} on {self.date.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class StatisticCounter(models.Model):
+    """Running count behind StatisticsAPIView, see statistics.py"""
+    key = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
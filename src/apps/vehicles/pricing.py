@@ -0,0 +1,108 @@
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import VehiclePriceTier
+
+TIERS_TIMEOUT = getattr(settings, 'PRICE_TIER_CACHE_TIMEOUT', 60 * 60)
+
+
+def _tiers_key(vehicle):
+    # Tier changes move the vehicle's updated_at (see signals.py), which
+    # retires the old entry in every process without deleting it
+    return f'vehicle-price-tiers:{vehicle.pk}:{vehicle.updated_at.isoformat()}'
+
+
+def rental_days(start, end):
+    """Billable days between two datetimes; a started day counts as a full day"""
+    delta = end - start
+    return delta.days + (1 if delta.seconds > 0 else 0)
+
+
+class TierTable:
+    """
+    A vehicle's price tiers as sorted, non-overlapping day intervals.
+
+    Where tiers overlap the one with the lowest ``min_days`` wins, as the
+    old per-rental query did, so each interval has exactly one price and a
+    duration is resolved with one bisect.
+    """
+
+    def __init__(self, tiers):
+        self.starts = []
+        self.intervals = []
+        reach = 0
+        for min_days, max_days, price_per_day in sorted(tiers, key=lambda tier: tier[0]):
+            # Days up to ``reach`` already belong to a tier with a lower min_days
+            start = max(min_days, reach + 1)
+            if max_days is not None and max_days < start:
+                continue
+            self.starts.append(start)
+            self.intervals.append((start, max_days, price_per_day))
+            if max_days is None:
+                break
+            reach = max_days
+
+    def price_per_day(self, days):
+        """The tier's daily price for a duration, or None when no tier covers it"""
+        index = bisect_right(self.starts, days) - 1
+        if index < 0:
+            return None
+        _start, max_days, price_per_day = self.intervals[index]
+        if max_days is not None and days > max_days:
+            return None
+        return price_per_day
+
+
+def get_tier_tables(vehicles):
+    """Tier tables of several vehicles by id, loading the uncached ones in one query"""
+    keys = {vehicle.pk: _tiers_key(vehicle) for vehicle in vehicles}
+    cached = cache.get_many(keys.values())
+    tables = {vehicle_id: cached[key] for vehicle_id, key in keys.items() if key in cached}
+
+    missing = [vehicle_id for vehicle_id in keys if vehicle_id not in tables]
+    if missing:
+        tiers = {vehicle_id: [] for vehicle_id in missing}
+        rows = VehiclePriceTier.objects.filter(vehicle_id__in=missing).values_list(
+            'vehicle_id', 'min_days', 'max_days', 'price_per_day'
+        )
+        for vehicle_id, *tier in rows:
+            tiers[vehicle_id].append(tier)
+        loaded = {vehicle_id: TierTable(vehicle_tiers) for vehicle_id, vehicle_tiers in tiers.items()}
+        cache.set_many({keys[vehicle_id]: table for vehicle_id, table in loaded.items()}, TIERS_TIMEOUT)
+        tables.update(loaded)
+    return tables
+
+
+def quote(vehicle, start, end, table=None):
+    """
+    Price of renting ``vehicle`` from ``start`` to ``end``: the matching
+    tier's daily price, or the vehicle's effective price (the one listings
+    show) when no tier applies.
+    """
+    if table is None:
+        table = get_tier_tables([vehicle])[vehicle.pk]
+    days = rental_days(start, end)
+    price_per_day = table.price_per_day(days)
+    tier_applied = price_per_day is not None
+    if not tier_applied:
+        price_per_day = vehicle.effective_price
+    return {
+        'days': days,
+        'price_per_day': price_per_day,
+        'total': price_per_day * days,
+        'tier_applied': tier_applied,
+    }
+
+
+def quote_many(vehicles, items):
+    """
+    Quotes for ``(vehicle_id, start, end)`` items against a ``{id: vehicle}``
+    map; ids missing from the map get None.
+    """
+    tables = get_tier_tables({vehicles[vehicle_id] for vehicle_id, _start, _end in items if vehicle_id in vehicles})
+    return [
+        quote(vehicles[vehicle_id], start, end, tables[vehicle_id]) if vehicle_id in vehicles else None
+        for vehicle_id, start, end in items
+    ]
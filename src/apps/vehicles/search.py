@@ -0,0 +1,29 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.search import SearchIndex
+from .models import Brand, Vehicle
+
+vehicle_index = SearchIndex(
+    'vehicles_vehicle_fts',
+    Vehicle,
+    lambda vehicle: [vehicle.model, vehicle.color, vehicle.brand.name, vehicle.body_type, vehicle.year],
+)
+
+
+@receiver(post_save, sender=Vehicle)
+def index_vehicle(sender, instance, raw=False, **kwargs):
+    if not raw:
+        vehicle_index.index([instance])
+
+
+@receiver(post_delete, sender=Vehicle)
+def unindex_vehicle(sender, instance, **kwargs):
+    vehicle_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand_vehicles(sender, instance, created, raw=False, **kwargs):
+    """Brand names are part of the vehicle search documents"""
+    if not created and not raw:
+        vehicle_index.index(instance.vehicles.select_related('brand'))
@@ -0,0 +1,77 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.images import variants_generated
+from .models import Brand, Feature, InquiryData, Vehicle, VehicleImage, VehiclePrice, VehiclePriceTier
+
+
+def touch_vehicles(vehicle_ids):
+    """Move updated_at of vehicles whose payload changed, which also retires their cached detail"""
+    Vehicle.objects.filter(pk__in=list(vehicle_ids)).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=VehiclePrice)
+@receiver(post_delete, sender=VehiclePrice)
+def refresh_vehicle_effective_price(sender, instance, **kwargs):
+    """Keep the stored effective price in sync when the price schedule changes"""
+    Vehicle.objects.filter(pk=instance.vehicle_id).refresh_effective_price()
+
+
+@receiver(post_save, sender=VehiclePriceTier)
+@receiver(post_delete, sender=VehiclePriceTier)
+@receiver(post_save, sender='rental.Rental')
+@receiver(post_delete, sender='rental.Rental')
+def touch_vehicle_on_related_change(sender, instance, **kwargs):
+    """Tiers and rentals (staff_renters) are part of the vehicle payload, and updated_at keys their caches"""
+    touch_vehicles([instance.vehicle_id])
+
+
+@receiver(post_save, sender=VehicleImage)
+@receiver(post_delete, sender=VehicleImage)
+def touch_vehicle_on_image_change(sender, instance, **kwargs):
+    """Images are part of the vehicle payload, so they move its updated_at"""
+    touch_vehicles([instance.vehicle_id])
+
+
+@receiver(m2m_changed, sender=Vehicle.features.through)
+def touch_vehicle_on_features_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        touch_vehicles([instance.pk])
+    elif action == 'pre_clear':
+        touch_vehicles(instance.vehicles.values_list('pk', flat=True))
+    else:
+        touch_vehicles(pk_set)
+
+
+@receiver(post_save, sender=Feature)
+def touch_vehicles_on_feature_rename(sender, instance, created, **kwargs):
+    if not created:
+        touch_vehicles(instance.vehicles.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Feature)
+def touch_vehicles_on_feature_delete(sender, instance, **kwargs):
+    # The through rows go away without m2m_changed, so catch the vehicles now
+    touch_vehicles(instance.vehicles.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=InquiryData)
+def touch_vehicles_on_nested_change(sender, instance, created, **kwargs):
+    """Brand and inquiry data are nested in the list and detail payloads"""
+    if not created:
+        touch_vehicles(instance.vehicles.values_list('pk', flat=True))
+
+
+@receiver(variants_generated, sender=VehicleImage)
+def touch_vehicle_on_image_variants(sender, instance, **kwargs):
+    touch_vehicles([instance.vehicle_id])
+
+
+@receiver(variants_generated, sender=Brand)
+def touch_brand_on_logo_variants(sender, instance, **kwargs):
+    Brand.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+    touch_vehicles(instance.vehicles.values_list('pk', flat=True))
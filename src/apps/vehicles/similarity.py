@@ -0,0 +1,206 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Vehicle
+
+# Numeric specs and the difference that counts as one unit of distance
+NUMERIC_SCALES = {
+    'year': 5,
+    'mileage': 50000,
+    'seats': 2,
+    'engine_capacity': 1,
+}
+# Price is compared on a log scale: doubling the price is one unit
+PRICE_WEIGHT = 1.0
+CATEGORY_WEIGHTS = {
+    'brand_id': 1.5,
+    'body_type': 1.5,
+    'engine_type': 1.0,
+    'transmission': 0.5,
+}
+FEATURE_WEIGHT = 0.5
+
+VALUE_FIELDS = [
+    'id', 'is_active', 'staff_only', 'updated_at', 'price', 'effective_price',
+    *NUMERIC_SCALES, *CATEGORY_WEIGHTS,
+]
+NUMERIC_COLUMNS = len(NUMERIC_SCALES) + 1
+
+# How often a request checks the database for changed vehicles, and how far
+# back it looks to catch rows committed late with an older updated_at
+SYNC_INTERVAL = getattr(settings, 'SIMILARITY_SYNC_INTERVAL', 1.0)
+SYNC_OVERLAP = timedelta(seconds=5)
+LOAD_CHUNK = 2000
+
+
+class SimilarityIndex:
+    """
+    In-memory matrix with one weighted vector per vehicle.
+
+    Numeric specs are scaled so one unit means "noticeably different";
+    brand, body type, engine, transmission and each feature get a one-hot
+    column. Squared euclidean distance to every row is one matrix-vector
+    product. Rows changed since the last sync are re-encoded in place, so
+    every process picks up changes made by the others.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.built = False
+        self.columns = {}
+        self.rows = {}
+        self.size = 0
+        self.width = NUMERIC_COLUMNS
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.matrix = np.zeros((0, NUMERIC_COLUMNS), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.active = np.zeros(0, dtype=bool)
+        self.staff_only = np.zeros(0, dtype=bool)
+        self.updated = {}
+        self.synced_at = None
+        self.window = None
+        self.checked_at = 0.0
+
+    def sync(self, force=False):
+        if not force and self.built and time.monotonic() - self.checked_at < SYNC_INTERVAL:
+            return
+        with self.lock:
+            self.checked_at = time.monotonic()
+            if not self.built:
+                self.load(Vehicle.objects.order_by())
+                self.built = True
+                return
+            if self.synced_at is None:
+                recent = Vehicle.objects.all()
+            else:
+                recent = Vehicle.objects.filter(updated_at__gte=self.synced_at - SYNC_OVERLAP)
+            # updated_at only moves forward, so a window with the same count
+            # and latest timestamp has no new or changed rows
+            window = recent.aggregate(count=Count('pk'), latest=Max('updated_at'))
+            if window == self.window:
+                return
+            # Only rows whose updated_at moved are fetched and encoded again
+            changed = [
+                pk for pk, updated_at in recent.order_by().values_list('id', 'updated_at')
+                if self.updated.get(pk) != updated_at
+            ]
+            for start in range(0, len(changed), LOAD_CHUNK):
+                self.load(Vehicle.objects.filter(pk__in=changed[start:start + LOAD_CHUNK]).order_by())
+            if self.synced_at is not None and window['latest'] != self.synced_at:
+                # The window moved forward, so measure it again on the next sync
+                window = None
+            self.window = window
+
+    def load(self, queryset):
+        rows = list(queryset.values(*VALUE_FIELDS))
+        if not rows:
+            return
+        features = defaultdict(list)
+        links = Vehicle.features.through.objects.filter(vehicle__in=queryset.values('pk'))
+        for vehicle_id, feature_id in links.values_list('vehicle_id', 'feature_id').iterator():
+            features[vehicle_id].append(feature_id)
+
+        encoded = [self.encode(row, features[row['id']]) for row in rows]
+        self.reserve(self.size + len(rows))
+        for row, (numeric, columns) in zip(rows, encoded):
+            index = self.rows.get(row['id'])
+            if index is None:
+                index = self.rows[row['id']] = self.size
+                self.size += 1
+            vector = self.matrix[index]
+            vector[:] = 0
+            vector[:NUMERIC_COLUMNS] = numeric
+            for column, weight in columns:
+                vector[column] = weight
+            self.ids[index] = row['id']
+            self.norms[index] = vector @ vector
+            self.active[index] = row['is_active']
+            self.staff_only[index] = row['staff_only']
+            self.updated[row['id']] = row['updated_at']
+
+            if self.synced_at is None or row['updated_at'] > self.synced_at:
+                self.synced_at = row['updated_at']
+
+    def encode(self, row, features):
+        price = row['effective_price'] if row['effective_price'] is not None else row['price']
+        numeric = [float(row[name] or 0) / scale for name, scale in NUMERIC_SCALES.items()]
+        numeric.append(PRICE_WEIGHT * math.log2(float(price) + 1))
+
+        columns = [(self.column(name, row[name]), weight) for name, weight in CATEGORY_WEIGHTS.items()]
+        columns += [(self.column('feature', feature_id), FEATURE_WEIGHT) for feature_id in features]
+        return numeric, columns
+
+    def column(self, name, value):
+        key = (name, value)
+        if key not in self.columns:
+            self.columns[key] = self.width
+            self.width += 1
+        return self.columns[key]
+
+    def reserve(self, rows):
+        """Grow the arrays geometrically so appends stay amortized O(1)"""
+        capacity, width = self.matrix.shape
+        if rows <= capacity and self.width <= width:
+            return
+        new_capacity = max(rows, capacity * 2) if rows > capacity else capacity
+        new_width = max(self.width, width * 2) if self.width > width else width
+
+        matrix = np.zeros((new_capacity, new_width), dtype=np.float32)
+        matrix[:capacity, :width] = self.matrix
+        self.matrix = matrix
+        for name in ('ids', 'norms', 'active', 'staff_only'):
+            array = getattr(self, name)
+            grown = np.zeros(new_capacity, dtype=array.dtype)
+            grown[:capacity] = array
+            setattr(self, name, grown)
+
+    def remove(self, vehicle_id):
+        with self.lock:
+            index = self.rows.get(vehicle_id)
+            if index is not None:
+                self.active[index] = False
+
+    def similar(self, vehicle_id, k=10, include_staff_only=False):
+        """Ids of the k nearest active vehicles, nearest first"""
+        self.sync()
+        with self.lock:
+            index = self.rows.get(vehicle_id)
+            if index is None:
+                return []
+            size = self.size
+            matrix = self.matrix[:size]
+            # |a - b|^2 = |a|^2 - 2ab + |b|^2, and |b|^2 is the same for every row
+            distances = self.norms[:size] - 2 * (matrix @ matrix[index])
+
+            candidates = self.active[:size].copy()
+            if not include_staff_only:
+                candidates &= ~self.staff_only[:size]
+            candidates[index] = False
+            distances[~candidates] = np.inf
+
+            count = min(k, int(candidates.sum()))
+            if count == 0:
+                return []
+            nearest = np.argpartition(distances, count - 1)[:count]
+            nearest = nearest[np.argsort(distances[nearest])]
+            return self.ids[nearest].tolist()
+
+
+vehicle_similarity = SimilarityIndex()
+
+
+@receiver(post_delete, sender=Vehicle)
+def remove_vehicle_from_similarity_index(sender, instance, **kwargs):
+    vehicle_similarity.remove(instance.pk)
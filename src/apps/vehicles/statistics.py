@@ -0,0 +1,191 @@
+import collections
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+
+from .models import FavoriteVehicle, StatisticCounter, Vehicle
+
+CACHE_KEY = 'vehicle-statistics'
+CACHE_TIMEOUT = getattr(settings, 'STATISTICS_CACHE_TIMEOUT', 30)
+
+COUNTERS = []
+
+
+class Counter:
+    """
+    Number of ``model`` rows matching ``filters``, or one count per value
+    of ``group_by`` stored as ``<name>:<value>``.
+
+    Signals move the stored value by one as rows are created, deleted or
+    change state; reconcile() recounts everything to fix any drift from
+    bulk writes that skip signals. Each counter is connected by the app
+    that owns its model.
+    """
+
+    def __init__(self, name, model, filters=None, group_by=None):
+        self.name = name
+        self.model = model
+        self.filters = filters or {}
+        self.group_by = group_by
+        COUNTERS.append(self)
+
+    def get_model(self):
+        return apps.get_model(self.model) if isinstance(self.model, str) else self.model
+
+    @property
+    def fields(self):
+        return [*self.filters, *([self.group_by] if self.group_by else [])]
+
+    def key_of(self, values):
+        """The key a row with these field values counts towards, if any"""
+        if any(values[field] != value for field, value in self.filters.items()):
+            return None
+        return f'{self.name}:{values[self.group_by]}' if self.group_by else self.name
+
+    def count(self):
+        queryset = self.get_model().objects.filter(**self.filters)
+        if not self.group_by:
+            return {self.name: queryset.count()}
+        field = self.get_model()._meta.get_field(self.group_by)
+        counts = {f'{self.name}:{value}': 0 for value, _label in field.choices or ()}
+        for row in queryset.order_by().values(self.group_by).annotate(total=Count('pk')):
+            counts[f'{self.name}:{row[self.group_by]}'] = row['total']
+        return counts
+
+    def connect(self):
+        dispatch_uid = f'statistics-{self.name}'
+        post_save.connect(self.row_saved, sender=self.model, dispatch_uid=dispatch_uid)
+        post_delete.connect(self.row_deleted, sender=self.model, dispatch_uid=dispatch_uid)
+        if self.fields:
+            post_init.connect(self.row_loaded, sender=self.model, dispatch_uid=dispatch_uid)
+            pre_save.connect(self.row_saving, sender=self.model, dispatch_uid=dispatch_uid)
+
+    @property
+    def loaded_key(self):
+        return f'_statistics_{self.name}'
+
+    def values_of(self, instance):
+        return {field: getattr(instance, field) for field in self.fields}
+
+    def row_loaded(self, sender, instance, **kwargs):
+        # Remember what the row counts towards as it comes from the database;
+        # deferred fields are left alone rather than fetched one by one
+        if instance.pk is not None and all(field in instance.__dict__ for field in self.fields):
+            instance.__dict__[self.loaded_key] = self.key_of(instance.__dict__)
+
+    def row_saving(self, sender, instance, raw=False, **kwargs):
+        # Only instances loaded without the counted fields need a query
+        if raw or instance.pk is None or self.loaded_key in instance.__dict__:
+            return
+        old = sender.objects.filter(pk=instance.pk).values(*self.fields).first()
+        instance.__dict__[self.loaded_key] = self.key_of(old) if old else None
+
+    def row_saved(self, sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        new = self.key_of(self.values_of(instance))
+        old = None if created else instance.__dict__.get(self.loaded_key)
+        if self.fields:
+            instance.__dict__[self.loaded_key] = new
+        elif not created:
+            return
+        if old != new:
+            apply_deltas({old: -1, new: 1})
+
+    def row_deleted(self, sender, instance, **kwargs):
+        apply_deltas({self.key_of(self.values_of(instance)): -1})
+
+
+def apply_deltas(deltas):
+    """Move the stored counters; keys that were never reconciled are skipped"""
+    for key, delta in deltas.items():
+        if key is not None and delta:
+            StatisticCounter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def count_created(model, instances):
+    """Count rows written with bulk_create, which sends no post_save"""
+    deltas = collections.Counter()
+    for counter in COUNTERS:
+        if counter.get_model() is model:
+            for instance in instances:
+                deltas[counter.key_of(counter.values_of(instance))] += 1
+    apply_deltas(deltas)
+
+
+def reconcile():
+    """Recount every counter from the source tables"""
+    counts = {}
+    for counter in COUNTERS:
+        counts.update(counter.count())
+    with transaction.atomic():
+        existing = {counter.key: counter for counter in StatisticCounter.objects.select_for_update()}
+        for key, value in counts.items():
+            if key in existing:
+                existing[key].value = value
+        StatisticCounter.objects.bulk_update(existing.values(), ['value'])
+        try:
+            StatisticCounter.objects.bulk_create([
+                StatisticCounter(key=key, value=value) for key, value in counts.items() if key not in existing
+            ])
+        except IntegrityError:
+            pass
+    cache.delete(CACHE_KEY)
+    return counts
+
+
+def load():
+    counts = dict(StatisticCounter.objects.values_list('key', 'value'))
+    if not counts:
+        counts = reconcile()
+    stats = {}
+    for counter in COUNTERS:
+        if counter.group_by:
+            prefix = f'{counter.name}:'
+            stats[counter.name] = {
+                key[len(prefix):]: value for key, value in counts.items() if key.startswith(prefix)
+            }
+        else:
+            stats[counter.name] = counts.get(counter.name, 0)
+    return stats
+
+
+def get_statistics():
+    """Counters as served by the API, cached for a few seconds"""
+    return cache.get_or_set(CACHE_KEY, load, CACHE_TIMEOUT)
+
+
+Counter('total_vehicles', 'vehicles.Vehicle').connect()
+Counter('vehicles_by_type', 'vehicles.Vehicle', group_by='type').connect()
+
+favorites = Counter('total_favorited_vehicles', FavoriteVehicle.vehicles.through)
+
+
+def favorite_links(instance, reverse):
+    links = favorites.model.objects
+    return links.filter(vehicle=instance) if reverse else links.filter(favoritevehicle=instance)
+
+
+def count_favorite_changes(sender, instance, action, reverse, pk_set, **kwargs):
+    # Django sends no delete signals for auto-created through rows, so
+    # removals are counted before they happen
+    if action == 'post_add' and pk_set:
+        apply_deltas({favorites.name: len(pk_set)})
+    elif action == 'pre_remove' and pk_set:
+        lookup = 'favoritevehicle__in' if reverse else 'vehicle__in'
+        apply_deltas({favorites.name: -favorite_links(instance, reverse).filter(**{lookup: pk_set}).count()})
+    elif action == 'pre_clear':
+        apply_deltas({favorites.name: -favorite_links(instance, reverse).count()})
+
+
+def count_cascaded_favorites(sender, instance, **kwargs):
+    apply_deltas({favorites.name: -favorite_links(instance, sender is Vehicle).count()})
+
+
+m2m_changed.connect(count_favorite_changes, sender=favorites.model, dispatch_uid='statistics-favorites')
+pre_delete.connect(count_cascaded_favorites, sender=Vehicle, dispatch_uid='statistics-favorites')
+pre_delete.connect(count_cascaded_favorites, sender=FavoriteVehicle, dispatch_uid='statistics-favorites')
@@ -1,3 +1,808 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
 
-# Create your tests here.
\ No newline at end of file
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from core.search import fill_empty_indexes
+from core.testing import api_client, create_user, create_vehicle
+from src.apps.rental.models import Installment, Rental
+from src.apps.support.models import Ticket
+from . import pricing, statistics
+from .api.viewsets import VehicleViewSet
+from .cron import refresh_effective_prices
+from .images import vehicle_image_variants
+from .similarity import vehicle_similarity
+from .cache import get_cache_stats
+from .search import vehicle_index
+from .models import Brand, FavoriteVehicle, Feature, Vehicle, VehicleImage, VehiclePrice, VehiclePriceTier
+
+
+class VehicleListQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        for i in range(3):
+            brand = Brand.objects.create(name=f"Brand {i}")
+            for j in range(10):
+                vehicle = create_vehicle(brand, model=f"Model {i}-{j}")
+                VehicleImage.objects.create(vehicle=vehicle, image=f'vehicles/gallery/{i}-{j}.jpg', is_primary=True)
+                VehicleImage.objects.create(vehicle=vehicle, image=f'vehicles/gallery/{i}-{j}-2.jpg')
+                VehiclePrice.objects.create(vehicle=vehicle, price=90, start_date=today - timedelta(days=1))
+
+    def setUp(self):
+        self.client = api_client()
+
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context), response
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        small, _ = self.count_list_queries('/api/vehicles/vehicles/?limit=2')
+        large, response = self.count_list_queries('/api/vehicles/vehicles/?limit=30')
+
+        self.assertEqual(len(response.data['results']), 30)
+        self.assertEqual(small, large)
+
+    def test_featured_query_count_is_independent_of_result_size(self):
+        Vehicle.objects.filter(model__endswith='-0').update(is_featured=True)
+        small, _ = self.count_list_queries('/api/vehicles/vehicles/featured/')
+        Vehicle.objects.update(is_featured=True)
+        large, response = self.count_list_queries('/api/vehicles/vehicles/featured/')
+
+        self.assertEqual(len(response.data), 30)
+        self.assertEqual(small, large)
+
+    def test_list_serializes_annotated_image_and_price(self):
+        _, response = self.count_list_queries('/api/vehicles/vehicles/?limit=1')
+        row = response.data['results'][0]
+        vehicle = Vehicle.objects.get(pk=row['id'])
+
+        self.assertEqual(row['primary_image'], vehicle.images.get(is_primary=True).image.url)
+        self.assertEqual(row['current_price'], vehicle.current_price)
+
+
+class VehicleEffectivePriceTests(TestCase):
+
+    def setUp(self):
+        self.vehicle = create_vehicle()
+        self.today = timezone.now().date()
+
+    def test_new_vehicle_uses_base_price(self):
+        self.assertEqual(self.vehicle.effective_price, 100)
+
+    def test_price_entries_update_effective_price_immediately(self):
+        entry = VehiclePrice.objects.create(vehicle=self.vehicle, price=80, start_date=self.today)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.effective_price, 80)
+
+        entry.delete()
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.effective_price, 100)
+
+    def test_scheduled_entry_rolls_forward_when_it_starts(self):
+        entry = VehiclePrice.objects.create(vehicle=self.vehicle, price=70, start_date=self.today + timedelta(days=1))
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.effective_price, 100)
+
+        # Simulate the start date arriving without going through the model signals
+        VehiclePrice.objects.filter(pk=entry.pk).update(start_date=self.today)
+        refresh_effective_prices()
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.effective_price, 70)
+
+    def test_price_range_filters_on_effective_price(self):
+        VehiclePrice.objects.create(vehicle=self.vehicle, price=50, start_date=self.today)
+        response = api_client().get('/api/vehicles/vehicles/by_price_range/?max=60')
+        self.assertEqual([row['id'] for row in response.data], [self.vehicle.id])
+
+    def test_ordering_by_price_uses_effective_price(self):
+        cheaper = create_vehicle(model="Camry", price=80)
+        VehiclePrice.objects.create(vehicle=self.vehicle, price=50, start_date=self.today)
+        response = api_client().get('/api/vehicles/vehicles/?ordering=price')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.vehicle.id, cheaper.id])
+        response = api_client().get('/api/vehicles/vehicles/?ordering=-price')
+        self.assertEqual([row['id'] for row in response.data['results']], [cheaper.id, self.vehicle.id])
+
+
+class VehicleSearchTests(TestCase):
+
+    def setUp(self):
+        self.client = api_client()
+        self.toyota = Brand.objects.create(name="تويوتا")
+        self.land_cruiser = create_vehicle(self.toyota, model="لاند كروزر", color="أبيض")
+        self.camry = create_vehicle(self.toyota, model="Camry", color="Silver")
+        create_vehicle(Brand.objects.create(name="Nissan"), model="Patrol", color="White")
+
+    def search(self, query):
+        response = self.client.get('/api/vehicles/vehicles/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_search_folds_arabic_variants(self):
+        self.assertEqual(self.search("لاند كروزر ابيض"), [self.land_cruiser.id])
+        self.assertEqual(self.search("لانْد"), [self.land_cruiser.id])
+
+    def test_search_matches_prefixes_and_brand_names(self):
+        self.assertEqual(self.search("cam"), [self.camry.id])
+        self.assertCountEqual(self.search("تويوتا"), [self.land_cruiser.id, self.camry.id])
+
+    def test_index_follows_model_changes(self):
+        self.toyota.name = "Toyota"
+        self.toyota.save()
+        self.assertCountEqual(self.search("toyota"), [self.land_cruiser.id, self.camry.id])
+
+        self.camry.delete()
+        self.assertEqual(self.search("toyota"), [self.land_cruiser.id])
+
+    def test_empty_index_is_filled_after_migrating(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {vehicle_index.table}')
+        self.assertEqual(self.search("cam"), [])
+        fill_empty_indexes(sender=apps.get_app_config('vehicles'))
+        self.assertEqual(self.search("cam"), [self.camry.id])
+        self.assertFalse(vehicle_index.fill_if_empty())
+
+
+class VehicleKeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = api_client()
+        brand = Brand.objects.create(name="Toyota")
+        self.vehicles = [create_vehicle(brand, model=f"Model {i}") for i in range(7)]
+        # Same created_at for a few rows so the id tie-breaker is exercised
+        Vehicle.objects.filter(pk__in=[v.pk for v in self.vehicles[2:5]]).update(created_at=self.vehicles[2].created_at)
+
+    def test_cursor_walks_every_row_once(self):
+        seen = []
+        url = '/api/vehicles/vehicles/?cursor=&limit=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+
+        expected = Vehicle.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_new_rows_do_not_shift_cursor_pages(self):
+        first = self.client.get('/api/vehicles/vehicles/?cursor=&limit=3').data
+        create_vehicle(Brand.objects.first(), model="Newest")
+        second = self.client.get(first['next']).data
+
+        first_ids = {row['id'] for row in first['results']}
+        self.assertFalse(first_ids & {row['id'] for row in second['results']})
+
+    def test_limit_offset_still_works(self):
+        response = self.client.get('/api/vehicles/vehicles/?limit=3&offset=3')
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_cursor_refuses_ordering_and_search(self):
+        for params in ({'ordering': '-price'}, {'search': 'Model'}):
+            response = self.client.get('/api/vehicles/vehicles/', {'cursor': '', **params})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(next(iter(params)), response.data)
+            self.assertEqual(self.client.get('/api/vehicles/vehicles/', params).status_code, 200)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/vehicles/vehicles/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client = api_client()
+        self.vehicle = create_vehicle()
+        self.detail_url = f'/api/vehicles/vehicles/{self.vehicle.pk}/'
+
+    def assertNotModified(self, url, etag):
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def assertModified(self, url, etag):
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_tracks_updates_and_deletes(self):
+        url = '/api/vehicles/vehicles/'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        other = create_vehicle(self.vehicle.brand, model="Camry")
+        self.assertModified(url, etag)
+
+        etag = self.client.get(url)['ETag']
+        other.delete()
+        self.assertModified(url, etag)
+
+    def test_detail_etag_tracks_images_and_prices(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.assertNotModified(self.detail_url, etag)
+
+        VehicleImage.objects.create(vehicle=self.vehicle, image='vehicles/gallery/new.jpg')
+        self.assertModified(self.detail_url, etag)
+
+        etag = self.client.get(self.detail_url)['ETag']
+        VehiclePrice.objects.create(vehicle=self.vehicle, price=10, start_date=timezone.now().date())
+        self.assertModified(self.detail_url, etag)
+
+    def test_etags_track_nested_rows(self):
+        url = '/api/vehicles/vehicles/'
+        etag = self.client.get(url)['ETag']
+        self.vehicle.brand.name = "Toyota Motor"
+        self.vehicle.brand.save()
+        self.assertModified(url, etag)
+
+        for change in (
+            lambda: VehiclePriceTier.objects.create(vehicle=self.vehicle, min_days=7, price_per_day=80),
+            lambda: Rental.objects.create(
+                vehicle=self.vehicle, user=create_user('renter'), start_date=timezone.now(),
+                end_date=timezone.now() + timedelta(days=2),
+            ),
+        ):
+            etag = self.client.get(self.detail_url)['ETag']
+            change()
+            self.assertModified(self.detail_url, etag)
+
+    def test_list_counts_at_most_once(self):
+        create_vehicle(self.vehicle.brand, model="Camry")
+
+        def counts(url):
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len([q for q in context if 'COUNT(' in q['sql']])
+
+        self.assertEqual(counts('/api/vehicles/vehicles/?limit=1'), 1)
+        self.assertEqual(counts('/api/vehicles/vehicles/?cursor=&limit=1'), 0)
+
+    def test_cursor_page_etag_tracks_its_rows(self):
+        other = create_vehicle(self.vehicle.brand, model="Camry")
+        url = '/api/vehicles/vehicles/?cursor=&limit=1'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+        Vehicle.objects.filter(pk=other.pk).update(model="Corolla", updated_at=timezone.now())
+        self.assertModified(url, etag)
+
+        etag = self.client.get(url)['ETag']
+        other.delete()
+        self.assertModified(url, etag)
+
+    def test_list_filters_once(self):
+        calls = []
+        filter_queryset = VehicleViewSet.filter_queryset
+        self.addCleanup(setattr, VehicleViewSet, 'filter_queryset', filter_queryset)
+        VehicleViewSet.filter_queryset = lambda view, queryset: calls.append(1) or filter_queryset(view, queryset)
+        self.assertEqual(self.client.get('/api/vehicles/vehicles/?search=Cruiser').status_code, 200)
+        self.assertEqual(len(calls), 1)
+
+    def test_detail_honours_if_modified_since(self):
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+
+class VehicleDetailCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = api_client()
+        self.vehicle = create_vehicle()
+        self.url = f'/api/vehicles/vehicles/{self.vehicle.pk}/'
+
+    def get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_repeated_reads_are_served_from_cache(self):
+        self.get()
+        with CaptureQueriesContext(connection) as context:
+            self.get()
+        # Only the lookup behind the validators runs on a hit
+        self.assertEqual(len(context), 1)
+        self.assertEqual(get_cache_stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_related_changes_invalidate_the_payload(self):
+        self.get()
+        VehiclePrice.objects.create(vehicle=self.vehicle, price=55, start_date=timezone.now().date())
+        self.assertEqual(self.get()['current_price'], 55)
+
+        self.vehicle.brand.name = "Lexus"
+        self.vehicle.brand.save()
+        self.assertEqual(self.get()['brand_details']['name'], "Lexus")
+
+        feature = Feature.objects.create(name="Sunroof")
+        self.vehicle.features.add(feature)
+        self.assertEqual(len(self.get()['features_list']), 1)
+        feature.delete()
+        self.assertEqual(self.get()['features_list'], [])
+
+        VehiclePriceTier.objects.create(vehicle=self.vehicle, min_days=1, price_per_day=10)
+        self.get()
+        self.assertEqual(get_cache_stats()['hits'], 0)
+
+    def test_changes_made_by_other_processes_are_not_served_stale(self):
+        self.get()
+        # A cron job or import writes the row; nothing reaches this process's cache
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(model="Prado", updated_at=timezone.now())
+        self.assertEqual(self.get()['model'], "Prado")
+
+    def test_staff_and_public_views_are_cached_separately(self):
+        self.get()
+        staff = create_user('staff', is_staff=True)
+        self.client.force_authenticate(staff)
+        self.get()
+        self.assertEqual(get_cache_stats()['misses'], 2)
+
+    def test_stats_are_admin_only(self):
+        response = self.client.get('/api/vehicles/vehicles/cache_stats/')
+        self.assertIn(response.status_code, (401, 403))
+
+
+class VehicleFacetTests(TestCase):
+
+    def setUp(self):
+        self.client = api_client()
+        self.toyota = Brand.objects.create(name="Toyota")
+        nissan = Brand.objects.create(name="Nissan")
+        create_vehicle(self.toyota, model="Camry", body_type="Sedan", price=8000, year=2022)
+        create_vehicle(self.toyota, model="Land Cruiser", transmission="manual", price=30000)
+        create_vehicle(nissan, model="Patrol", engine_type="diesel", price=30000, staff_only=True)
+
+    def facets(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/vehicles/vehicles/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(context), 4)
+        return response.data
+
+    def test_counts_every_facet_and_hides_staff_only(self):
+        data = self.facets()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['brand'], [{'value': self.toyota.pk, 'label': "Toyota", 'count': 2}])
+        self.assertEqual([(row['value'], row['count']) for row in data['transmission']], [('automatic', 1), ('manual', 1)])
+        self.assertEqual([(row['value'], row['count']) for row in data['body_type']], [('SUV', 1), ('Sedan', 1)])
+        self.assertEqual([(row['value'], row['count']) for row in data['year']], [(2024, 1), (2022, 1)])
+        self.assertEqual(data['price'], [
+            {'min': 5000, 'max': 10000, 'count': 1},
+            {'min': 20000, 'max': 50000, 'count': 1},
+        ])
+
+    def test_applies_filters_and_search(self):
+        self.assertEqual(self.facets(transmission='manual')['count'], 1)
+        data = self.facets(search="camry")
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['body_type'], [{'value': 'Sedan', 'label': 'Sedan', 'count': 1}])
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageVariantTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = api_client()
+        self.vehicle = create_vehicle()
+        buffer = BytesIO()
+        Image.new('RGB', (2400, 1600), 'red').save(buffer, 'JPEG')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.image = VehicleImage.objects.create(
+                vehicle=self.vehicle, is_primary=True,
+                image=SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg'),
+            )
+        self.scheduled = callbacks
+
+    def test_upload_is_queued_after_commit(self):
+        self.assertEqual(len(self.scheduled), 1)
+        self.assertEqual(self.image.image_variants, {})
+
+    def test_variants_fit_their_boxes_and_reach_the_serializers(self):
+        detail_url = f'/api/vehicles/vehicles/{self.vehicle.pk}/'
+        self.assertIsNone(self.client.get(detail_url).data['images'][0]['image_variants'])
+
+        variants = vehicle_image_variants.generate(self.image)
+        self.assertEqual((variants['thumbnail']['width'], variants['thumbnail']['height']), (320, 213))
+        self.assertEqual((variants['card']['width'], variants['card']['height']), (800, 533))
+        self.assertEqual(variants['full']['width'], 1920)
+
+        row = self.client.get('/api/vehicles/vehicles/').data['results'][0]
+        self.assertTrue(row['primary_image'].endswith('-card.jpeg'))
+        self.assertIn('320w', row['primary_image_variants']['srcset']['webp'])
+
+        # The detail cache and validators follow the variants
+        image = self.client.get(detail_url).data['images'][0]
+        self.assertTrue(image['image_variants']['thumbnail']['webp'].endswith('-thumbnail.webp'))
+
+
+class VehicleImportTests(TestCase):
+
+    CSV = (
+        "brand,model,year,price,body_type,color,mileage,engine_type,engine_capacity,cylinders,"
+        "transmission,seats,staff_only,features,images,prices,price_tiers\n"
+        "toyota,Camry,2023,9000,Sedan,White,10,gasoline,2.5,4,automatic,5,true,GPS|Sunroof,"
+        "vehicles/gallery/a.jpg|vehicles/gallery/b.jpg,\"[{\"\"price\"\": 8000, \"\"start_date\"\": \"\"2020-01-01\"\"}]\","
+        "\"[{\"\"min_days\"\": 7, \"\"price_per_day\"\": 30}]\"\n"
+        "Unknown,Patrol,2023,9000,SUV,White,10,gasoline,2.5,4,automatic,5,,,,,\n"
+        "Toyota,Hilux,abc,9000,Pickup,White,10,gasoline,2.5,4,automatic,5,,,,,\n"
+    )
+
+    def setUp(self):
+        self.client = api_client(create_user('admin', is_staff=True))
+        Brand.objects.create(name="Toyota")
+        Feature.objects.create(name="GPS")
+        Feature.objects.create(name="Sunroof")
+
+    def upload(self, name, content):
+        return self.client.post('/api/vehicles/vehicles/import/', {'file': SimpleUploadedFile(name, content.encode())})
+
+    def test_csv_import_creates_related_rows_and_reports_errors(self):
+        response = self.upload('vehicles.csv', self.CSV)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertIn('brand', response.data['errors'][0]['errors'])
+
+        vehicle = Vehicle.objects.get(model="Camry")
+        self.assertTrue(vehicle.staff_only)
+        self.assertEqual(vehicle.features.count(), 2)
+        self.assertEqual(vehicle.images.get(is_primary=True).image.name, 'vehicles/gallery/a.jpg')
+        self.assertEqual(vehicle.price_tiers.get().min_days, 7)
+        self.assertEqual(vehicle.effective_price, 8000)
+
+    def test_jsonl_import_is_searchable(self):
+        row = {
+            'brand': 'Nissan', 'model': 'Patrol', 'year': 2024, 'price': 100, 'body_type': 'SUV', 'color': 'White',
+            'mileage': 0, 'engine_type': 'diesel', 'engine_capacity': 4.0, 'cylinders': 8,
+            'transmission': 'automatic', 'seats': 7,
+        }
+        content = '\n'.join([json.dumps(row), 'not json'])
+        response = self.client.post('/api/vehicles/vehicles/import/', {
+            'file': SimpleUploadedFile('vehicles.jsonl', content.encode()), 'create_missing': 'true',
+        })
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+        results = self.client.get('/api/vehicles/vehicles/', {'search': 'patrol'}).data['results']
+        self.assertEqual([result['brand_name'] for result in results], ['Nissan'])
+
+    def test_import_is_admin_only(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.upload('vehicles.csv', self.CSV).status_code, (401, 403))
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.admin = create_user('admin', is_staff=True)
+        self.client = api_client(self.admin)
+        brand = Brand.objects.create(name="تويوتا")
+        self.sold = create_vehicle(brand, model="Camry", status='sold')
+        self.available = create_vehicle(brand, model="Land Cruiser")
+
+    def export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+
+        async def read(content):
+            return b''.join([part async for part in content])
+        return async_to_sync(read)(response.streaming_content).decode()
+
+    def test_streams_asynchronously(self):
+        # A sync iterator would be read to the end by daphne before the first byte
+        response = self.client.get('/api/vehicles/vehicles/export/')
+        self.assertTrue(response.is_async)
+        self.assertTrue(hasattr(response.streaming_content, '__aiter__'))
+        response.close()
+
+    def test_vehicle_export_streams_ndjson_and_csv(self):
+        lines = self.export('/api/vehicles/vehicles/export/').splitlines()
+        self.assertEqual([json.loads(line)['model'] for line in lines], ["Camry", "Land Cruiser"])
+
+        rows = self.export('/api/vehicles/vehicles/export/', file_format='csv', status='sold').lstrip('\ufeff').splitlines()
+        self.assertTrue(rows[0].startswith('id,brand__name,model'))
+        self.assertEqual(len(rows), 2)
+        self.assertIn("تويوتا,Camry", rows[1])
+
+    def test_date_range_filter(self):
+        Vehicle.objects.filter(pk=self.sold.pk).update(created_at=timezone.now() - timedelta(days=10))
+        day = (timezone.now() - timedelta(days=1)).date().isoformat()
+        lines = self.export('/api/vehicles/vehicles/export/', date_from=day).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.available.pk])
+        self.assertEqual(self.client.get('/api/vehicles/vehicles/export/', {'date_from': 'yesterday'}).status_code, 400)
+
+    def test_rental_export_nests_installments(self):
+        now = timezone.now()
+        # bulk_create keeps Rental.save's unit and notification side effects out of the way
+        rentals = Rental.objects.bulk_create([
+            Rental(vehicle=vehicle, user=self.admin, start_date=now, end_date=now + timedelta(days=40), total_price=100)
+            for vehicle in (self.sold, self.available, self.sold)
+        ])
+        Installment.objects.bulk_create([
+            Installment(rental=rentals[2], user=self.admin, due_date=now.date() + timedelta(days=30), amount=25),
+            Installment(rental=rentals[0], user=self.admin, due_date=now.date(), amount=60),
+            Installment(rental=rentals[2], user=self.admin, due_date=now.date(), amount=75),
+        ])
+
+        lines = self.export('/api/rentals/rentals-requests/export/').splitlines()
+        amounts = [[float(i['amount']) for i in json.loads(line)['installments']] for line in lines]
+        self.assertEqual(amounts, [[60], [], [75, 25]])
+
+    def test_exports_are_admin_only(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/api/vehicles/vehicles/export/').status_code, (401, 403))
+
+
+class SimilarVehicleTests(TestCase):
+
+    def setUp(self):
+        vehicle_similarity.reset()
+        self.client = api_client()
+        toyota = Brand.objects.create(name="Toyota")
+        nissan = Brand.objects.create(name="Nissan")
+        self.gps = Feature.objects.create(name="GPS")
+        self.target = create_vehicle(toyota, model="Land Cruiser", year=2022, price=30000)
+        self.twin = create_vehicle(toyota, model="Land Cruiser", year=2021, price=29000)
+        self.cousin = create_vehicle(nissan, model="Patrol", year=2022, price=31000)
+        self.sedan = create_vehicle(nissan, model="Sunny", body_type="Sedan", year=2015, price=5000,
+                                    engine_type="hybrid", transmission="cvt", seats=5, mileage=150000)
+        self.hidden = create_vehicle(toyota, model="Land Cruiser", year=2022, price=30000, staff_only=True)
+
+    def similar(self, vehicle, **params):
+        response = self.client.get(f'/api/vehicles/vehicles/{vehicle.pk}/similar/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_nearest_first_and_staff_only_hidden(self):
+        self.assertEqual(self.similar(self.target), [self.twin.pk, self.cousin.pk, self.sedan.pk])
+        self.assertEqual(self.similar(self.target, k=1), [self.twin.pk])
+
+    def test_index_follows_changes_and_deletes(self):
+        self.similar(self.target)
+        self.target.features.add(self.gps)
+        self.cousin.features.add(self.gps)
+        self.twin.delete()
+        vehicle_similarity.sync(force=True)
+        self.assertEqual(self.similar(self.target), [self.cousin.pk, self.sedan.pk])
+
+    def test_deletes_missed_by_this_process_are_refilled(self):
+        clones = [create_vehicle(self.target.brand, model="Land Cruiser", year=2022, price=30000) for _ in range(8)]
+        self.similar(self.target)
+        # Another process deletes them: its post_delete never reaches this index
+        self.addCleanup(setattr, vehicle_similarity, 'remove', vehicle_similarity.remove)
+        vehicle_similarity.remove = lambda vehicle_id: None
+        for clone in clones:
+            clone.delete()
+        vehicle_similarity.sync(force=True)
+        self.assertEqual(self.similar(self.target, k=2), [self.twin.pk, self.cousin.pk])
+
+    def test_similar_does_not_scan_the_table(self):
+        self.similar(self.target)
+        with CaptureQueriesContext(connection) as context:
+            self.similar(self.target)
+        # Object lookup plus the fetch of the k results
+        self.assertEqual(len(context), 2)
+
+
+class FavoriteVehicleTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('fan')
+        self.client = api_client(self.user)
+        brand = Brand.objects.create(name="Toyota")
+        self.vehicles = [create_vehicle(brand, model=f"Model {i}") for i in range(4)]
+        self.hidden = create_vehicle(brand, model="Hidden", staff_only=True)
+
+    def batch(self, **data):
+        return self.client.post('/api/vehicles/favorite/batch/', data, format='json')
+
+    def test_batch_add_remove_and_toggle(self):
+        first, second, third, fourth = [vehicle.pk for vehicle in self.vehicles]
+        response = self.batch(add=[first, second, self.hidden.pk, 999999])
+        self.assertEqual(response.data['added'], [first, second])
+        self.assertEqual(response.data['not_found'], [self.hidden.pk, 999999])
+
+        response = self.batch(remove=[first], toggle=[second, third])
+        self.assertEqual(response.data['removed'], [first, second])
+        self.assertEqual(response.data['added'], [third])
+        self.assertEqual(FavoriteVehicle.vehicle_ids(self.user), {third})
+
+        self.assertEqual(self.batch(add=[fourth], remove=[fourth]).status_code, 400)
+
+    def test_favorites_list_is_paginated_newest_first(self):
+        self.batch(add=[self.vehicles[0].pk])
+        self.batch(add=[self.vehicles[2].pk])
+        response = self.client.get('/api/vehicles/favorite/?limit=1')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.vehicles[2].pk])
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+
+    def test_is_favorited_flag_uses_one_lookup_per_page(self):
+        self.batch(add=[self.vehicles[1].pk])
+        self.client.get('/api/vehicles/vehicles/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/vehicles/vehicles/?limit=1')
+        small = len(context)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/vehicles/vehicles/')
+        self.assertEqual(small, len(context))
+        flags = {row['id']: row['is_favorited'] for row in response.data['results']}
+        self.assertEqual([pk for pk, flag in flags.items() if flag], [self.vehicles[1].pk])
+
+        detail = self.client.get(f'/api/vehicles/vehicles/{self.vehicles[1].pk}/')
+        self.assertTrue(detail.data['is_favorited'])
+        self.client.force_authenticate(None)
+        detail = self.client.get(f'/api/vehicles/vehicles/{self.vehicles[1].pk}/')
+        self.assertFalse(detail.data['is_favorited'])
+
+    def test_favoriting_changes_the_detail_etag(self):
+        url = f'/api/vehicles/vehicles/{self.vehicles[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        self.batch(add=[self.vehicles[0].pk])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+
+
+class StatisticsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = api_client()
+        self.user = create_user('fan')
+        self.brand = Brand.objects.create(name="Toyota")
+        self.vehicle = create_vehicle(self.brand, type='rent')
+        statistics.reconcile()
+
+    def stats(self):
+        cache.clear()
+        return self.client.get('/api/vehicles/statistics/').data
+
+    def test_counters_follow_creates_updates_and_deletes(self):
+        other = create_vehicle(self.brand, type='new')
+        favorite = FavoriteVehicle.for_user(self.user)
+        favorite.vehicles.add(self.vehicle, other)
+        ticket = Ticket.objects.create(subject="Help", description="...", user=self.user)
+
+        stats = self.stats()
+        self.assertEqual(stats['total_vehicles'], 2)
+        self.assertEqual(stats['vehicles_by_type'], {'new': 1, 'used': 0, 'rent_to_own': 0, 'rent': 1})
+        self.assertEqual(stats['total_favorited_vehicles'], 2)
+        self.assertEqual(stats['open_tickets'], 1)
+
+        other.type = 'used'
+        other.save()
+        ticket.resolve()
+        favorite.vehicles.remove(other)
+        self.vehicle.delete()
+
+        stats = self.stats()
+        self.assertEqual(stats['total_vehicles'], 1)
+        self.assertEqual(stats['vehicles_by_type'], {'new': 0, 'used': 1, 'rent_to_own': 0, 'rent': 0})
+        self.assertEqual(stats['total_favorited_vehicles'], 0)
+        self.assertEqual(stats['open_tickets'], 0)
+
+        statistics.reconcile()
+        self.assertEqual(self.stats(), stats)
+
+    def test_saves_read_the_previous_state_from_the_instance(self):
+        ticket = Ticket.objects.create(subject="Help", description="...", user=self.user)
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        with CaptureQueriesContext(connection) as context:
+            ticket.resolve()
+            vehicle.type = 'used'
+            vehicle.save()
+        selects = [q['sql'] for q in context if q['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in selects if 'FROM "support_ticket"' in sql or 'FROM "vehicles_vehicle"' in sql])
+        stats = self.stats()
+        self.assertEqual(stats['open_tickets'], 0)
+        self.assertEqual(stats['vehicles_by_type']['used'], 1)
+
+        # A row loaded without the counted field still counts correctly
+        vehicle = Vehicle.objects.only('id').get(pk=self.vehicle.pk)
+        vehicle.type = 'new'
+        vehicle.save()
+        self.assertEqual(self.stats()['vehicles_by_type'], {'new': 1, 'used': 0, 'rent_to_own': 0, 'rent': 0})
+
+    def test_served_from_cache_without_scans(self):
+        self.client.get('/api/vehicles/statistics/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/vehicles/statistics/')
+        self.assertEqual(len(context), 0)
+        self.assertEqual(response.data['total_vehicles'], 1)
+
+    def test_reconcile_fixes_bulk_writes(self):
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(type='new')
+        statistics.reconcile()
+        self.assertEqual(self.stats()['vehicles_by_type']['new'], 1)
+
+
+class PricingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = api_client()
+        brand = Brand.objects.create(name="Toyota")
+        self.vehicle = create_vehicle(brand, price=100)
+        self.other = create_vehicle(brand, price=50)
+        VehiclePriceTier.objects.create(vehicle=self.vehicle, min_days=7, max_days=29, price_per_day=80)
+        VehiclePriceTier.objects.create(vehicle=self.vehicle, min_days=20, max_days=None, price_per_day=60)
+        self.start = timezone.now()
+
+    def test_tier_table_keeps_lowest_min_days_on_overlap(self):
+        table = pricing.TierTable([(7, 29, 80), (20, None, 60), (3, 5, 90), (4, 6, 95)])
+        prices = {days: table.price_per_day(days) for days in (1, 3, 5, 6, 7, 25, 29, 30, 400)}
+        self.assertEqual(prices, {1: None, 3: 90, 5: 90, 6: 95, 7: 80, 25: 80, 29: 80, 30: 60, 400: 60})
+
+    def test_quote_applies_tiers_and_falls_back_to_effective_price(self):
+        self.assertEqual(pricing.quote(self.vehicle, self.start, self.start + timedelta(days=10))['total'], 800)
+        self.assertEqual(pricing.quote(self.vehicle, self.start, self.start + timedelta(days=2, hours=1))['total'], 300)
+
+        VehiclePrice.objects.create(vehicle=self.other, price=40, start_date=self.start.date())
+        self.other.refresh_from_db()
+        self.assertEqual(pricing.quote(self.other, self.start, self.start + timedelta(days=2))['total'], 80)
+
+    def test_tier_changes_invalidate_the_cached_table(self):
+        end = self.start + timedelta(days=10)
+        self.assertEqual(pricing.quote(self.vehicle, self.start, end)['price_per_day'], 80)
+        self.vehicle.price_tiers.filter(min_days=7).update(price_per_day=70)
+        self.assertEqual(pricing.quote(self.vehicle, self.start, end)['price_per_day'], 80)
+        self.vehicle.price_tiers.get(min_days=7).save()
+        self.vehicle.refresh_from_db()
+        self.assertEqual(pricing.quote(self.vehicle, self.start, end)['price_per_day'], 70)
+
+    def test_tier_changes_made_by_other_processes_are_picked_up(self):
+        end = self.start + timedelta(days=10)
+        self.assertEqual(pricing.quote(self.vehicle, self.start, end)['price_per_day'], 80)
+        # What a save in another process leaves behind: new tiers, a moved updated_at
+        self.vehicle.price_tiers.filter(min_days=7).update(price_per_day=70)
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(updated_at=timezone.now())
+        self.vehicle.refresh_from_db()
+        self.assertEqual(pricing.quote(self.vehicle, self.start, end)['price_per_day'], 70)
+
+    def test_quote_endpoint_prices_a_page_in_constant_queries(self):
+        def post(count):
+            items = [
+                {'vehicle': vehicle.pk, 'start_date': self.start, 'end_date': self.start + timedelta(days=days)}
+                for vehicle in (self.vehicle, self.other) for days in range(1, count + 1)
+            ]
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post('/api/vehicles/vehicles/quote/', {'items': items}, format='json')
+            self.assertEqual(response.status_code, 200)
+            return len(context), response.data
+
+        small, _ = post(1)
+        large, data = post(30)
+        self.assertEqual(small, large)
+        by_days = {(row['vehicle'], row['days']): row['total'] for row in data}
+        self.assertEqual(by_days[self.vehicle.pk, 25], 2000)
+        self.assertEqual(by_days[self.other.pk, 25], 1250)
+
+        VehiclePrice.objects.create(vehicle=self.other, price=40, start_date=self.start.date())
+        _, data = post(1)
+        self.assertEqual(data[1]['total'], 40)
+
+    def test_quote_reports_unknown_vehicles(self):
+        items = [{'vehicle': 999999, 'start_date': self.start, 'end_date': self.start + timedelta(days=1)}]
+        response = self.client.post('/api/vehicles/vehicles/quote/', {'items': items}, format='json')
+        self.assertEqual(response.data[0]['error'], "Vehicle not found")